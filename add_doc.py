@@ -1,5 +1,7 @@
 import json, textwrap, os
 
+from chunking import chunk_corpus_file
+
 docs = []
 
 def add_doc(id, category, title, tags, text):
@@ -367,4 +369,8 @@ with open(file_path, "w", encoding="utf-8") as f:
     for d in docs:
         f.write(json.dumps(d, ensure_ascii=False) + "\n")
 
+# Sentence-aware chunks of the same docs (ids like "doc-010#c0"); use with FLU_RAG_CORPUS=flu_rag_chunks.jsonl
+chunks_path = "flu_rag_chunks.jsonl"
+chunk_corpus_file(file_path, chunks_path)
+
 len(docs), file_path
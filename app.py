@@ -1,8 +1,26 @@
 import os
 import json
-import textwrap
 import re
-import anthropic
+
+from context_packing import log_packed, pack_context
+from keyword_matcher import KeywordMatcher
+from llm_gateway import LLMGateway, LLMUnavailable
+from metrics import REGISTRY, stage, start_exporters, tag_request, timed, trace_request
+from prompt_cache import USAGE_TOTALS, is_cacheable, system_blocks
+from rule_based_answers import (
+    info_fallback_answer,
+    rule_answer_policy,
+    symptom_fallback_answer,
+    templated_symptom_answer,
+    use_rule_answer,
+)
+from symptoms import (
+    flu_score,
+    format_symptom_summary,
+    has_any_symptoms,
+    interpret_flu_score,
+    parse_symptoms_from_text,
+)
 
 # ----------------------------
 # Anthropic (Claude) client
@@ -11,75 +29,13 @@ api_key = os.environ.get("ANTHROPIC_API_KEY")
 if not api_key:
     raise RuntimeError("ANTHROPIC_API_KEY is not set. Please set it in your environment.")
 
-client = anthropic.Anthropic(api_key=api_key)
+# Pooled client with deadlines, retries and a circuit breaker; anthropic
+# itself is only imported on the first call, canned replies never need it
+gateway = LLMGateway(api_key=api_key)
 
-# ----------------------------
-# Symptom fields (like your CSV)
-# ----------------------------
-SYMPTOM_FIELDS = [
-    "COUGH",
-    "MUSCLE_ACHES",
-    "TIREDNESS",
-    "SORE_THROAT",
-    "RUNNY_NOSE",
-    "STUFFY_NOSE",
-    "FEVER",
-    "NAUSEA",
-    "VOMITING",
-    "DIARRHEA",
-    "SHORTNESS_OF_BREATH",
-    "DIFFICULTY_BREATHING",
-    "LOSS_OF_TASTE",
-    "LOSS_OF_SMELL",
-    "ITCHY_NOSE",
-    "ITCHY_EYES",
-    "ITCHY_MOUTH",
-    "ITCHY_INNER_EAR",
-    "SNEEZING",
-    "PINK_EYE",
-]
-
-# Simple keyword mapping from text → symptom flags
-KEYWORD_MAP = {
-    "cough": "COUGH",
-    "coughing": "COUGH",
-    "body aches": "MUSCLE_ACHES",
-    "body ache": "MUSCLE_ACHES",
-    "muscle ache": "MUSCLE_ACHES",
-    "muscle pain": "MUSCLE_ACHES",
-    "tired": "TIREDNESS",
-    "fatigue": "TIREDNESS",
-    "exhausted": "TIREDNESS",
-    "sore throat": "SORE_THROAT",
-    "throat pain": "SORE_THROAT",
-    "runny nose": "RUNNY_NOSE",
-    "stuffy nose": "STUFFY_NOSE",
-    "blocked nose": "STUFFY_NOSE",
-    "fever": "FEVER",
-    "chills": "FEVER",
-    "nausea": "NAUSEA",
-    "vomit": "VOMITING",
-    "vomiting": "VOMITING",
-    "diarrhea": "DIARRHEA",
-    "shortness of breath": "SHORTNESS_OF_BREATH",
-    "difficulty breathing": "DIFFICULTY_BREATHING",
-    "breathing is hard": "DIFFICULTY_BREATHING",
-    "loss of taste": "LOSS_OF_TASTE",
-    "cant taste": "LOSS_OF_TASTE",
-    "can't taste": "LOSS_OF_TASTE",
-    "loss of smell": "LOSS_OF_SMELL",
-    "cant smell": "LOSS_OF_SMELL",
-    "can't smell": "LOSS_OF_SMELL",
-    "itchy nose": "ITCHY_NOSE",
-    "itchy eyes": "ITCHY_EYES",
-    "itchy mouth": "ITCHY_MOUTH",
-    "itchy ear": "ITCHY_INNER_EAR",
-    "itchy ears": "ITCHY_INNER_EAR",
-    "sneezing": "SNEEZING",
-    "sneeze": "SNEEZING",
-    "pink eye": "PINK_EYE",
-    "red eye": "PINK_EYE",
-}
+# When symptom messages get a templated answer (rule_based_answers.py) instead of
+# Claude: "fallback" (only if Claude is unavailable), "confident" or "always"
+RULE_ANSWERS = rule_answer_policy(os.environ.get("FLU_RAG_RULE_ANSWERS", "fallback"))
 
 # ----------------------------
 # Load RAG knowledge base (Data.json)
@@ -139,88 +95,33 @@ def build_rag_context() -> str:
 
 RAG_CONTEXT = build_rag_context()
 
-# ----------------------------
-# Symptom parsing & flu score
-# ----------------------------
-def parse_symptoms_from_text(user_text: str) -> dict:
-    """
-    Turn free text into a dict of symptom flags (0/1) using simple keywords.
-    """
-    symptoms = {field: 0 for field in SYMPTOM_FIELDS}
-    text = user_text.lower()
-
-    for kw, field in KEYWORD_MAP.items():
-        if kw in text:
-            symptoms[field] = 1
-
-    return symptoms
-
-def has_any_symptoms(symptoms: dict) -> bool:
-    return any(symptoms.values())
-
-def flu_score(symptoms: dict) -> float:
+def build_rag_sections() -> list:
     """
-    Rule-based 'flu-likeness' score in [0, 1].
+    RAG_CONTEXT split at its "=== ... ===" headers, shaped like retrieved docs
+    so it can be trimmed per request by pack_context().
     """
-    score = 0.0
-
-    # Core flu-like features
-    if symptoms.get("FEVER", 0):
-        score += 0.35
-    if symptoms.get("COUGH", 0):
-        score += 0.2
-    if symptoms.get("MUSCLE_ACHES", 0) or symptoms.get("TIREDNESS", 0):
-        score += 0.2
-    if symptoms.get("SORE_THROAT", 0):
-        score += 0.1
-    if symptoms.get("RUNNY_NOSE", 0) or symptoms.get("STUFFY_NOSE", 0):
-        score += 0.1
-
-    # GI symptoms: small boost
-    if symptoms.get("NAUSEA", 0) or symptoms.get("VOMITING", 0) or symptoms.get("DIARRHEA", 0):
-        score += 0.05
-
-    # Allergy-ish features: reduce score
-    allergy_flags = [
-        "ITCHY_NOSE",
-        "ITCHY_EYES",
-        "ITCHY_MOUTH",
-        "ITCHY_INNER_EAR",
-        "SNEEZING",
-        "PINK_EYE",
-    ]
-    if any(symptoms.get(f, 0) for f in allergy_flags):
-        score -= 0.15
-
-    # Clamp
-    score = max(0.0, min(1.0, score))
-    return score
-
-def interpret_flu_score(score: float) -> str:
-    """
-    Convert numeric score to a simple label.
-    """
-    if score >= 0.7:
-        return "LIKELY"
-    elif score >= 0.4:
-        return "POSSIBLE"
-    else:
-        return "UNLIKELY"
-
-def format_symptom_summary(symptoms: dict) -> str:
-    present = [k for k, v in symptoms.items() if v == 1]
-    absent = [k for k, v in symptoms.items() if v == 0]
-
-    def nice(lst):
-        return ", ".join(lst) if lst else "None detected from keywords."
-
-    return textwrap.dedent(f"""
-        Parsed symptoms from your message
-        (1 = keyword detected, 0 = no keyword):
-
-        Present (1): {nice(present)}
-        Absent (0): {nice(absent)}
-    """).strip()
+    sections = []
+    for block in re.split(r"\n?(?==== )", RAG_CONTEXT):
+        block = block.strip()
+        if not block:
+            continue
+        header, _, body = block.partition("\n")
+        sections.append({"metadata": {"title": header}, "text": body})
+    return sections
+
+RAG_SECTIONS = build_rag_sections()
+
+# Max tokens of background info per prompt (0 = always send all of RAG_CONTEXT)
+CONTEXT_TOKEN_BUDGET = int(os.environ.get("FLU_RAG_CONTEXT_TOKENS", "700"))
+
+def rag_context_for(user_text: str, in_system: bool) -> str:
+    if in_system:
+        return "See the background information in the system prompt."
+    if not CONTEXT_TOKEN_BUDGET:
+        return RAG_CONTEXT
+    packed = pack_context(user_text, RAG_SECTIONS, CONTEXT_TOKEN_BUDGET)
+    log_packed(packed, CONTEXT_TOKEN_BUDGET)
+    return packed.text
 
 # ----------------------------
 # System prompts for Claude
@@ -274,6 +175,31 @@ You MUST:
 - Include a brief reminder that you are not a doctor and that your answer is general information only.
 """
 
+# ----------------------------
+# Cached prompt prefix
+# ----------------------------
+# With prompt caching on, all of RAG_CONTEXT goes into the system prompt after
+# the instructions and is marked for caching: once cached it is cheap to send
+# in full, so the per-request packing above is skipped. That only pays off if
+# instructions + background reach MODEL's minimum cacheable prefix; below it
+# nothing is cached, and the packed context is sent instead. The blocks are
+# built once so the prefix is byte-identical on every request.
+MODEL = "claude-3-haiku-20240307"
+PROMPT_CACHING = os.environ.get("FLU_RAG_PROMPT_CACHING", "1") != "0"
+BACKGROUND_BLOCK = "=== Background information about flu (from WHO / CDC style sources) ===\n" + RAG_CONTEXT
+
+SYMPTOM_BACKGROUND_CACHED = PROMPT_CACHING and is_cacheable(MODEL, build_symptom_system_prompt(), BACKGROUND_BLOCK)
+INFO_BACKGROUND_CACHED = PROMPT_CACHING and is_cacheable(MODEL, build_info_system_prompt(), BACKGROUND_BLOCK)
+
+if SYMPTOM_BACKGROUND_CACHED:
+    SYMPTOM_SYSTEM = system_blocks(build_symptom_system_prompt(), BACKGROUND_BLOCK)
+else:
+    SYMPTOM_SYSTEM = build_symptom_system_prompt()
+if INFO_BACKGROUND_CACHED:
+    INFO_SYSTEM = system_blocks(build_info_system_prompt(), BACKGROUND_BLOCK)
+else:
+    INFO_SYSTEM = build_info_system_prompt()
+
 # ----------------------------
 # Message classification helpers
 # ----------------------------
@@ -285,12 +211,12 @@ def extract_name(user_text: str) -> str | None:
         return name
     return None
 
+# Whole words only: "hi" must not match inside "high" or "this"
+GREETINGS = ["hello", "hi", "hey", "salam", "assalam", "assalamu", "assalamu alaikum", "assalamualaikum"]
+GREETING_MATCHER = KeywordMatcher({g: g for g in GREETINGS})
+
 def is_greeting(user_text: str) -> bool:
-    lower = user_text.lower()
-    return any(
-        g in lower
-        for g in ["hello", "hi ", " hi", "hey", "salam", "assalam", "assalamu alaikum", "assalamualaikum"]
-    )
+    return bool(GREETING_MATCHER.find_values(user_text))
 
 def looks_like_flu_question(user_text: str) -> bool:
     lower = user_text.lower()
@@ -302,7 +228,11 @@ def looks_like_flu_question(user_text: str) -> bool:
 # ----------------------------
 # Talk to Claude with RAG (symptom mode)
 # ----------------------------
-def ask_flu_with_symptoms(user_text: str, symptoms: dict) -> str:
+@timed("build_prompt")
+def build_symptom_request(user_text: str, symptoms: dict) -> dict:
+    """
+    Keyword arguments for client.messages.create / client.messages.stream.
+    """
     score = flu_score(symptoms)
     label = interpret_flu_score(score)
     symptom_summary = format_symptom_summary(symptoms)
@@ -315,50 +245,65 @@ def ask_flu_with_symptoms(user_text: str, symptoms: dict) -> str:
     {symptom_summary}
 
     === Background information about flu (from WHO / CDC style sources) ===
-    {RAG_CONTEXT}
+    {rag_context_for(user_text, SYMPTOM_BACKGROUND_CACHED)}
 
     === User's symptom description ===
     {user_text}
     """
 
-    msg = client.messages.create(
-        model="claude-3-haiku-20240307",
+    return dict(
+        model=MODEL,
         max_tokens=600,
         temperature=0.2,
-        system=build_symptom_system_prompt(),
+        system=SYMPTOM_SYSTEM,
         messages=[
             {"role": "user", "content": rag_context}
         ],
     )
 
-    parts = []
-    for block in msg.content:
-        if block.type == "text":
-            parts.append(block.text)
-
-    return "\n".join(parts)
+def ask_flu_with_symptoms(user_text: str, symptoms: dict) -> str:
+    if use_rule_answer(symptoms, RULE_ANSWERS):
+        tag_request("rule")
+        return templated_symptom_answer(symptoms)
+    try:
+        msg = gateway.create(build_symptom_request(user_text, symptoms))
+    except LLMUnavailable:
+        return symptom_fallback_answer(symptoms)
+    return reply_text(msg)
 
 # ----------------------------
 # Talk to Claude in info / Q&A mode
 # ----------------------------
-def ask_flu_info(user_text: str) -> str:
+@timed("build_prompt")
+def build_info_request(user_text: str) -> dict:
     context = f"""
     === Flu background information ===
-    {RAG_CONTEXT}
+    {rag_context_for(user_text, INFO_BACKGROUND_CACHED)}
 
     === User question about flu ===
     {user_text}
     """
-    msg = client.messages.create(
-        model="claude-3-haiku-20240307",
+    return dict(
+        model=MODEL,
         max_tokens=500,
         temperature=0.2,
-        system=build_info_system_prompt(),
+        system=INFO_SYSTEM,
         messages=[
             {"role": "user", "content": context}
         ],
     )
 
+def ask_flu_info(user_text: str) -> str:
+    try:
+        msg = gateway.create(build_info_request(user_text))
+    except LLMUnavailable:
+        return info_fallback_answer(RAG_SECTIONS)
+    return reply_text(msg)
+
+# ----------------------------
+# Reading Claude's reply (whole or streamed)
+# ----------------------------
+def reply_text(msg) -> str:
     parts = []
     for block in msg.content:
         if block.type == "text":
@@ -366,18 +311,27 @@ def ask_flu_info(user_text: str) -> str:
 
     return "\n".join(parts)
 
+def stream_reply(request: dict):
+    """
+    Yield Claude's answer as text deltas while it is being generated.
+    """
+    yield from gateway.stream_text(request)
+
 # ----------------------------
 # Main bot logic
 # ----------------------------
-def ask_flu_bot(user_text: str) -> str:
-    user_text = user_text.strip()
+def route_message(user_text: str) -> tuple:
+    """
+    Decide how to answer a (stripped) message: ("reply", text) for canned answers,
+    ("symptoms", symptoms) or ("info", None) when Claude has to be asked.
+    """
     if not user_text:
-        return "Please type something so I can help you 😊"
+        return "reply", "Please type something so I can help you 😊"
 
     # 1) Check for introductions / greetings / general chat
     name = extract_name(user_text)
     if name is not None:
-        return (
+        return "reply", (
             f"Hello {name}! 👋\n"
             "I'm a simple flu helper bot. I can:\n"
             "- Explain what flu is and how it spreads.\n"
@@ -387,7 +341,7 @@ def ask_flu_bot(user_text: str) -> str:
         )
 
     if is_greeting(user_text):
-        return (
+        return "reply", (
             "Hi there! 👋 I'm a flu helper bot.\n\n"
             "I can explain basic information about seasonal flu and give you an estimate "
             "of whether your symptoms look like flu or not.\n"
@@ -395,32 +349,82 @@ def ask_flu_bot(user_text: str) -> str:
         )
 
     # 2) Parse symptoms from text
-    symptoms = parse_symptoms_from_text(user_text)
+    with stage("parse_symptoms"):
+        symptoms = parse_symptoms_from_text(user_text)
 
     # If no symptoms detected, maybe it's a flu question or general chat
     if not has_any_symptoms(symptoms):
         if looks_like_flu_question(user_text):
             # General flu info / Q&A with RAG
-            return ask_flu_info(user_text)
+            return "info", None
 
         # Fallback general reply
         lower = user_text.lower()
         if "disease" in lower or "issue" in lower or "what is wrong" in lower:
-            return (
+            return "reply", (
                 "I can't diagnose diseases or tell exactly what issue you have, "
                 "but I can help you see whether your symptoms look like flu or not.\n\n"
                 "Please describe your symptoms in a bit more detail (for example: "
                 "do you have fever, cough, sore throat, runny or stuffy nose, body aches, tiredness, etc.)."
             )
 
-        return (
+        return "reply", (
             "I'm mainly designed to talk about seasonal flu.\n"
             "You can ask me general questions like \"What are common flu symptoms?\" or "
             "you can describe your symptoms and I’ll tell you whether they look similar to flu or not."
         )
 
     # 3) We have some symptoms → do flu-likelihood explanation with Claude
-    return ask_flu_with_symptoms(user_text, symptoms)
+    return "symptoms", symptoms
+
+def ask_flu_bot(user_text: str) -> str:
+    with trace_request():
+        user_text = user_text.strip()
+        mode, payload = route_message(user_text)
+        tag_request(mode)
+        if mode == "symptoms":
+            return ask_flu_with_symptoms(user_text, payload)
+        if mode == "info":
+            return ask_flu_info(user_text)
+        return payload
+
+def ask_flu_bot_stream(user_text: str):
+    """
+    Same as ask_flu_bot, but yields the answer in pieces as Claude writes it.
+    """
+    with trace_request():
+        user_text = user_text.strip()
+        mode, payload = route_message(user_text)
+        tag_request(mode)
+        if mode == "symptoms" and use_rule_answer(payload, RULE_ANSWERS):
+            tag_request("rule")
+            yield templated_symptom_answer(payload)
+            return
+        if mode == "symptoms":
+            request = build_symptom_request(user_text, payload)
+            fallback = lambda: symptom_fallback_answer(payload)
+        elif mode == "info":
+            request = build_info_request(user_text)
+            fallback = lambda: info_fallback_answer(RAG_SECTIONS)
+        else:
+            yield payload
+            return
+
+        started = False
+        try:
+            for text in stream_reply(request):
+                started = True
+                yield text
+        except LLMUnavailable:
+            if started:
+                raise
+            yield fallback()
+
+# ----------------------------
+# Metrics (FLU_RAG_METRICS=1, see metrics.py)
+# ----------------------------
+REGISTRY.add_collector("claude", lambda: dict(USAGE_TOTALS), kind="counter")
+start_exporters()
 
 # ----------------------------
 # CLI main loop
@@ -439,8 +443,10 @@ def main():
             break
 
         try:
-            reply = ask_flu_bot(user)
-            print("\nBot:\n" + reply + "\n")
+            print("\nBot:")
+            for chunk in ask_flu_bot_stream(user):
+                print(chunk, end="", flush=True)
+            print("\n")
         except Exception as e:
             print(f"\n[Error talking to Claude: {e}]\n")
 
@@ -1,12 +1,46 @@
 import os
-import json
 import re
-import textwrap
 
-import anthropic
-import chromadb
-from chromadb.utils import embedding_functions
-from typing import Optional, List, Dict, Any
+from typing import TYPE_CHECKING, Callable, Optional, List, Dict, Any, Iterable, Iterator, Tuple
+
+from chunking import collapse_to_parents
+from context_packing import log_packed, pack_context
+from corpus_loader import iter_corpus
+from keyword_matcher import KeywordMatcher
+from llm_gateway import LLMGateway, LLMUnavailable
+from metrics import REGISTRY, incr, stage, start_exporters, tag_request, timed, trace_request
+from prompt_cache import USAGE_TOTALS, system_blocks
+from retrieval_filters import backfill, categories_for_request, category_where
+from response_cache import ResponseCache, info_cache_key, symptom_cache_key
+from rule_based_answers import (
+    info_fallback_answer,
+    rule_answer_policy,
+    symptom_fallback_answer,
+    templated_symptom_answer,
+    use_rule_answer,
+)
+from symptoms import (
+    flu_score,
+    format_symptom_summary,
+    has_any_symptoms,
+    interpret_flu_score,
+    parse_symptoms_from_text,
+)
+from vector_store import (
+    add_corpus_listener,
+    embedding_cache_stats,
+    get_embedding_function,
+    get_model_embedding_function,
+    open_vector_store,
+)
+from warmup import BackgroundTask, serve_readiness
+
+# anthropic, chromadb and numpy take seconds to import, so they are only
+# imported on the code paths that use them; greetings, name intros and
+# symptom parsing never load them.
+if TYPE_CHECKING:
+    from lexical_index import BM25Index
+    from symptom_embedding import SymptomEmbeddingExtractor
 
 # ==============================
 # Anthropic (Claude) client
@@ -15,89 +49,178 @@ API_KEY = os.environ.get("ANTHROPIC_API_KEY")
 if not API_KEY:
     raise RuntimeError("ANTHROPIC_API_KEY is not set. Please set it in your environment.")
 
-client = anthropic.Anthropic(api_key=API_KEY)
+# Pooled client with deadlines, retries and a circuit breaker (llm_gateway.py)
+GATEWAY = LLMGateway(api_key=API_KEY)
+
+# When symptom messages are answered from rule_based_answers templates instead of
+# Claude: "fallback" (Claude unavailable), "confident" (also clear-cut labels), "always"
+RULE_ANSWERS = rule_answer_policy(os.environ.get("FLU_RAG_RULE_ANSWERS", "fallback"))
+
+# Symptom-mode answers keyed by (detected symptoms, label, retrieved doc ids).
+# FLU_RAG_RESPONSE_CACHE_DB points at an SQLite file to keep them across restarts.
+RESPONSE_CACHE = ResponseCache(
+    max_entries=int(os.environ.get("FLU_RAG_RESPONSE_CACHE_SIZE", "2048")),
+    ttl_seconds=float(os.environ.get("FLU_RAG_RESPONSE_CACHE_TTL", "86400")),
+    path=os.environ.get("FLU_RAG_RESPONSE_CACHE_DB"),
+    require_corpus_version=True,
+)
+
+# Info-mode answers keyed by the normalized question (FAQ-style traffic).
+INFO_CACHE = ResponseCache(
+    max_entries=int(os.environ.get("FLU_RAG_INFO_CACHE_SIZE", "512")),
+    ttl_seconds=float(os.environ.get("FLU_RAG_RESPONSE_CACHE_TTL", "86400")),
+    path=os.environ.get("FLU_RAG_INFO_CACHE_DB"),
+    require_corpus_version=True,
+)
+
+# Both caches are emptied when the corpus they were built from changes, and
+# serve nothing until the index build has reported the current corpus.
+add_corpus_listener(RESPONSE_CACHE.set_corpus_version)
+add_corpus_listener(INFO_CACHE.set_corpus_version)
 
 # ==============================
 # Load corpus and build vector DB
 # ==============================
-def load_corpus(path: str = "flu_rag_corpus.jsonl") -> List[Dict[str, Any]]:
-    docs: List[Dict[str, Any]] = []
+# Point FLU_RAG_CORPUS at a chunk file (python chunking.py) to retrieve by chunk
+CORPUS_PATH = os.environ.get("FLU_RAG_CORPUS", "flu_rag_corpus.jsonl")
+
+
+def require_corpus(path: str = CORPUS_PATH) -> str:
     if not os.path.exists(path):
         raise FileNotFoundError(
             f"{path} not found. Make sure flu_rag_corpus.jsonl is in the same folder as app1.py."
         )
-    with open(path, "r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            docs.append(json.loads(line))
-    return docs
+    return path
 
 
-def build_vector_store(docs: List[Dict[str, Any]]):
+def build_vector_store(docs: Iterable[Dict[str, Any]], corpus_path: str = CORPUS_PATH):
     """
-    Build an in-memory Chroma collection with embeddings for all docs.
+    Build the Chroma collection with embeddings for all docs (a generator is
+    consumed one sync batch at a time).
+
+    In-memory by default; set FLU_RAG_INDEX_DIR to keep it on disk and reopen it
+    without re-embedding while the corpus file is unchanged.
     """
-    chroma_client = chromadb.Client()
-    embed_fn = embedding_functions.DefaultEmbeddingFunction()
-    collection = chroma_client.create_collection(
-        name="flu_corpus",
-        embedding_function=embed_fn,
-    )
+    return open_vector_store(docs, corpus_path)
 
-    ids = [d["id"] for d in docs]
-    texts = [d["text"] for d in docs]
-    metadatas = [
-        {
-            "category": d.get("category", ""),
-            "title": d.get("title", ""),
-            # Chroma metadata values must be primitive types, not lists
-            "tags": ", ".join(d.get("tags", [])) if isinstance(d.get("tags"), list) else str(d.get("tags", "")),
-        }
-        for d in docs
-    ]
-
-    collection.add(
-        ids=ids,
-        documents=texts,
-        metadatas=metadatas,
-    )
-    return collection
 
+def build_search_index() -> Tuple[Any, "BM25Index"]:
+    """
+    Stream the corpus into (vector collection, BM25 index); neither keeps the
+    docs in memory. Also runs the embedding model once, so a reopened on-disk
+    index does not leave the model load to the first query.
+    """
+    from lexical_index import BM25Index
 
-# 🔥 Build corpus + vector collection at import time
-CORPUS_DOCS = load_corpus()
-VECTOR_COLLECTION = build_vector_store(CORPUS_DOCS)
+    path = require_corpus()
+    # BM25 reads every line, so it is the pass that logs bad lines
+    lexical_index = BM25Index(path)
+    collection = build_vector_store(iter_corpus(path, bad_lines=[]), path)
+    get_model_embedding_function()(["flu"])
+    return collection, lexical_index
 
 
-def retrieve_docs(query: str, n_results: int = 4) -> List[Dict[str, Any]]:
+# 🔥 Built on a background thread started at the bottom of this module
+# (FLU_RAG_WARMUP=0: built by the first retrieval instead).
+SEARCH_INDEX = BackgroundTask("search-index", build_search_index)
+WARMUP = os.environ.get("FLU_RAG_WARMUP", "1") != "0"
+
+
+def is_ready() -> bool:
+    """True once the corpus is indexed and retrieval will not block."""
+    return SEARCH_INDEX.ready
+
+# "hybrid" (default) fuses BM25 hits with the vector hits; "vector" is Chroma only.
+RETRIEVER = os.environ.get("FLU_RAG_RETRIEVER", "hybrid")
+
+
+@timed("retrieve")
+def retrieve_docs(
+    query: str, n_results: int = 4, categories: Optional[List[str]] = None
+) -> List[Dict[str, Any]]:
     """
-    Semantic search over the vector DB for the most relevant flu docs.
+    Search for the most relevant flu docs: semantic search over the vector DB,
+    fused with exact-term BM25 hits by reciprocal rank (unless RETRIEVER is "vector").
+    `categories` restricts both searches to those corpus categories (a Chroma
+    `where` clause); if that yields fewer than n_results docs, an unfiltered
+    search backfills the rest. Chunk hits are merged back into one hit per
+    parent doc.
     """
-    res = VECTOR_COLLECTION.query(
-        query_texts=[query],
-        n_results=n_results,
-    )
-    out: List[Dict[str, Any]] = []
-    if not res["ids"] or not res["ids"][0]:
-        return out
+    return retrieve_docs_batch([query], n_results, categories)[0]
 
-    for i in range(len(res["ids"][0])):
-        out.append(
+
+def retrieve_docs_batch(
+    queries: List[str], n_results: int = 4, categories: Optional[List[str]] = None
+) -> List[List[Dict[str, Any]]]:
+    """
+    retrieve_docs for several queries that share the same categories. The
+    queries are embedded and searched in one Chroma call.
+    """
+    results = _search_batch(queries, n_results, categories)
+    if categories:
+        short = [i for i, hits in enumerate(results) if len(hits) < n_results]
+        if short:
+            extra = _search_batch([queries[i] for i in short], n_results, None)
+            for i, hits in zip(short, extra):
+                results[i] = collapse_to_parents(backfill(results[i], hits), n_results)
+    return results
+
+
+def _search_batch(
+    queries: List[str], n_results: int, categories: Optional[List[str]]
+) -> List[List[Dict[str, Any]]]:
+    from lexical_index import fuse_with_lexical
+
+    # Waits only while the warm-up is still running
+    collection, lexical_index = SEARCH_INDEX.result()
+    hybrid = RETRIEVER == "hybrid"
+    # Extra candidates leave room for fusion and for chunks collapsing into one doc
+    depth = n_results * 2
+    # Query embedding + Chroma search
+    with stage("vector_search"):
+        res = collection.query(
+            query_texts=list(queries),
+            n_results=depth,
+            where=category_where(categories),
+        )
+
+    results: List[List[Dict[str, Any]]] = []
+    for q, query in enumerate(queries):
+        ids = res["ids"][q] if res["ids"] else []
+        out: List[Dict[str, Any]] = [
             {
-                "id": res["ids"][0][i],
-                "text": res["documents"][0][i],
-                "metadata": res["metadatas"][0][i],
+                "id": ids[i],
+                "text": res["documents"][q][i],
+                "metadata": res["metadatas"][q][i],
             }
-        )
-    return out
+            for i in range(len(ids))
+        ]
+        if hybrid:
+            with stage("lexical_fusion"):
+                out = fuse_with_lexical(query, out, lexical_index, depth, depth, categories)
+        # Several chunks of one doc count as one hit
+        results.append(collapse_to_parents(out, n_results))
+    return results
 
 
-def build_rag_context_from_docs(docs: List[Dict[str, Any]]) -> str:
+# Max tokens of retrieved text per prompt (0 = paste whole docs).
+CONTEXT_TOKEN_BUDGET = int(os.environ.get("FLU_RAG_CONTEXT_TOKENS", "700"))
+
+
+def build_rag_context_from_docs(
+    docs: List[Dict[str, Any]], query: str = "", token_budget: int = 0
+) -> str:
     """
     Turn retrieved docs into a context string for the prompt.
+
+    With a token_budget, only the sentences most relevant to query are kept
+    (see context_packing.pack_context) and the tokens used are logged.
     """
+    if token_budget:
+        packed = pack_context(query, docs, token_budget)
+        log_packed(packed, token_budget)
+        return packed.text or "No extra background documents were retrieved."
+
     chunks = []
     for d in docs:
         meta = d.get("metadata", {})
@@ -113,146 +236,34 @@ def build_rag_context_from_docs(docs: List[Dict[str, Any]]) -> str:
 
 
 # ==============================
-# Symptom fields & parsing
+# Symptom detection
 # ==============================
-SYMPTOM_FIELDS = [
-    "COUGH",
-    "MUSCLE_ACHES",
-    "TIREDNESS",
-    "SORE_THROAT",
-    "RUNNY_NOSE",
-    "STUFFY_NOSE",
-    "FEVER",
-    "NAUSEA",
-    "VOMITING",
-    "DIARRHEA",
-    "SHORTNESS_OF_BREATH",
-    "DIFFICULTY_BREATHING",
-    "LOSS_OF_TASTE",
-    "LOSS_OF_SMELL",
-    "ITCHY_NOSE",
-    "ITCHY_EYES",
-    "ITCHY_MOUTH",
-    "ITCHY_INNER_EAR",
-    "SNEEZING",
-    "PINK_EYE",
-]
-
-KEYWORD_MAP = {
-    "cough": "COUGH",
-    "coughing": "COUGH",
-    "body aches": "MUSCLE_ACHES",
-    "body ache": "MUSCLE_ACHES",
-    "muscle ache": "MUSCLE_ACHES",
-    "muscle pain": "MUSCLE_ACHES",
-    "tired": "TIREDNESS",
-    "fatigue": "TIREDNESS",
-    "exhausted": "TIREDNESS",
-    "sore throat": "SORE_THROAT",
-    "throat pain": "SORE_THROAT",
-    "runny nose": "RUNNY_NOSE",
-    "stuffy nose": "STUFFY_NOSE",
-    "blocked nose": "STUFFY_NOSE",
-    "fever": "FEVER",
-    "chills": "FEVER",
-    "nausea": "NAUSEA",
-    "vomit": "VOMITING",
-    "vomiting": "VOMITING",
-    "diarrhea": "DIARRHEA",
-    "shortness of breath": "SHORTNESS_OF_BREATH",
-    "difficulty breathing": "DIFFICULTY_BREATHING",
-    "breathing is hard": "DIFFICULTY_BREATHING",
-    "loss of taste": "LOSS_OF_TASTE",
-    "cant taste": "LOSS_OF_TASTE",
-    "can't taste": "LOSS_OF_TASTE",
-    "loss of smell": "LOSS_OF_SMELL",
-    "cant smell": "LOSS_OF_SMELL",
-    "can't smell": "LOSS_OF_SMELL",
-    "itchy nose": "ITCHY_NOSE",
-    "itchy eyes": "ITCHY_EYES",
-    "itchy mouth": "ITCHY_MOUTH",
-    "itchy ear": "ITCHY_INNER_EAR",
-    "itchy ears": "ITCHY_INNER_EAR",
-    "sneezing": "SNEEZING",
-    "sneeze": "SNEEZING",
-    "pink eye": "PINK_EYE",
-    "red eye": "PINK_EYE",
-}
-
-
-def parse_symptoms_from_text(user_text: str) -> Dict[str, int]:
-    symptoms = {field: 0 for field in SYMPTOM_FIELDS}
-    text = user_text.lower()
-    for kw, field in KEYWORD_MAP.items():
-        if kw in text:
-            symptoms[field] = 1
-    return symptoms
+# "keywords" (default) or "hybrid": keywords plus embedding similarity, which
+# also catches paraphrases like "my whole body hurts" or "burning up".
+SYMPTOM_EXTRACTOR = os.environ.get("FLU_RAG_SYMPTOM_EXTRACTOR", "keywords")
+_symptom_embedder: Optional["SymptomEmbeddingExtractor"] = None
+
 
+def get_symptom_embedder() -> "SymptomEmbeddingExtractor":
+    global _symptom_embedder
+    if _symptom_embedder is None:
+        from symptom_embedding import DEFAULT_THRESHOLD, SymptomEmbeddingExtractor
 
-def has_any_symptoms(symptoms: Dict[str, int]) -> bool:
-    return any(symptoms.values())
+        _symptom_embedder = SymptomEmbeddingExtractor(
+            get_embedding_function(),
+            threshold=float(os.environ.get("FLU_RAG_SYMPTOM_THRESHOLD", DEFAULT_THRESHOLD)),
+        )
+    return _symptom_embedder
 
 
-def flu_score(symptoms: Dict[str, int]) -> float:
-    """
-    Rule-based 'flu-likeness' score in [0, 1].
-    """
-    score = 0.0
-
-    if symptoms.get("FEVER", 0):
-        score += 0.35
-    if symptoms.get("COUGH", 0):
-        score += 0.2
-    if symptoms.get("MUSCLE_ACHES", 0) or symptoms.get("TIREDNESS", 0):
-        score += 0.2
-    if symptoms.get("SORE_THROAT", 0):
-        score += 0.1
-    if symptoms.get("RUNNY_NOSE", 0) or symptoms.get("STUFFY_NOSE", 0):
-        score += 0.1
-
-    if symptoms.get("NAUSEA", 0) or symptoms.get("VOMITING", 0) or symptoms.get("DIARRHEA", 0):
-        score += 0.05
-
-    allergy_flags = [
-        "ITCHY_NOSE",
-        "ITCHY_EYES",
-        "ITCHY_MOUTH",
-        "ITCHY_INNER_EAR",
-        "SNEEZING",
-        "PINK_EYE",
-    ]
-    if any(symptoms.get(f, 0) for f in allergy_flags):
-        score -= 0.15
-
-    score = max(0.0, min(1.0, score))
-    return score
-
-
-def interpret_flu_score(score: float) -> str:
-    if score >= 0.7:
-        return "LIKELY"
-    elif score >= 0.4:
-        return "POSSIBLE"
-    else:
-        return "UNLIKELY"
-
-
-def format_symptom_summary(symptoms: Dict[str, int]) -> str:
-    present = [k for k, v in symptoms.items() if v == 1]
-    absent = [k for k, v in symptoms.items() if v == 0]
-
-    def nice(lst: List[str]) -> str:
-        return ", ".join(lst) if lst else "None detected from keywords."
-
-    return textwrap.dedent(
-        f"""
-        Parsed symptoms from your message
-        (1 = keyword detected, 0 = no keyword):
-
-        Present (1): {nice(present)}
-        Absent (0): {nice(absent)}
-        """
-    ).strip()
+@timed("parse_symptoms")
+def detect_symptoms(user_text: str) -> Dict[str, int]:
+    symptoms = parse_symptoms_from_text(user_text)
+    if SYMPTOM_EXTRACTOR == "hybrid":
+        for field, flag in get_symptom_embedder().extract(user_text).items():
+            if flag:
+                symptoms[field] = 1
+    return symptoms
 
 
 # ==============================
@@ -266,10 +277,13 @@ def extract_name(user_text: str) -> Optional[str]:
     return None
 
 
+# Whole words only: "hi" must not match inside "high" or "this"
+GREETINGS = ["hello", "hi", "hey", "salam", "assalam", "assalamu", "assalamu alaikum", "assalamualaikum"]
+GREETING_MATCHER = KeywordMatcher({g: g for g in GREETINGS})
+
+
 def is_greeting(user_text: str) -> bool:
-    lower = user_text.lower()
-    greetings = ["hello", "hi ", " hi", "hey", "salam", "assalam", "assalamu alaikum", "assalamualaikum"]
-    return any(g in lower for g in greetings)
+    return bool(GREETING_MATCHER.find_values(user_text))
 
 
 def looks_like_flu_question(user_text: str) -> bool:
@@ -333,16 +347,31 @@ Use ONLY this background information to answer:
 """
 
 
+MODEL = "claude-3-haiku-20240307"
+
+# Built once so the cached prefix is byte-identical on every request.
+# FLU_RAG_PROMPT_CACHING=0 sends them without a cache breakpoint, and a
+# prompt shorter than MODEL's minimum cacheable prefix never gets one.
+PROMPT_CACHING = os.environ.get("FLU_RAG_PROMPT_CACHING", "1") != "0"
+SYMPTOM_SYSTEM = system_blocks(build_symptom_system_prompt(), cache=PROMPT_CACHING, model=MODEL)
+INFO_SYSTEM = system_blocks(build_info_system_prompt(), cache=PROMPT_CACHING, model=MODEL)
+
+
 # ==============================
 # Talk to Claude (RAG)
 # ==============================
-def ask_flu_with_symptoms(user_text: str, symptoms: Dict[str, int]) -> str:
+@timed("build_prompt")
+def build_symptom_request(
+    user_text: str, symptoms: Dict[str, int], retrieved: List[Dict[str, Any]]
+) -> Dict[str, Any]:
+    """
+    Keyword arguments for client.messages.create / client.messages.stream in symptom mode.
+    """
     score = flu_score(symptoms)
     label = interpret_flu_score(score)
     symptom_summary = format_symptom_summary(symptoms)
 
-    retrieved = retrieve_docs(user_text, n_results=5)
-    rag_context = build_rag_context_from_docs(retrieved)
+    rag_context = build_rag_context_from_docs(retrieved, user_text, CONTEXT_TOKEN_BUDGET)
 
     prompt = f"""
     === Symptom-based flu assessment ===
@@ -358,24 +387,36 @@ def ask_flu_with_symptoms(user_text: str, symptoms: Dict[str, int]) -> str:
     {user_text}
     """
 
-    msg = client.messages.create(
-        model="claude-3-haiku-20240307",
+    return dict(
+        model=MODEL,
         max_tokens=700,
         temperature=0.2,
-        system=build_symptom_system_prompt(),
+        system=SYMPTOM_SYSTEM,
         messages=[{"role": "user", "content": prompt}],
     )
 
-    parts = []
-    for block in msg.content:
-        if block.type == "text":
-            parts.append(block.text)
-    return "\n".join(parts)
 
+def prepare_symptom_request(user_text: str, symptoms: Dict[str, int]) -> Tuple[Dict[str, Any], str]:
+    """
+    Retrieve docs and build the symptom-mode request plus its response-cache key.
+    """
+    label = interpret_flu_score(flu_score(symptoms))
+    retrieved = retrieve_docs(
+        user_text, n_results=5, categories=categories_for_request("symptoms", user_text)
+    )
+    key = symptom_cache_key(symptoms, label, [d["id"] for d in retrieved])
+    return build_symptom_request(user_text, symptoms, retrieved), key
 
-def ask_flu_info(user_text: str) -> str:
-    retrieved = retrieve_docs(user_text, n_results=5)
-    rag_context = build_rag_context_from_docs(retrieved)
+
+def build_info_request(user_text: str) -> Dict[str, Any]:
+    """
+    Keyword arguments for client.messages.create / client.messages.stream in info mode.
+    """
+    retrieved = retrieve_docs(
+        user_text, n_results=5, categories=categories_for_request("info", user_text)
+    )
+    with stage("build_prompt"):
+        rag_context = build_rag_context_from_docs(retrieved, user_text, CONTEXT_TOKEN_BUDGET)
 
     prompt = f"""
     === Retrieved background documents about flu ===
@@ -385,14 +426,16 @@ def ask_flu_info(user_text: str) -> str:
     {user_text}
     """
 
-    msg = client.messages.create(
-        model="claude-3-haiku-20240307",
+    return dict(
+        model=MODEL,
         max_tokens=600,
         temperature=0.2,
-        system=build_info_system_prompt(),
+        system=INFO_SYSTEM,
         messages=[{"role": "user", "content": prompt}],
     )
 
+
+def reply_text(msg) -> str:
     parts = []
     for block in msg.content:
         if block.type == "text":
@@ -400,18 +443,95 @@ def ask_flu_info(user_text: str) -> str:
     return "\n".join(parts)
 
 
+def stream_reply(request: Dict[str, Any]) -> Iterator[str]:
+    """
+    Yield Claude's answer as text deltas while it is being generated.
+    """
+    yield from GATEWAY.stream_text(request)
+
+
+def fallback_reply(mode: str, user_text: str, symptoms: Optional[Dict[str, int]] = None) -> str:
+    """
+    Rule-based answer for when Claude is unavailable (never cached).
+    """
+    incr("fallback_answers")
+    if mode == "symptoms":
+        return symptom_fallback_answer(symptoms)
+    retrieved = retrieve_docs(user_text, n_results=3, categories=categories_for_request(mode, user_text))
+    return info_fallback_answer(retrieved)
+
+
+def stream_and_cache(
+    request: Dict[str, Any], cache: ResponseCache, key: str, fallback: Callable[[], str]
+) -> Iterator[str]:
+    """
+    Stream Claude's answer and cache it once complete. If Claude is unavailable
+    before any text was sent, yield fallback() instead.
+    """
+    parts = []
+    try:
+        for text in stream_reply(request):
+            parts.append(text)
+            yield text
+    except LLMUnavailable:
+        if parts:
+            raise
+        yield fallback()
+        return
+    cache.put(key, "".join(parts))
+
+
+def ask_flu_with_symptoms(user_text: str, symptoms: Dict[str, int]) -> str:
+    if use_rule_answer(symptoms, RULE_ANSWERS):
+        tag_request("rule")
+        return templated_symptom_answer(symptoms)
+
+    request, key = prepare_symptom_request(user_text, symptoms)
+    cached = RESPONSE_CACHE.get(key)
+    if cached is not None:
+        return cached
+
+    try:
+        msg = GATEWAY.create(request)
+    except LLMUnavailable:
+        return fallback_reply("symptoms", user_text, symptoms)
+    reply = reply_text(msg)
+    RESPONSE_CACHE.put(key, reply)
+    return reply
+
+
+def ask_flu_info(user_text: str) -> str:
+    key = info_cache_key(user_text)
+    cached = INFO_CACHE.get(key)
+    if cached is not None:
+        return cached
+
+    try:
+        msg = GATEWAY.create(build_info_request(user_text))
+    except LLMUnavailable:
+        return fallback_reply("info", user_text)
+    reply = reply_text(msg)
+    INFO_CACHE.put(key, reply)
+    return reply
+
+
 # ==============================
 # Main bot logic
 # ==============================
-def ask_flu_bot(user_text: str) -> str:
-    user_text = user_text.strip()
+def route_message(user_text: str) -> Tuple[str, Any]:
+    """
+    Decide how to answer a (stripped) user message.
+
+    Returns ("reply", text) when a canned answer is enough, or
+    ("symptoms", symptoms) / ("info", None) when Claude has to be asked.
+    """
     if not user_text:
-        return "Please type something so I can help you 😊"
+        return "reply", "Please type something so I can help you 😊"
 
     # 1) Name introduction
     name = extract_name(user_text)
     if name is not None:
-        return (
+        return "reply", (
             f"Hello {name}! 👋\n"
             "I'm a flu helper bot. I can:\n"
             "- Explain what seasonal flu is and how it spreads.\n"
@@ -423,7 +543,7 @@ def ask_flu_bot(user_text: str) -> str:
 
     # 2) Greeting / small talk
     if is_greeting(user_text):
-        return (
+        return "reply", (
             "Hi there! 👋 I'm a flu-focused chatbot.\n\n"
             "You can:\n"
             "- Ask general questions like \"What are common flu symptoms?\" or \"How does flu spread?\"\n"
@@ -431,19 +551,19 @@ def ask_flu_bot(user_text: str) -> str:
         )
 
     # 3) Symptom parsing
-    symptoms = parse_symptoms_from_text(user_text)
+    symptoms = detect_symptoms(user_text)
 
     if has_any_symptoms(symptoms):
         # Symptom mode: flu-likeness explanation + RAG
-        return ask_flu_with_symptoms(user_text, symptoms)
+        return "symptoms", symptoms
 
     # 4) No symptoms detected → maybe a flu info question?
     if looks_like_flu_question(user_text):
-        return ask_flu_info(user_text)
+        return "info", None
 
     lower = user_text.lower()
     if "disease" in lower or "issue" in lower or "what is wrong" in lower:
-        return (
+        return "reply", (
             "I can't diagnose exactly what disease you have, "
             "but I can help you see whether your symptoms resemble flu or not.\n\n"
             "Please describe your symptoms in more detail (for example: "
@@ -451,7 +571,7 @@ def ask_flu_bot(user_text: str) -> str:
         )
 
     # 5) Generic fallback
-    return (
+    return "reply", (
         "I'm mainly designed to talk about seasonal flu.\n"
         "You can ask me things like \"What are the symptoms of flu?\" or "
         "\"How can I prevent flu?\".\n"
@@ -460,6 +580,126 @@ def ask_flu_bot(user_text: str) -> str:
     )
 
 
+def ask_flu_bot(user_text: str) -> str:
+    with trace_request():
+        user_text = user_text.strip()
+        mode, payload = route_message(user_text)
+        tag_request(mode)
+        if mode == "symptoms":
+            return ask_flu_with_symptoms(user_text, payload)
+        if mode == "info":
+            return ask_flu_info(user_text)
+        return payload
+
+
+def ask_flu_bot_stream(user_text: str) -> Iterator[str]:
+    """
+    Same routing as ask_flu_bot, but yields the answer piece by piece as Claude
+    generates it. Canned replies are yielded as a single chunk.
+    """
+    with trace_request():
+        user_text = user_text.strip()
+        mode, payload = route_message(user_text)
+        tag_request(mode)
+        if mode == "symptoms":
+            if use_rule_answer(payload, RULE_ANSWERS):
+                tag_request("rule")
+                yield templated_symptom_answer(payload)
+                return
+            request, key = prepare_symptom_request(user_text, payload)
+            cached = RESPONSE_CACHE.get(key)
+            if cached is not None:
+                yield cached
+                return
+            yield from stream_and_cache(
+                request, RESPONSE_CACHE, key, lambda: fallback_reply("symptoms", user_text, payload)
+            )
+        elif mode == "info":
+            key = info_cache_key(user_text)
+            cached = INFO_CACHE.get(key)
+            if cached is not None:
+                yield cached
+                return
+            yield from stream_and_cache(
+                build_info_request(user_text), INFO_CACHE, key, lambda: fallback_reply("info", user_text)
+            )
+        else:
+            yield payload
+
+
+async def ask_flu_bot_async(user_text: str, fallback: bool = True) -> str:
+    """
+    asyncio version of ask_flu_bot with the same routing.
+
+    Everything that blocks runs in a worker thread so the event loop stays
+    free: routing (symptom parsing, which runs the embedding model in hybrid
+    mode), retrieval (embedding + Chroma search) and the cache reads and
+    writes (SQLite when persisted). Claude is called through the AsyncAnthropic
+    client, so many conversations can be served concurrently from one process.
+
+    With fallback=False, LLMUnavailable is raised instead of returning the
+    shorter automatic answer, for callers that store replies and can retry
+    (batch_runner.py).
+    """
+    import asyncio  # already loaded by whoever runs the event loop
+
+    with trace_request():
+        user_text = user_text.strip()
+        mode, payload = await asyncio.to_thread(route_message, user_text)
+        tag_request(mode)
+        if mode == "symptoms":
+            if use_rule_answer(payload, RULE_ANSWERS):
+                tag_request("rule")
+                return templated_symptom_answer(payload)
+            cache = RESPONSE_CACHE
+            request, key = await asyncio.to_thread(prepare_symptom_request, user_text, payload)
+        elif mode == "info":
+            cache = INFO_CACHE
+            key = info_cache_key(user_text)
+            request = None
+        else:
+            return payload
+
+        cached = await asyncio.to_thread(cache.get, key)
+        if cached is not None:
+            return cached
+        if request is None:
+            request = await asyncio.to_thread(build_info_request, user_text)
+
+        try:
+            msg = await GATEWAY.acreate(request)
+        except LLMUnavailable:
+            if not fallback:
+                raise
+            return await asyncio.to_thread(fallback_reply, mode, user_text, payload)
+        reply = reply_text(msg)
+        await asyncio.to_thread(cache.put, key, reply)
+        return reply
+
+
+# ==============================
+# Metrics
+# ==============================
+# Read only when /metrics is scraped or the summary line is logged
+REGISTRY.add_collector("response_cache", RESPONSE_CACHE.stats)
+REGISTRY.add_collector("info_cache", INFO_CACHE.stats)
+REGISTRY.add_collector("embedding_cache", embedding_cache_stats)
+REGISTRY.add_collector("claude", lambda: dict(USAGE_TOTALS), kind="counter")
+start_exporters()
+
+
+# ==============================
+# Warm-up
+# ==============================
+# Started last so everything the build touches is already defined. Set
+# FLU_RAG_READY_PORT to answer readiness probes (503 until the index is built).
+if WARMUP:
+    SEARCH_INDEX.start()
+READY_PORT = int(os.environ.get("FLU_RAG_READY_PORT", "0"))
+if READY_PORT:
+    serve_readiness(READY_PORT, is_ready)
+
+
 # ==============================
 # CLI main loop
 # ==============================
@@ -477,8 +717,10 @@ def main():
             break
 
         try:
-            reply = ask_flu_bot(user)
-            print("\nBot:\n" + reply + "\n")
+            print("\nBot:")
+            for chunk in ask_flu_bot_stream(user):
+                print(chunk, end="", flush=True)
+            print("\n")
         except Exception as e:
             print(f"\n[Error talking to Claude: {e}]\n")
 
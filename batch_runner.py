@@ -0,0 +1,165 @@
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import time
+from typing import Any, Dict, Iterator, List, Set, Tuple
+
+from app1 import ask_flu_bot_async
+
+# ==============================
+# Batch replay of user messages through ask_flu_bot
+# ==============================
+# Input: JSONL, one request per line, e.g. {"id": "q-001", "message": "I have fever and cough"}
+# Output: JSONL, one result per line, appended as soon as each request finishes.
+# Records without an id are keyed by their line number, so a rerun with the same
+# input and output files skips everything that already finished. Requests that
+# failed, including those Claude was unavailable for, are written with an
+# "error" field and retried by the next run (whose result is appended too, so
+# the last line for an id wins). Input lines that are not a JSON object are
+# logged with their line number and skipped.
+
+logger = logging.getLogger(__name__)
+
+
+def read_requests(path: str, field: str) -> Iterator[Tuple[str, int, str]]:
+    """
+    Stream (request_id, line_no, message) from the input JSONL.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                logger.warning("Skipping %s line %d: not valid JSON (%s)", path, line_no, e)
+                continue
+            if not isinstance(record, dict):
+                logger.warning("Skipping %s line %d: not a JSON object", path, line_no)
+                continue
+            request_id = str(record.get("id") or record.get("request_id") or f"line-{line_no}")
+            yield request_id, line_no, str(record.get(field, ""))
+
+
+def finished_ids(out_path: str) -> Set[str]:
+    """
+    Ids answered by an earlier (possibly crashed) run. Error results do not
+    count, so those requests are redone.
+    """
+    done: Set[str] = set()
+    if not os.path.exists(out_path):
+        return done
+    with open(out_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+                request_id = result["id"]
+            except (ValueError, KeyError, TypeError):
+                # A crash can leave a half-written last line; that request is redone.
+                continue
+            if result.get("error"):
+                continue
+            done.add(request_id)
+    return done
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """
+    Nearest-rank percentile; 0.0 for an empty list.
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100.0 * len(ordered)))
+    return ordered[rank - 1]
+
+
+async def run_batch(
+    in_path: str,
+    out_path: str,
+    field: str = "message",
+    concurrency: int = 8,
+) -> Dict[str, Any]:
+    """
+    Send every not-yet-finished request through ask_flu_bot_async with at most
+    `concurrency` in flight, appending results to out_path as they complete.
+    """
+    done = finished_ids(out_path)
+    queue: asyncio.Queue = asyncio.Queue(maxsize=concurrency * 2)
+    latencies: List[float] = []
+    errors = 0
+
+    out = open(out_path, "a", encoding="utf-8")
+
+    async def worker():
+        nonlocal errors
+        while True:
+            item = await queue.get()
+            if item is None:
+                queue.task_done()
+                return
+            request_id, line_no, message = item
+            result: Dict[str, Any] = {"id": request_id, "line": line_no, "input": message}
+            start = time.perf_counter()
+            try:
+                # No automatic stand-in answer: it would count as finished
+                result["reply"] = await ask_flu_bot_async(message, fallback=False)
+            except Exception as e:
+                result["error"] = f"{type(e).__name__}: {e}"
+                errors += 1
+            elapsed = time.perf_counter() - start
+            result["latency_ms"] = round(elapsed * 1000, 1)
+            latencies.append(elapsed)
+            out.write(json.dumps(result, ensure_ascii=False) + "\n")
+            out.flush()
+            queue.task_done()
+
+    started = time.perf_counter()
+    workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+    skipped = 0
+    try:
+        for request_id, line_no, message in read_requests(in_path, field):
+            if request_id in done:
+                skipped += 1
+                continue
+            await queue.put((request_id, line_no, message))
+        for _ in workers:
+            await queue.put(None)
+        await asyncio.gather(*workers)
+    finally:
+        out.close()
+    wall = time.perf_counter() - started
+
+    return {
+        "processed": len(latencies),
+        "skipped": skipped,
+        "errors": errors,
+        "wall_s": round(wall, 3),
+        "requests_per_s": round(len(latencies) / wall, 2) if wall > 0 else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a JSONL file of user messages through the flu bot.")
+    parser.add_argument("input", help="JSONL file, one request per line")
+    parser.add_argument("output", help="JSONL file results are appended to (reused to resume)")
+    parser.add_argument("--field", default="message", help="JSON field holding the user message")
+    parser.add_argument("--concurrency", type=int, default=8, help="max requests in flight")
+    args = parser.parse_args()
+
+    stats = asyncio.run(run_batch(args.input, args.output, args.field, args.concurrency))
+    print(
+        f"processed={stats['processed']} skipped={stats['skipped']} errors={stats['errors']} "
+        f"throughput={stats['requests_per_s']} req/s "
+        f"p50={stats['p50_ms']} ms p95={stats['p95_ms']} ms"
+    )
+
+
+if __name__ == "__main__":
+    main()
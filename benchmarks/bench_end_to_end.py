@@ -0,0 +1,408 @@
+"""
+End-to-end benchmark: ask_flu_bot against synthetic corpora and a fake Claude.
+
+    python benchmarks/bench_end_to_end.py
+    python benchmarks/bench_end_to_end.py --sizes 1000,100000 --llm-latency-ms 300 --embedding hash
+    python benchmarks/bench_end_to_end.py --compare bench_results/end_to_end-abc1234.json
+
+For each corpus size a synthetic corpus in the flu_rag_corpus.jsonl format is
+generated (seeded, so every run and every commit sees the same documents) and
+the app is run against it in a fresh process:
+
+- index build time (load + embed + Chroma + BM25, i.e. the app's warm-up)
+- per-query latency p50 / p99, overall and per route
+- end-to-end throughput with --concurrency threads
+- memory high-water mark (ru_maxrss) of that process
+
+Claude is replaced by a deterministic fake client with a fixed latency
+(--llm-latency-ms) plus a per-output-token delay, installed on the app's
+LLMGateway, so retries, the breaker and usage logging still run. Response
+caches are turned off unless --keep-caches is given, so every query takes
+the full path.
+
+--embedding hash swaps the ONNX model for a deterministic hashing embedder,
+which isolates everything except model inference and keeps the 1M-doc run
+to well under an hour on one core. Results go to a JSON file together with the
+git commit, so two runs can be compared with --compare.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import types
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_SIZES = "1000,100000,1000000"
+
+# Categories from flu_rag_corpus.jsonl, so retrieval filters behave as in production
+CATEGORIES = [
+    "flu_basics",
+    "flu_symptoms",
+    "comparison",
+    "red_flags",
+    "self_care",
+    "prevention",
+    "risk_groups",
+    "education",
+]
+
+VOCABULARY = (
+    "fever cough sore throat runny stuffy nose muscle body aches tiredness fatigue headache chills "
+    "vomiting diarrhea nausea breathing chest pain vaccine vaccination influenza virus season winter "
+    "children elderly pregnancy asthma diabetes antiviral rest fluids hydration isolation masks "
+    "handwashing droplets contagious incubation symptoms onset recovery complications pneumonia "
+    "hospital doctor emergency allergy cold sneezing itchy eyes dehydration oxygen infants adults"
+).split()
+
+# (route, message), cycled up to --queries
+QUERIES = [
+    ("symptoms", "I have fever, cough and body aches since yesterday"),
+    ("symptoms", "sore throat and a runny nose but no fever"),
+    ("symptoms", "I feel very tired with chills and a headache"),
+    ("symptoms", "itchy eyes and sneezing all day"),
+    ("info", "How does the flu spread between people?"),
+    ("info", "Who should get the flu vaccine?"),
+    ("info", "What are the warning signs of severe flu in children?"),
+    ("reply", "hi"),
+    ("reply", "my name is Sam"),
+]
+
+
+# ------------------------------
+# Synthetic corpus
+# ------------------------------
+def synthetic_docs(size: int, seed: int = 0) -> Iterator[Dict[str, Any]]:
+    """
+    size docs shaped like flu_rag_corpus.jsonl: the real docs first, then
+    seeded variations built from their sentences plus filler vocabulary.
+    """
+    with open(os.path.join(ROOT, "flu_rag_corpus.jsonl"), encoding="utf-8") as f:
+        real = [json.loads(line) for line in f if line.strip()]
+    sentences = [s.strip() + "." for d in real for s in d["text"].replace("\n", " ").split(".") if s.strip()]
+    rng = random.Random(seed)
+
+    for i in range(size):
+        if i < len(real):
+            yield real[i]
+            continue
+        words = rng.sample(VOCABULARY, 3)
+        body = rng.sample(sentences, 3) + [" ".join(rng.choices(VOCABULARY, k=rng.randint(20, 60))) + "."]
+        yield {
+            "id": f"syn-{i:07d}",
+            "category": rng.choice(CATEGORIES),
+            "title": " ".join(words).capitalize(),
+            "tags": words,
+            "text": " ".join(body),
+        }
+
+
+def write_corpus(path: str, size: int, seed: int) -> None:
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        for doc in synthetic_docs(size, seed):
+            f.write(json.dumps(doc, ensure_ascii=False) + "\n")
+    os.replace(tmp, path)
+
+
+# ------------------------------
+# Fake Claude
+# ------------------------------
+class FakeMessages:
+    """
+    messages.create / messages.stream with a fixed first-token latency plus
+    per-token delay. Answers and token counts depend only on the prompt, so
+    every run sees the same ones.
+    """
+
+    def __init__(self, latency: float, token_delay: float, output_tokens: int):
+        self.latency = latency
+        self.token_delay = token_delay
+        self.output_tokens = output_tokens
+
+    def _message(self, kwargs: Dict[str, Any]):
+        prompt = kwargs["messages"][-1]["content"]
+        text = " ".join(["flu"] * self.output_tokens)
+        usage = types.SimpleNamespace(
+            input_tokens=len(prompt) // 4,
+            output_tokens=self.output_tokens,
+            cache_read_input_tokens=0,
+            cache_creation_input_tokens=0,
+        )
+        return types.SimpleNamespace(content=[types.SimpleNamespace(type="text", text=text)], usage=usage)
+
+    def create(self, **kwargs):
+        time.sleep(self.latency + self.token_delay * self.output_tokens)
+        return self._message(kwargs)
+
+    def stream(self, **kwargs):
+        messages = self
+
+        class Stream:
+            def __enter__(self):
+                time.sleep(messages.latency)
+                self.text_stream = self._tokens()
+                return self
+
+            def _tokens(self):
+                for _ in range(messages.output_tokens):
+                    time.sleep(messages.token_delay)
+                    yield "flu "
+
+            def __exit__(self, *exc):
+                return False
+
+            def get_final_message(self):
+                return messages._message(kwargs)
+
+        return Stream()
+
+
+class FakeAnthropic:
+    def __init__(self, latency: float, token_delay: float, output_tokens: int):
+        self.messages = FakeMessages(latency, token_delay, output_tokens)
+
+
+def hash_embedding_function():
+    """
+    Deterministic bag-of-words hashing embedder with the chromadb EmbeddingFunction interface.
+    """
+    import zlib
+
+    import numpy as np
+    from chromadb.api.types import EmbeddingFunction
+
+    class HashEmbedding(EmbeddingFunction):
+        dim = 384
+
+        def __init__(self, *args, **kwargs):
+            pass
+
+        def __call__(self, input):
+            out = []
+            for text in input:
+                v = np.zeros(self.dim, dtype=np.float32)
+                for word in text.lower().split():
+                    v[zlib.crc32(word.encode("utf-8")) % self.dim] += 1.0
+                out.append(v / (np.linalg.norm(v) or 1.0))
+            return out
+
+        @staticmethod
+        def name() -> str:
+            return "bench-hash"
+
+        def get_config(self) -> Dict[str, Any]:
+            return {}
+
+        @staticmethod
+        def build_from_config(config):
+            return HashEmbedding()
+
+    return HashEmbedding()
+
+
+# ------------------------------
+# One corpus size, in a fresh process
+# ------------------------------
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def latency_summary(seconds: List[float]) -> Dict[str, float]:
+    ms = [s * 1000 for s in seconds]
+    return {
+        "n": len(ms),
+        "p50_ms": round(percentile(ms, 0.5), 3),
+        "p99_ms": round(percentile(ms, 0.99), 3),
+        "mean_ms": round(statistics.fmean(ms), 3) if ms else 0.0,
+    }
+
+
+def run_one(args) -> Dict[str, Any]:
+    sys.path.insert(0, ROOT)
+    os.chdir(ROOT)
+    # Before the app import, so nothing the import runs can load the ONNX model
+    if args.embedding == "hash":
+        import vector_store
+
+        vector_store._model_function = hash_embedding_function()
+
+    start = time.perf_counter()
+    if args.app == "stream":
+        import stream as app
+
+        gateway = app.get_gateway()
+        index_task = app.get_warmup()
+    else:
+        import app1 as app
+
+        gateway = app.GATEWAY
+        index_task = app.SEARCH_INDEX
+    import_seconds = time.perf_counter() - start
+    if index_task.started:
+        raise SystemExit(f"{args.app} started the index build at import; FLU_RAG_WARMUP=0 was not honoured")
+    gateway._client = FakeAnthropic(args.llm_latency_ms / 1000, args.token_delay_ms / 1000, args.output_tokens)
+
+    start = time.perf_counter()
+    index_task.result()
+    build_seconds = time.perf_counter() - start
+
+    messages = [QUERIES[i % len(QUERIES)] for i in range(args.queries)]
+
+    # Sequential: per-query latency
+    by_route: Dict[str, List[float]] = {}
+    all_latencies: List[float] = []
+    for route, text in messages:
+        t = time.perf_counter()
+        app.ask_flu_bot(text)
+        elapsed = time.perf_counter() - t
+        all_latencies.append(elapsed)
+        by_route.setdefault(route, []).append(elapsed)
+
+    # Concurrent: throughput
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(lambda m: app.ask_flu_bot(m[1]), messages))
+    wall = time.perf_counter() - start
+
+    return {
+        "docs": args.size,
+        "import_seconds": round(import_seconds, 3),
+        "index_build_seconds": round(build_seconds, 3),
+        "index_docs_per_second": round(args.size / build_seconds, 1) if build_seconds else None,
+        "query_latency": latency_summary(all_latencies),
+        "query_latency_by_route": {route: latency_summary(v) for route, v in sorted(by_route.items())},
+        "throughput_qps": round(len(messages) / wall, 2),
+        "concurrency": args.concurrency,
+        # ru_maxrss is in KiB on Linux and bytes on macOS
+        "max_rss_mb": round(
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024),
+            1,
+        ),
+    }
+
+
+def child_env(args, corpus_path: str) -> Dict[str, str]:
+    env = dict(os.environ)
+    env.setdefault("ANTHROPIC_API_KEY", "benchmark")
+    env["FLU_RAG_CORPUS"] = corpus_path
+    env["FLU_RAG_WARMUP"] = "0"  # the build is timed explicitly
+    env.pop("FLU_RAG_INDEX_DIR", None)
+    if not args.keep_caches:
+        env["FLU_RAG_RESPONSE_CACHE_SIZE"] = "0"
+        env["FLU_RAG_INFO_CACHE_SIZE"] = "0"
+        env.pop("FLU_RAG_RESPONSE_CACHE_DB", None)
+        env.pop("FLU_RAG_INFO_CACHE_DB", None)
+        env.pop("FLU_RAG_EMBED_CACHE_DIR", None)
+    return env
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(old_path: str, new: Dict[str, Any]) -> None:
+    with open(old_path, encoding="utf-8") as f:
+        old = json.load(f)
+    old_runs = {run["docs"]: run for run in old["runs"]}
+    print(f"\nvs {old.get('commit', '?')} ({old_path}):")
+    for run in new["runs"]:
+        before = old_runs.get(run["docs"])
+        if before is None:
+            continue
+        for label, a, b in [
+            ("build s", before["index_build_seconds"], run["index_build_seconds"]),
+            ("p50 ms", before["query_latency"]["p50_ms"], run["query_latency"]["p50_ms"]),
+            ("p99 ms", before["query_latency"]["p99_ms"], run["query_latency"]["p99_ms"]),
+            ("qps", before["throughput_qps"], run["throughput_qps"]),
+            ("rss MB", before["max_rss_mb"], run["max_rss_mb"]),
+        ]:
+            change = f"{(b - a) / a * 100:+.1f}%" if a else "n/a"
+            print(f"  {run['docs']:>9,} docs  {label:<8} {a:>10} -> {b:<10} {change}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="Comma-separated corpus sizes.")
+    parser.add_argument("--app", choices=["app1", "stream"], default="app1")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--llm-latency-ms", type=float, default=800.0, help="Fake Claude time to first token.")
+    parser.add_argument("--token-delay-ms", type=float, default=2.0, help="Fake Claude delay per output token.")
+    parser.add_argument("--output-tokens", type=int, default=150)
+    parser.add_argument("--embedding", choices=["model", "hash"], default="model")
+    parser.add_argument("--keep-caches", action="store_true", help="Leave the response caches on.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--corpus-dir", default=os.path.join(tempfile.gettempdir(), "flu_rag_bench"))
+    parser.add_argument("--output", help="Results file (default bench_results/end_to_end-<commit>.json).")
+    parser.add_argument("--compare", help="Earlier results file to compare against.")
+    parser.add_argument("--run-one", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--size", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_one:
+        print(json.dumps(run_one(args)))
+        return
+
+    os.makedirs(args.corpus_dir, exist_ok=True)
+    commit = git_commit()
+    results = {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "config": {k: v for k, v in vars(args).items() if k not in ("run_one", "size", "output", "compare")},
+        "runs": [],
+    }
+
+    for size in [int(s) for s in args.sizes.split(",") if s.strip()]:
+        corpus_path = os.path.join(args.corpus_dir, f"synthetic_{size}_seed{args.seed}.jsonl")
+        if not os.path.exists(corpus_path):
+            start = time.perf_counter()
+            write_corpus(corpus_path, size, args.seed)
+            print(f"generated {size:,} docs in {time.perf_counter() - start:.1f}s -> {corpus_path}")
+
+        cmd = [sys.executable, os.path.abspath(__file__), "--run-one", "--size", str(size)] + [
+            a for a in sys.argv[1:] if a != "--run-one"
+        ]
+        proc = subprocess.run(cmd, cwd=ROOT, env=child_env(args, corpus_path), capture_output=True, text=True)
+        if proc.returncode != 0:
+            raise SystemExit(f"{size:,} docs failed:\n{proc.stderr[-3000:]}")
+        run = json.loads(proc.stdout.strip().splitlines()[-1])
+        results["runs"].append(run)
+        q = run["query_latency"]
+        print(
+            f"{size:>9,} docs  build {run['index_build_seconds']:>8.2f}s  "
+            f"p50 {q['p50_ms']:>8.1f}ms  p99 {q['p99_ms']:>8.1f}ms  "
+            f"{run['throughput_qps']:>7.2f} q/s  rss {run['max_rss_mb']:>7.1f} MB"
+        )
+
+    output = args.output or os.path.join(ROOT, "bench_results", f"end_to_end-{commit}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"results -> {output}")
+    if args.compare:
+        compare(args.compare, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Import-time guard: how long `import <module>` takes and which heavy
+dependencies it pulls in.
+
+    python benchmarks/bench_import_time.py
+    python benchmarks/bench_import_time.py --repeat 10 --max-ms 200
+
+Each module is imported in a fresh `python -X importtime` process (with the
+background warm-up turned off, so only the import itself is measured). The
+script fails if a rule-based entry point imports anthropic, chromadb, numpy,
+onnxruntime or streamlit, or if the median cumulative import time exceeds
+--max-ms.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Set, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Must not be imported just to answer "hi" or parse symptoms
+HEAVY_MODULES = ("anthropic", "chromadb", "numpy", "onnxruntime", "streamlit")
+
+# (module, code to run after importing it)
+TARGETS = [
+    ("symptoms", "symptoms.parse_symptoms_from_text('I have fever and a cough')"),
+    ("app1", "app1.route_message('hi'); app1.extract_name('my name is Ali'); app1.detect_symptoms('fever')"),
+    ("app", "app.route_message('hi')"),
+]
+
+
+def import_once(module: str, code: str) -> Tuple[float, Set[str]]:
+    """
+    Import module in a fresh interpreter; returns (cumulative ms, top-level
+    packages imported on the way).
+    """
+    env = dict(os.environ)
+    env.setdefault("ANTHROPIC_API_KEY", "import-time-benchmark")
+    env["FLU_RAG_WARMUP"] = "0"
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}; {code}"],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"importing {module} failed:\n{proc.stderr[-2000:]}")
+
+    cumulative_us = None
+    packages: Set[str] = set()
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|", 2)
+        if not cumulative.strip().isdigit():
+            continue  # header line
+        packages.add(name.strip().split(".")[0])
+        if name.strip() == module:
+            cumulative_us = int(cumulative)
+    if cumulative_us is None:
+        raise RuntimeError(f"no importtime line for {module}")
+    return cumulative_us / 1000.0, packages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--max-ms", type=float, default=250.0, help="Budget for the median import time.")
+    args = parser.parse_args()
+
+    failures: List[str] = []
+    print(f"{'module':<10} {'median ms':>10} {'min ms':>8}  heavy imports")
+    for module, code in TARGETS:
+        timings: List[float] = []
+        heavy: Dict[str, None] = {}
+        for _ in range(args.repeat):
+            ms, packages = import_once(module, code)
+            timings.append(ms)
+            heavy.update((p, None) for p in HEAVY_MODULES if p in packages)
+        median = statistics.median(timings)
+        print(f"{module:<10} {median:>10.1f} {min(timings):>8.1f}  {', '.join(heavy) or '-'}")
+        if heavy:
+            failures.append(f"{module} imports {', '.join(heavy)}")
+        if median > args.max_ms:
+            failures.append(f"{module} takes {median:.0f} ms to import (budget {args.max_ms:.0f} ms)")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if failures:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Microbenchmark: per-keyword substring loop vs the one-pass KeywordMatcher.
+
+    python benchmarks/bench_keyword_matcher.py
+
+Keyword maps of 40, 1,000 and 10,000 entries are built from the real
+KEYWORD_MAP padded with synthetic multi-word terms, then both matchers scan
+the same set of user messages.
+"""
+import os
+import random
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from keyword_matcher import KeywordMatcher  # noqa: E402
+from symptoms import KEYWORD_MAP, SYMPTOM_FIELDS  # noqa: E402
+
+MESSAGES = [
+    "I have fever and a bad cough since yesterday",
+    "Chills, coughing and muscle aches, I feel exhausted",
+    "my nose is runny and I keep sneezing, itchy eyes too",
+    "sore throat and a blocked nose but no fever",
+    "I can't taste or smell anything and breathing is hard",
+    "hello, my name is Ali and I just wanted to ask about the flu vaccine",
+    "What are the most common flu symptoms in children?",
+    "I have been vomiting all night and have diarrhea, plus a mild fever and chills",
+]
+
+
+def keyword_map(size: int, seed: int = 0) -> dict:
+    rng = random.Random(seed)
+    kmap = dict(list(KEYWORD_MAP.items())[:size])
+    while len(kmap) < size:
+        words = [
+            "".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(3, 9)))
+            for _ in range(rng.randint(1, 3))
+        ]
+        kmap[" ".join(words)] = rng.choice(SYMPTOM_FIELDS)
+    return kmap
+
+
+def substring_loop(kmap: dict, text: str) -> set:
+    text = text.lower()
+    return {field for kw, field in kmap.items() if kw in text}
+
+
+def bench(fn, rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for msg in MESSAGES:
+            fn(msg)
+    return rounds * len(MESSAGES) / (time.perf_counter() - start)
+
+
+def main():
+    print(f"{'keywords':>9} {'loop msg/s':>12} {'automaton msg/s':>16} {'speedup':>8} {'build ms':>9}")
+    for size in (40, 1_000, 10_000):
+        kmap = keyword_map(size)
+        t0 = time.perf_counter()
+        matcher = KeywordMatcher(kmap, word_boundaries=False)
+        build_ms = (time.perf_counter() - t0) * 1000
+
+        # Same answers when boundaries are off (the loop has no boundary check)
+        for msg in MESSAGES:
+            assert matcher.find_values(msg) == substring_loop(kmap, msg)
+
+        rounds = max(1, 20_000 // size)
+        loop_rate = bench(lambda m: substring_loop(kmap, m), rounds)
+        ac_rate = bench(matcher.find_values, rounds * 5)
+        print(f"{size:>9} {loop_rate:>12.0f} {ac_rate:>16.0f} {ac_rate / loop_rate:>7.1f}x {build_ms:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Index build throughput: embedding in-process vs. in N worker processes.
+
+    python benchmarks/bench_sync_workers.py
+    python benchmarks/bench_sync_workers.py --docs 5000 --workers 1,2,4,8
+
+Each run syncs the same synthetic corpus (see bench_end_to_end.py) into a
+fresh in-memory collection with sync_collection(workers=N) and reports
+docs/s and the speedup over workers=1. The workers run the real embedding
+model (each loads its own copy, single-threaded), so the model has to be
+downloadable or already cached; the embedding cache is not used.
+"""
+import argparse
+import os
+import sys
+import time
+
+from bench_end_to_end import ROOT, synthetic_docs
+
+sys.path.insert(0, ROOT)
+
+import vector_store  # noqa: E402
+
+
+def build(docs, workers: int, batch_size: int, run: int) -> vector_store.SyncReport:
+    import chromadb
+
+    collection = chromadb.Client().create_collection(
+        name=f"bench_sync_{workers}_{run}_{time.time_ns()}",
+        embedding_function=vector_store.get_model_embedding_function(),
+    )
+    return vector_store.sync_collection(collection, docs, batch_size=batch_size, workers=workers)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--docs", type=int, default=2000)
+    parser.add_argument("--workers", default=f"1,{os.cpu_count() or 1}", help="Comma-separated worker counts.")
+    parser.add_argument("--batch-size", type=int, default=vector_store.SYNC_BATCH_SIZE)
+    args = parser.parse_args()
+
+    docs = list(synthetic_docs(args.docs))
+    counts = sorted({int(w) for w in args.workers.split(",") if w.strip()})
+    # Model download / load happens here, not inside the first timed run
+    vector_store.get_model_embedding_function()(["warm-up"])
+
+    print(f"{os.cpu_count()} CPUs, {len(docs)} docs, batch size {args.batch_size}")
+    print(f"{'workers':>8} {'docs/s':>9} {'seconds':>8} {'speedup':>8}")
+    baseline = None
+    for run, workers in enumerate(counts):
+        report = build(docs, workers, args.batch_size, run)
+        rate = report.docs_per_second
+        baseline = baseline or rate
+        print(f"{workers:>8} {rate:>9.0f} {report.seconds:>8.1f} {rate / baseline:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
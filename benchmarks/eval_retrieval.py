@@ -0,0 +1,245 @@
+"""
+Retrieval evaluation: quality and speed of retrieve_docs for several configurations.
+
+    python benchmarks/eval_retrieval.py
+    python benchmarks/eval_retrieval.py --config hybrid:FLU_RAG_RETRIEVER=hybrid \\
+        --config vector:FLU_RAG_RETRIEVER=vector \\
+        --config chunks:FLU_RAG_CORPUS=flu_rag_chunks.jsonl,n_results=8 --min-recall 0.9
+
+Queries come from a JSONL file with one {"query", "relevant_ids", "mode"} object per
+line (see benchmarks/retrieval_queries.jsonl). "mode" is optional. When it
+is set, the search is restricted to categories_for_request(mode, query)
+and backfilled when those yield too few docs, as the app does. Chunk hits
+count as their parent doc, so the same labels work for chunked corpora.
+
+Each configuration is a name plus comma-separated KEY=VALUE settings: FLU_RAG_*
+environment variables (retriever, corpus, context...) and n_results. Each
+runs in a fresh process, because app1 reads its settings at import. The
+script reports, side by side:
+
+- recall@k and nDCG@k for every --k, and MRR
+- per-query latency p50 / p99 (one retrieve_docs call per query)
+- batch throughput (retrieve_docs_batch, --batch-size queries per Chroma call)
+- index build time
+
+With --min-recall it names the fastest configuration (by p50) whose
+recall@--target-k reaches the target.
+"""
+import argparse
+import json
+import math
+import os
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from bench_end_to_end import ROOT, git_commit, hash_embedding_function, latency_summary
+
+DEFAULT_QUERIES = os.path.join(ROOT, "benchmarks", "retrieval_queries.jsonl")
+DEFAULT_CONFIGS = ["hybrid:FLU_RAG_RETRIEVER=hybrid", "vector:FLU_RAG_RETRIEVER=vector"]
+
+
+def load_queries(path: str) -> List[Dict[str, Any]]:
+    with open(path, encoding="utf-8") as f:
+        queries = [json.loads(line) for line in f if line.strip()]
+    for i, q in enumerate(queries, start=1):
+        if not q.get("query") or not q.get("relevant_ids"):
+            raise SystemExit(f"{path}:{i}: needs a 'query' and a non-empty 'relevant_ids'")
+    return queries
+
+
+def parse_config(spec: str) -> Tuple[str, Dict[str, str]]:
+    name, _, settings = spec.partition(":")
+    values = {}
+    for item in filter(None, settings.split(",")):
+        key, sep, value = item.partition("=")
+        if not sep:
+            raise SystemExit(f"bad setting {item!r} in --config {spec!r} (expected KEY=VALUE)")
+        values[key.strip()] = value.strip()
+    return name, values
+
+
+# ------------------------------
+# Metrics
+# ------------------------------
+def recall_at(ranked: List[str], relevant: set, k: int) -> float:
+    return len(relevant.intersection(ranked[:k])) / len(relevant)
+
+
+def reciprocal_rank(ranked: List[str], relevant: set) -> float:
+    for rank, doc_id in enumerate(ranked, start=1):
+        if doc_id in relevant:
+            return 1.0 / rank
+    return 0.0
+
+
+def ndcg_at(ranked: List[str], relevant: set, k: int) -> float:
+    """
+    Binary-relevance nDCG@k.
+    """
+    dcg = sum(1.0 / math.log2(rank + 1) for rank, doc_id in enumerate(ranked[:k], start=1) if doc_id in relevant)
+    ideal = sum(1.0 / math.log2(rank + 1) for rank in range(1, min(len(relevant), k) + 1))
+    return dcg / ideal
+
+
+def quality(rankings: List[List[str]], queries: List[Dict[str, Any]], ks: List[int]) -> Dict[str, float]:
+    out: Dict[str, float] = {}
+    relevant = [set(q["relevant_ids"]) for q in queries]
+    n = len(queries)
+    for k in ks:
+        out[f"recall@{k}"] = round(sum(recall_at(r, rel, k) for r, rel in zip(rankings, relevant)) / n, 4)
+        out[f"ndcg@{k}"] = round(sum(ndcg_at(r, rel, k) for r, rel in zip(rankings, relevant)) / n, 4)
+    out["mrr"] = round(sum(reciprocal_rank(r, rel) for r, rel in zip(rankings, relevant)) / n, 4)
+    return out
+
+
+# ------------------------------
+# One configuration, in a fresh process
+# ------------------------------
+def run_one(args) -> Dict[str, Any]:
+    sys.path.insert(0, ROOT)
+    os.chdir(ROOT)
+    import app1
+    from retrieval_filters import categories_for_request
+
+    if args.embedding == "hash":
+        import vector_store
+
+        vector_store._model_function = hash_embedding_function()
+
+    queries = load_queries(args.queries)
+    n_results = args.n_results or max(args.ks)
+    categories = [
+        categories_for_request(q["mode"], q["query"]) if q.get("mode") and not args.no_filters else None
+        for q in queries
+    ]
+
+    start = time.perf_counter()
+    app1.SEARCH_INDEX.result()
+    build_seconds = time.perf_counter() - start
+
+    def doc_ids(hits: List[Dict[str, Any]]) -> List[str]:
+        return [(h.get("metadata") or {}).get("parent_id") or h["id"] for h in hits]
+
+    # Batches of queries with the same categories, one Chroma call each
+    rankings: List[Optional[List[str]]] = [None] * len(queries)
+    groups: Dict[Any, List[int]] = {}
+    for i, cats in enumerate(categories):
+        groups.setdefault(tuple(cats) if cats else None, []).append(i)
+    start = time.perf_counter()
+    for cats, members in groups.items():
+        for b in range(0, len(members), args.batch_size):
+            batch = members[b : b + args.batch_size]
+            hits = app1.retrieve_docs_batch(
+                [queries[i]["query"] for i in batch], n_results, list(cats) if cats else None
+            )
+            for i, h in zip(batch, hits):
+                rankings[i] = doc_ids(h)
+    batch_seconds = time.perf_counter() - start
+
+    # One call per query, as the app does
+    latencies = []
+    for q, cats in zip(queries, categories):
+        t = time.perf_counter()
+        app1.retrieve_docs(q["query"], n_results, cats)
+        latencies.append(time.perf_counter() - t)
+
+    return {
+        "n_queries": len(queries),
+        "n_results": n_results,
+        "index_build_seconds": round(build_seconds, 3),
+        "quality": quality(rankings, queries, args.ks),
+        "latency": latency_summary(latencies),
+        "batch_qps": round(len(queries) / batch_seconds, 1) if batch_seconds else None,
+    }
+
+
+def print_table(results: List[Dict[str, Any]], ks: List[int]) -> None:
+    metric_names = [f"recall@{k}" for k in ks] + [f"ndcg@{k}" for k in ks] + ["mrr"]
+    header = ["config"] + metric_names + ["p50 ms", "p99 ms", "batch q/s", "build s"]
+    rows = []
+    for r in results:
+        rows.append(
+            [r["name"]]
+            + [f"{r['quality'][m]:.3f}" for m in metric_names]
+            + [
+                f"{r['latency']['p50_ms']:.1f}",
+                f"{r['latency']['p99_ms']:.1f}",
+                f"{r['batch_qps']}",
+                f"{r['index_build_seconds']:.2f}",
+            ]
+        )
+    widths = [max(len(str(row[i])) for row in [header] + rows) for i in range(len(header))]
+    for row in [header] + rows:
+        print("  ".join(str(cell).rjust(w) if i else str(cell).ljust(w) for i, (cell, w) in enumerate(zip(row, widths))))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--queries", default=DEFAULT_QUERIES, help="Labelled query JSONL.")
+    parser.add_argument("--config", action="append", help="NAME:KEY=VALUE,... (repeatable).")
+    parser.add_argument("--k", default="1,3,5", help="Comma-separated cutoffs.")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--no-filters", action="store_true", help="Ignore the queries' mode (no category filter).")
+    parser.add_argument("--embedding", choices=["model", "hash"], default="model")
+    parser.add_argument("--min-recall", type=float, help="Recall target for picking a configuration.")
+    parser.add_argument("--target-k", type=int, help="Cutoff for --min-recall (default: largest --k).")
+    parser.add_argument("--output", help="Write all results as JSON.")
+    parser.add_argument("--run-one", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--n-results", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    args.ks = sorted({int(k) for k in args.k.split(",") if k.strip()})
+
+    if args.run_one:
+        print(json.dumps(run_one(args)))
+        return
+
+    results = []
+    for spec in args.config or DEFAULT_CONFIGS:
+        name, settings = parse_config(spec)
+        result = {"name": name, "settings": dict(settings)}
+        env = dict(os.environ)
+        env.setdefault("ANTHROPIC_API_KEY", "retrieval-eval")
+        env["FLU_RAG_WARMUP"] = "0"  # the build is timed explicitly
+        n_results = settings.pop("n_results", None)
+        env.update(settings)
+        cmd = [sys.executable, os.path.abspath(__file__), "--run-one", "--queries", args.queries, "--k", args.k]
+        cmd += ["--batch-size", str(args.batch_size), "--embedding", args.embedding]
+        cmd += ["--n-results", n_results] if n_results else []
+        cmd += ["--no-filters"] if args.no_filters else []
+        proc = subprocess.run(cmd, cwd=ROOT, env=env, capture_output=True, text=True)
+        if proc.returncode != 0:
+            raise SystemExit(f"config {name} failed:\n{proc.stderr[-3000:]}")
+        result.update(json.loads(proc.stdout.strip().splitlines()[-1]))
+        results.append(result)
+
+    print_table(results, args.ks)
+
+    choice = None
+    if args.min_recall is not None:
+        target_k = args.target_k or max(args.ks)
+        key = f"recall@{target_k}"
+        if key not in results[0]["quality"]:
+            raise SystemExit(f"--target-k {target_k} is not one of --k {args.k}")
+        passing = [r for r in results if r["quality"][key] >= args.min_recall]
+        if passing:
+            choice = min(passing, key=lambda r: r["latency"]["p50_ms"])["name"]
+            print(f"\nfastest with {key} >= {args.min_recall}: {choice}")
+        else:
+            print(f"\nno configuration reaches {key} >= {args.min_recall}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(
+                {"commit": git_commit(), "queries": args.queries, "ks": args.ks, "choice": choice, "results": results},
+                f,
+                indent=2,
+            )
+        print(f"results -> {args.output}")
+    if args.min_recall is not None and choice is None:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
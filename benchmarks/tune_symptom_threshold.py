@@ -0,0 +1,134 @@
+"""
+Tune the similarity threshold of the embedding symptom extractor.
+
+    python benchmarks/tune_symptom_threshold.py
+    python benchmarks/tune_symptom_threshold.py --embedding hash --min-precision 0.9
+
+Messages come from a JSONL file with one {"text", "symptoms"} object per
+line (see benchmarks/symptom_paraphrases.jsonl): paraphrases labelled with
+the SYMPTOM_FIELDS they mention, plus negatives with an empty list. Every
+message is scored once with SymptomEmbeddingExtractor.field_scores(), then
+each threshold in the sweep is evaluated per (message, field) pair:
+
+- precision, recall and F1 of the embedding extractor alone
+- the same for hybrid mode (keyword matches OR embedding matches), which is
+  how the app uses it
+- the share of negative messages that get any symptom flagged
+
+The pick is the threshold with the best hybrid F1 (the higher one on a
+tie), or with --min-precision the one with the best hybrid recall whose
+precision reaches the target. Latency is the p50 / p99 of one extract()
+call per message (chunking, one batched embed and the matrix product).
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+
+from bench_end_to_end import ROOT, hash_embedding_function, latency_summary
+
+sys.path.insert(0, ROOT)
+
+from symptom_embedding import DEFAULT_THRESHOLD, SymptomEmbeddingExtractor  # noqa: E402
+from symptoms import SYMPTOM_FIELDS, parse_symptoms_from_text  # noqa: E402
+
+DEFAULT_MESSAGES = os.path.join(ROOT, "benchmarks", "symptom_paraphrases.jsonl")
+
+
+def load_messages(path: str) -> List[Dict[str, Any]]:
+    with open(path, encoding="utf-8") as f:
+        messages = [json.loads(line) for line in f if line.strip()]
+    for i, m in enumerate(messages, start=1):
+        unknown = set(m.get("symptoms", [])) - set(SYMPTOM_FIELDS)
+        if not m.get("text") or unknown:
+            raise SystemExit(f"{path}:{i}: needs a 'text' and known 'symptoms' (unknown: {sorted(unknown)})")
+    return messages
+
+
+def scores(predicted: np.ndarray, truth: np.ndarray) -> Dict[str, float]:
+    tp = int((predicted & truth).sum())
+    fp = int((predicted & ~truth).sum())
+    fn = int((~predicted & truth).sum())
+    precision = tp / (tp + fp) if tp + fp else 1.0
+    recall = tp / (tp + fn) if tp + fn else 1.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return {"precision": round(precision, 3), "recall": round(recall, 3), "f1": round(f1, 3)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--messages", default=DEFAULT_MESSAGES, help="Labelled message JSONL.")
+    parser.add_argument("--embedding", choices=["model", "hash"], default="model")
+    parser.add_argument("--thresholds", default="0.30:0.90:0.05", help="START:STOP:STEP (inclusive).")
+    parser.add_argument("--min-precision", type=float, help="Hybrid precision target for the pick.")
+    parser.add_argument("--output", help="Write the sweep as JSON.")
+    args = parser.parse_args()
+
+    if args.embedding == "hash":
+        embed_fn = hash_embedding_function()
+    else:
+        import vector_store
+
+        embed_fn = vector_store.get_model_embedding_function()
+
+    messages = load_messages(args.messages)
+    extractor = SymptomEmbeddingExtractor(embed_fn)
+    truth = np.array([[f in m.get("symptoms", []) for f in SYMPTOM_FIELDS] for m in messages])
+    keywords = np.array(
+        [[bool(v) for v in (parse_symptoms_from_text(m["text"])[f] for f in SYMPTOM_FIELDS)] for m in messages]
+    )
+    negative = ~truth.any(axis=1)
+
+    latencies = []
+    rows = []
+    for m in messages:
+        t = time.perf_counter()
+        rows.append(extractor.field_scores(m["text"]))
+        latencies.append(time.perf_counter() - t)
+    field_scores = np.vstack(rows)
+
+    start, stop, step = (float(x) for x in args.thresholds.split(":"))
+    sweep = []
+    for threshold in np.round(np.arange(start, stop + step / 2, step), 3):
+        embedded = field_scores >= threshold
+        sweep.append(
+            {
+                "threshold": float(threshold),
+                "embedding": scores(embedded, truth),
+                "hybrid": scores(embedded | keywords, truth),
+                "negatives_flagged": round(float((embedded | keywords)[negative].any(axis=1).mean()), 3),
+            }
+        )
+
+    print(f"{len(messages)} messages ({int(negative.sum())} negatives), {args.embedding} embeddings")
+    print(f"keywords alone: {scores(keywords, truth)}")
+    print(f"{'threshold':>9}  {'emb P':>6} {'emb R':>6} {'emb F1':>6}  {'hyb P':>6} {'hyb R':>6} {'hyb F1':>6}  {'neg flagged':>11}")
+    for r in sweep:
+        e, h = r["embedding"], r["hybrid"]
+        print(
+            f"{r['threshold']:>9.2f}  {e['precision']:>6.3f} {e['recall']:>6.3f} {e['f1']:>6.3f}"
+            f"  {h['precision']:>6.3f} {h['recall']:>6.3f} {h['f1']:>6.3f}  {r['negatives_flagged']:>11.3f}"
+        )
+
+    if args.min_precision is not None:
+        passing = [r for r in sweep if r["hybrid"]["precision"] >= args.min_precision]
+        pick = max(passing, key=lambda r: (r["hybrid"]["recall"], r["threshold"]), default=None)
+    else:
+        pick = max(sweep, key=lambda r: (r["hybrid"]["f1"], r["threshold"]))
+    latency = latency_summary(latencies)
+    print(f"\nextract() latency: p50 {latency['p50_ms']:.2f} ms, p99 {latency['p99_ms']:.2f} ms")
+    print(f"current DEFAULT_THRESHOLD: {DEFAULT_THRESHOLD}")
+    print(f"pick: {pick['threshold']:.2f}" if pick else f"\nno threshold reaches precision {args.min_precision}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"embedding": args.embedding, "latency": latency, "pick": pick, "sweep": sweep}, f, indent=2)
+        print(f"results -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
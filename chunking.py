@@ -0,0 +1,194 @@
+import argparse
+import json
+import re
+from typing import Any, Dict, Iterable, Iterator, List
+
+from corpus_loader import iter_corpus
+
+# ==============================
+# Sentence-aware chunking of the corpus
+# ==============================
+# Long pages (CDC / WHO) embedded as one vector blur retrieval and waste
+# prompt tokens. The corpus build step can instead emit chunk records:
+#
+#   {"id": "doc-010#c0", "parent_id": "doc-010", "chunk_index": 0,
+#    "category": ..., "title": ..., "tags": ..., "text": "..."}
+#
+# Everything works line by line, so corpora of hundreds of MB are never held
+# in memory. retrieve_docs collapses chunk hits back to their parent docs
+# with collapse_to_parents().
+
+DEFAULT_CHUNK_CHARS = 1200
+DEFAULT_OVERLAP_CHARS = 200
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+def _split_long(sentence: str, max_chars: int) -> List[str]:
+    """
+    Cut a sentence longer than max_chars at word boundaries.
+    """
+    pieces: List[str] = []
+    current = ""
+    for word in sentence.split():
+        if current and len(current) + 1 + len(word) > max_chars:
+            pieces.append(current)
+            current = word
+        else:
+            current = f"{current} {word}" if current else word
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def chunk_text(
+    text: str,
+    max_chars: int = DEFAULT_CHUNK_CHARS,
+    overlap_chars: int = DEFAULT_OVERLAP_CHARS,
+) -> List[str]:
+    """
+    Split text into chunks of whole sentences, each at most max_chars long
+    (single sentences longer than that are cut at word boundaries). Each chunk
+    after the first starts with the last sentences of the previous one, up to
+    overlap_chars of them.
+    """
+    sentences: List[str] = []
+    for sentence in _SENTENCE_END.split(" ".join(text.split())):
+        sentences.extend(_split_long(sentence, max_chars) if len(sentence) > max_chars else [sentence])
+
+    chunks: List[str] = []
+    current: List[str] = []
+    length = 0
+    for sentence in sentences:
+        if current and length + 1 + len(sentence) > max_chars:
+            chunks.append(" ".join(current))
+            # Carry the tail of this chunk over as overlap
+            carry: List[str] = []
+            carry_len = 0
+            for prev in reversed(current):
+                if carry_len + len(prev) + 1 > overlap_chars:
+                    break
+                carry.insert(0, prev)
+                carry_len += len(prev) + 1
+            if carry and carry_len + len(sentence) + 1 > max_chars:
+                carry, carry_len = [], 0
+            current, length = carry, max(carry_len - 1, 0)
+        current.append(sentence)
+        length += len(sentence) + (1 if length else 0)
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
+
+
+def iter_chunk_records(
+    docs: Iterable[Dict[str, Any]],
+    max_chars: int = DEFAULT_CHUNK_CHARS,
+    overlap_chars: int = DEFAULT_OVERLAP_CHARS,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Yield chunk records for a stream of corpus docs.
+    """
+    for doc in docs:
+        for i, piece in enumerate(chunk_text(doc.get("text", ""), max_chars, overlap_chars)):
+            record = {k: v for k, v in doc.items() if k not in ("id", "text")}
+            record.update(
+                {
+                    "id": f"{doc['id']}#c{i}",
+                    "parent_id": doc["id"],
+                    "chunk_index": i,
+                    "text": piece,
+                }
+            )
+            yield record
+
+
+def chunk_corpus_file(
+    in_path: str,
+    out_path: str,
+    max_chars: int = DEFAULT_CHUNK_CHARS,
+    overlap_chars: int = DEFAULT_OVERLAP_CHARS,
+) -> int:
+    """
+    Stream a corpus JSONL into a chunk JSONL; returns the number of chunks written.
+    """
+    count = 0
+    with open(out_path, "w", encoding="utf-8") as out:
+        for record in iter_chunk_records(iter_corpus(in_path), max_chars, overlap_chars):
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            count += 1
+    return count
+
+
+def _strip_overlap(previous: str, text: str) -> str:
+    """
+    text without its leading sentences that repeat the end of previous (the
+    overlap chunk_text() carries into the next chunk).
+    """
+    sentences = _SENTENCE_END.split(text)
+    for m in range(len(sentences), 0, -1):
+        head = " ".join(sentences[:m])
+        if previous.endswith(head) and (len(previous) == len(head) or previous[-len(head) - 1] == " "):
+            return " ".join(sentences[m:])
+    return text
+
+
+def _join_chunks(group: List[Dict[str, Any]]) -> str:
+    """
+    Texts of chunk hits sorted by chunk_index, joined without repeating the
+    overlap between adjacent chunks.
+    """
+    text = group[0]["text"]
+    previous_index = (group[0].get("metadata") or {}).get("chunk_index", 0)
+    for hit in group[1:]:
+        index = (hit.get("metadata") or {}).get("chunk_index", 0)
+        piece = _strip_overlap(text, hit["text"]) if index == previous_index + 1 else hit["text"]
+        if piece:
+            text = f"{text} {piece}"
+        previous_index = index
+    return text
+
+
+def collapse_to_parents(hits: List[Dict[str, Any]], n_results: int) -> List[Dict[str, Any]]:
+    """
+    Merge retrieve_docs hits that are chunks of the same doc into one hit per
+    parent, ranked by its best chunk. The merged text joins the hit chunks in
+    document order, with the overlap between adjacent chunks kept once. Hits
+    without a parent_id pass through unchanged.
+    """
+    groups: Dict[str, List[Dict[str, Any]]] = {}
+    for hit in hits:
+        parent_id = (hit.get("metadata") or {}).get("parent_id") or hit["id"]
+        groups.setdefault(parent_id, []).append(hit)
+
+    out: List[Dict[str, Any]] = []
+    for parent_id, group in list(groups.items())[:n_results]:
+        if len(group) == 1 and group[0]["id"] == parent_id:
+            out.append(group[0])
+            continue
+        group.sort(key=lambda h: (h.get("metadata") or {}).get("chunk_index", 0))
+        metadata = dict(group[0].get("metadata") or {})
+        metadata.pop("chunk_index", None)
+        out.append(
+            {
+                "id": parent_id,
+                "text": _join_chunks(group),
+                "metadata": metadata,
+            }
+        )
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Split a corpus JSONL into overlapping, sentence-aware chunks.")
+    parser.add_argument("input", nargs="?", default="flu_rag_corpus.jsonl")
+    parser.add_argument("output", nargs="?", default="flu_rag_chunks.jsonl")
+    parser.add_argument("--chunk-chars", type=int, default=DEFAULT_CHUNK_CHARS)
+    parser.add_argument("--overlap-chars", type=int, default=DEFAULT_OVERLAP_CHARS)
+    args = parser.parse_args()
+
+    count = chunk_corpus_file(args.input, args.output, args.chunk_chars, args.overlap_chars)
+    print(f"Wrote {count} chunks to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+import logging
+import math
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, List, Set
+
+from tokenizer import tokenize
+
+# ==============================
+# Token-budgeted prompt context
+# ==============================
+# Instead of pasting whole documents into the prompt, keep the sentences that
+# overlap most with the user's message, drop near-duplicate sentences, and
+# stop when the token budget is used up.
+
+logger = logging.getLogger(__name__)
+
+# Rough English average for Claude's tokenizer; good enough for budgeting.
+CHARS_PER_TOKEN = 4
+
+# Two sentences with at least this Jaccard overlap of their words count as duplicates.
+DUPLICATE_OVERLAP = 0.8
+
+SEPARATOR = "\n\n---\n\n"
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+|\n+")
+
+# Common words that should not make a sentence look relevant.
+_IGNORED = {
+    "a", "an", "the", "and", "or", "of", "to", "in", "on", "for", "with", "is", "are",
+    "i", "my", "me", "have", "has", "had", "be", "it", "this", "that", "what", "how",
+}
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def split_sentences(text: str) -> List[str]:
+    return [s.strip() for s in _SENTENCE_END.split(text) if s.strip()]
+
+
+def _words(text: str) -> Set[str]:
+    return {w for w in tokenize(text) if w not in _IGNORED}
+
+
+@dataclass
+class PackedContext:
+    text: str
+    tokens: int
+    docs_used: int
+    sentences_used: int
+    sentences_dropped: int
+
+
+def _doc_header(doc: Dict[str, Any]) -> str:
+    meta = doc.get("metadata", {})
+    category = meta.get("category", "")
+    title = meta.get("title", "")
+    return f"[{category}] {title}".strip() if category else title
+
+
+def pack_context(query: str, docs: List[Dict[str, Any]], token_budget: int) -> PackedContext:
+    """
+    Fill token_budget with the most query-relevant sentences of docs.
+
+    Docs come best-first (as retrieve_docs returns them). Every sentence is
+    scored by how many of the query's words it contains, with a small bonus
+    for better-ranked docs so ties go to them. Sentences are then taken
+    greedily by score while they fit, skipping near-duplicates of sentences
+    already taken. The output keeps each doc's header and its sentences in
+    their original order.
+    """
+    query_words = _words(query)
+    candidates = []  # (score, doc index, sentence index, sentence, words)
+    sentences_per_doc: List[List[str]] = []
+    for d_i, doc in enumerate(docs):
+        sentences = split_sentences(doc.get("text", ""))
+        sentences_per_doc.append(sentences)
+        rank_bonus = 1.0 / (d_i + 2)
+        for s_i, sentence in enumerate(sentences):
+            words = _words(sentence)
+            overlap = len(query_words & words) / math.sqrt(len(words) or 1)
+            candidates.append((overlap + rank_bonus, d_i, s_i, sentence, words))
+    candidates.sort(key=lambda c: (-c[0], c[1], c[2]))
+
+    chosen: Dict[int, List[int]] = {}
+    kept_words: List[Set[str]] = []
+    used = 0
+    dropped = 0
+    for _, d_i, s_i, sentence, words in candidates:
+        duplicate = any(
+            len(words & other) / (len(words | other) or 1) >= DUPLICATE_OVERLAP
+            for other in kept_words
+        )
+        cost = estimate_tokens(sentence) + 1
+        if d_i not in chosen:
+            cost += estimate_tokens(_doc_header(docs[d_i]) + SEPARATOR)
+        if duplicate or used + cost > token_budget:
+            dropped += 1
+            continue
+        chosen.setdefault(d_i, []).append(s_i)
+        kept_words.append(words)
+        used += cost
+
+    chunks = []
+    for d_i in sorted(chosen):
+        header = _doc_header(docs[d_i])
+        body = " ".join(sentences_per_doc[d_i][s_i] for s_i in sorted(chosen[d_i]))
+        chunks.append(f"{header}\n{body}" if header else body)
+
+    text = SEPARATOR.join(chunks)
+    return PackedContext(
+        text=text,
+        tokens=estimate_tokens(text),
+        docs_used=len(chunks),
+        sentences_used=sum(len(v) for v in chosen.values()),
+        sentences_dropped=dropped,
+    )
+
+
+def log_packed(packed: PackedContext, token_budget: int) -> None:
+    logger.info(
+        "RAG context: %d/%d tokens, %d docs, %d sentences kept, %d dropped",
+        packed.tokens,
+        token_budget,
+        packed.docs_used,
+        packed.sentences_used,
+        packed.sentences_dropped,
+    )
@@ -0,0 +1,176 @@
+import argparse
+import json
+import logging
+import mmap
+import os
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# ==============================
+# Streaming, validating corpus reader
+# ==============================
+# The corpus JSONL is memory-mapped and decoded one line at a time, so
+# building the index from a million-chunk file never holds more than one
+# batch of docs. Every line is checked against the corpus schema; bad lines
+# are reported with their line number and skipped (or raise with strict=True).
+# iter_corpus_offsets() also yields each doc's byte offset, so an index can
+# keep offsets instead of docs and read them back through a CorpusReader.
+
+logger = logging.getLogger(__name__)
+
+# field -> allowed types; "id" and "text" are required
+DOC_SCHEMA = {
+    "id": (str,),
+    "text": (str,),
+    "category": (str,),
+    "title": (str,),
+    "tags": (list, str),
+    "parent_id": (str,),
+    "chunk_index": (int,),
+}
+REQUIRED_FIELDS = ("id", "text")
+
+
+@dataclass
+class BadLine:
+    line_no: int
+    reason: str
+
+    def __str__(self) -> str:
+        return f"line {self.line_no}: {self.reason}"
+
+
+class CorpusFormatError(ValueError):
+    def __init__(self, path: str, bad: BadLine):
+        super().__init__(f"{path}, {bad}")
+        self.path = path
+        self.bad = bad
+
+
+def validate_doc(doc: Any) -> Optional[str]:
+    """
+    Why doc does not match DOC_SCHEMA, or None if it does.
+    """
+    if not isinstance(doc, dict):
+        return f"expected a JSON object, got {type(doc).__name__}"
+    for field in REQUIRED_FIELDS:
+        if field not in doc:
+            return f"missing required field {field!r}"
+    for field, types in DOC_SCHEMA.items():
+        if field in doc and not isinstance(doc[field], types):
+            expected = " or ".join(t.__name__ for t in types)
+            return f"field {field!r} should be {expected}, got {type(doc[field]).__name__}"
+    if not doc["id"].strip():
+        return "empty 'id'"
+    if not doc["text"].strip():
+        return "empty 'text'"
+    return None
+
+
+def _lines(path: str) -> Iterator[Tuple[int, bytes]]:
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return  # mmap cannot map an empty file
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            offset = 0
+            for raw in iter(mm.readline, b""):
+                yield offset, raw
+                offset += len(raw)
+
+
+def iter_corpus_offsets(
+    path: str,
+    strict: bool = False,
+    bad_lines: Optional[List[BadLine]] = None,
+) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """
+    Like iter_corpus(), but yield (byte offset of the line, doc) pairs.
+    """
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"{path} not found.")
+
+    seen_ids = set()
+    for line_no, (offset, raw) in enumerate(_lines(path), start=1):
+        raw = raw.strip()
+        if not raw:
+            continue
+        try:
+            doc = json.loads(raw)
+            reason = validate_doc(doc)
+        except (UnicodeDecodeError, json.JSONDecodeError) as e:
+            reason = f"invalid JSON ({e})"
+        if reason is None and doc["id"] in seen_ids:
+            reason = f"duplicate id {doc['id']!r}"
+
+        if reason is not None:
+            bad = BadLine(line_no, reason)
+            if strict:
+                raise CorpusFormatError(path, bad)
+            if bad_lines is not None:
+                bad_lines.append(bad)
+            else:
+                logger.warning("Skipping %s, %s", path, bad)
+            continue
+
+        seen_ids.add(doc["id"])
+        yield offset, doc
+
+
+def iter_corpus(
+    path: str,
+    strict: bool = False,
+    bad_lines: Optional[List[BadLine]] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Yield the valid docs of a corpus JSONL file, in file order.
+
+    Invalid JSON, schema violations and repeated ids are skipped and reported
+    with their line number: appended to bad_lines if given, otherwise logged
+    as warnings. With strict=True the first bad line raises CorpusFormatError.
+    """
+    for _, doc in iter_corpus_offsets(path, strict, bad_lines):
+        yield doc
+
+
+class CorpusReader:
+    """
+    Random access to the docs of a corpus file by the byte offsets from
+    iter_corpus_offsets(). The file stays memory-mapped until close(), so
+    replace the file (write + rename) rather than rewriting it in place
+    while a reader is open.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+
+    def doc_at(self, offset: int) -> Dict[str, Any]:
+        if self._map is None:
+            raise IndexError(f"{self.path} is empty")
+        end = self._map.find(b"\n", offset)
+        return json.loads(self._map[offset : end if end != -1 else len(self._map)])
+
+    def close(self) -> None:
+        if self._map is not None:
+            self._map.close()
+        self._file.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check a corpus JSONL file against the corpus schema.")
+    parser.add_argument("corpus", nargs="?", default="flu_rag_corpus.jsonl")
+    args = parser.parse_args()
+
+    bad_lines: List[BadLine] = []
+    valid = sum(1 for _ in iter_corpus(args.corpus, bad_lines=bad_lines))
+    for bad in bad_lines:
+        print(bad)
+    print(f"{args.corpus}: {valid} valid docs, {len(bad_lines)} bad lines")
+    if bad_lines:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
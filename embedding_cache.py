@@ -0,0 +1,274 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+from chromadb.api.types import EmbeddingFunction
+
+# ==============================
+# Persistent embedding cache
+# ==============================
+# Vectors live in one memory-mapped float32 file, one row per cached text;
+# a SQLite table maps sha256(text) -> row. Every embedding model gets its own
+# pair of files, so switching models can never return another model's vectors.
+# When the cache is full the least recently used row is overwritten.
+#
+# Several processes (the sync workers' parent, app1.py, stream.py) may share
+# the files, so SQLite is the only record of which row holds what:
+# - rows are handed out inside a BEGIN IMMEDIATE transaction, which also
+#   deletes the keys being evicted and reserves their rows (ready = 0)
+#   before any vector is overwritten;
+# - a reader copies vectors while its read transaction is open, which keeps
+#   a writer from committing an eviction of those rows in the meantime
+#   (the database stays in the default rollback-journal mode for this);
+# - hits are written back to `used` in batches of TOUCH_BATCH.
+
+DEFAULT_MAX_ENTRIES = 50_000
+
+# Hits whose recency is kept in memory before it is written to SQLite
+TOUCH_BATCH = 256
+
+SCHEMA_VERSION = "2"
+
+# Max keys per `IN (...)` lookup
+_LOOKUP_CHUNK = 500
+
+
+def text_key(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _now() -> int:
+    # Microseconds: comparable across processes, unlike a per-process counter
+    return time.time_ns() // 1000
+
+
+class EmbeddingCache:
+    def __init__(self, directory: str, model_name: str, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # key -> last hit, not written to SQLite yet
+        self._touched: Dict[str, int] = {}
+
+        os.makedirs(directory, exist_ok=True)
+        stem = os.path.join(directory, re.sub(r"[^A-Za-z0-9_.-]", "_", model_name))
+        self._vectors_path = stem + ".f32"
+        # Autocommit: every transaction below is opened explicitly
+        self._db = sqlite3.connect(stem + ".sqlite", timeout=30, check_same_thread=False, isolation_level=None)
+        with self._transaction():
+            self._db.execute("CREATE TABLE IF NOT EXISTS cache_meta (key TEXT PRIMARY KEY, value TEXT)")
+            meta = dict(self._db.execute("SELECT key, value FROM cache_meta").fetchall())
+            if meta.get("schema") != SCHEMA_VERSION:
+                self._db.execute("DROP TABLE IF EXISTS embedding_rows")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embedding_rows "
+                "(key TEXT PRIMARY KEY, row INTEGER NOT NULL, used INTEGER NOT NULL, ready INTEGER NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS embedding_rows_used ON embedding_rows (used)")
+
+            self.dim: Optional[int] = int(meta["dim"]) if "dim" in meta else None
+            self._vectors: Optional[np.memmap] = None
+            if (
+                meta.get("schema") != SCHEMA_VERSION
+                or meta.get("model") != model_name
+                or int(meta.get("max_entries", max_entries)) != max_entries
+                or (self.dim is not None and not os.path.exists(self._vectors_path))
+            ):
+                self._reset()
+            elif self.dim is not None:
+                self._map_vectors("r+")
+
+    @contextmanager
+    def _transaction(self, mode: str = "IMMEDIATE"):
+        """
+        BEGIN IMMEDIATE (the write lock, other writers wait) or DEFERRED
+        (a read snapshot) ... COMMIT, or ROLLBACK on error.
+        """
+        self._db.execute(f"BEGIN {mode}")
+        try:
+            yield
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            raise
+        self._db.execute("COMMIT")
+
+    def _reset(self) -> None:
+        self._db.execute("DELETE FROM embedding_rows")
+        self._db.execute("DELETE FROM cache_meta")
+        self._db.executemany(
+            "INSERT INTO cache_meta (key, value) VALUES (?, ?)",
+            [("schema", SCHEMA_VERSION), ("model", self.model_name), ("max_entries", str(self.max_entries))],
+        )
+        if os.path.exists(self._vectors_path):
+            os.remove(self._vectors_path)
+        self.dim = None
+        self._vectors = None
+
+    def _map_vectors(self, mode: str) -> None:
+        self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode=mode, shape=(self.max_entries, self.dim))
+
+    def _open_vectors(self, dim: Optional[int] = None) -> None:
+        """
+        Map the vector file, creating it (with dim) if no process has yet.
+        Call inside a transaction.
+        """
+        row = self._db.execute("SELECT value FROM cache_meta WHERE key = 'dim'").fetchone()
+        if row is not None:
+            self.dim = int(row[0])
+            self._map_vectors("r+")
+        elif dim is not None:
+            self.dim = dim
+            self._map_vectors("w+")
+            self._db.execute("INSERT INTO cache_meta (key, value) VALUES ('dim', ?)", (str(dim),))
+
+    def _lookup(self, keys: Sequence[str], ready_only: bool = True) -> Dict[str, int]:
+        rows: Dict[str, int] = {}
+        ready = " AND ready = 1" if ready_only else ""
+        for i in range(0, len(keys), _LOOKUP_CHUNK):
+            chunk = keys[i:i + _LOOKUP_CHUNK]
+            rows.update(
+                self._db.execute(
+                    f"SELECT key, row FROM embedding_rows WHERE key IN ({','.join('?' * len(chunk))}){ready}",
+                    chunk,
+                ).fetchall()
+            )
+        return rows
+
+    def _write_touches(self) -> None:
+        if self._touched:
+            self._db.executemany(
+                "UPDATE embedding_rows SET used = ? WHERE key = ?",
+                [(used, key) for key, used in self._touched.items()],
+            )
+            self._touched.clear()
+
+    def get_many(self, texts: Sequence[str]) -> List[Optional[np.ndarray]]:
+        """
+        Cached vector for each text, or None where it is not cached.
+        """
+        keys = [text_key(text) for text in texts]
+        with self._lock:
+            with self._transaction("DEFERRED"):
+                rows = self._lookup(keys)
+                if rows and self._vectors is None:
+                    self._open_vectors()
+                out = [np.array(self._vectors[rows[key]]) if key in rows else None for key in keys]
+            self.hits += len(rows)
+            self.misses += len(keys) - len(rows)
+            if rows:
+                stamp = _now()
+                self._touched.update((key, stamp) for key in rows)
+                if len(self._touched) >= TOUCH_BATCH:
+                    with self._transaction():
+                        self._write_touches()
+        return out
+
+    def put_many(self, texts: Sequence[str], vectors: Sequence[Any]) -> None:
+        if not texts:
+            return
+        with self._lock:
+            stamp = _now()
+            # One entry per text (the last vector wins), oldest first
+            new: Dict[str, Any] = {}
+            for text, vector in zip(texts, vectors):
+                new.pop(text_key(text), None)
+                new[text_key(text)] = vector
+
+            # 1) Reserve rows: evicted keys are deleted and the rows claimed in
+            #    one committed transaction, before any vector is overwritten
+            with self._transaction():
+                if self._vectors is None:
+                    self._open_vectors(len(vectors[0]))
+                self._write_touches()
+                for key in self._lookup(list(new), ready_only=False):
+                    del new[key]  # another process cached it meanwhile
+                # Rows are always 0..count-1: evicted rows are refilled at once
+                count = self._db.execute("SELECT COUNT(*) FROM embedding_rows").fetchone()[0]
+                free = list(range(count, min(count + len(new), self.max_entries)))
+                if len(free) < len(new):
+                    evicted = self._db.execute(
+                        "SELECT key, row FROM embedding_rows ORDER BY used LIMIT ?", (len(new) - len(free),)
+                    ).fetchall()
+                    self._db.executemany("DELETE FROM embedding_rows WHERE key = ?", [(k,) for k, _ in evicted])
+                    free += [row for _, row in evicted]
+                items = list(new.items())[len(new) - len(free):]
+                self._db.executemany(
+                    "INSERT INTO embedding_rows (key, row, used, ready) VALUES (?, ?, ?, 0)",
+                    [(key, row, stamp + i) for i, ((key, _), row) in enumerate(zip(items, free))],
+                )
+
+            # 2) Write the vectors; they reach the file before the index points at them
+            for (_, vector), row in zip(items, free):
+                self._vectors[row] = np.asarray(vector, dtype=np.float32)
+            self._vectors.flush()
+
+            # 3) Publish
+            with self._transaction():
+                self._db.executemany(
+                    "UPDATE embedding_rows SET ready = 1 WHERE key = ? AND row = ?",
+                    [(key, row) for (key, _), row in zip(items, free)],
+                )
+
+    def stats(self) -> Dict[str, float]:
+        total = self.hits + self.misses
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM embedding_rows WHERE ready = 1").fetchone()[0]
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            "entries": entries,
+        }
+
+
+class CachedEmbeddingFunction(EmbeddingFunction):
+    """
+    Chroma embedding function that answers from an EmbeddingCache and runs
+    the wrapped model only on the texts that are not cached yet.
+
+    It reports the wrapped function's name and config, so collections created
+    with the plain model open with the cached one and vice versa.
+    """
+
+    def __init__(self, model_fn, cache: EmbeddingCache):
+        self.model_fn = model_fn
+        self.cache = cache
+
+    def __call__(self, input):
+        vectors = self.cache.get_many(input)
+        missing = [i for i, v in enumerate(vectors) if v is None]
+        if missing:
+            texts = [input[i] for i in missing]
+            self.fill(vectors, missing, texts, self.model_fn(texts))
+        return vectors
+
+    def fill(self, vectors: List[Any], missing: List[int], texts: List[str], embedded: Sequence[Any]) -> None:
+        """
+        Put freshly embedded texts into the cache and into their slots in vectors.
+        """
+        self.cache.put_many(texts, embedded)
+        for i, vector in zip(missing, embedded):
+            vectors[i] = np.asarray(vector, dtype=np.float32)
+
+    def name(self) -> str:
+        return self.model_fn.name()
+
+    def get_config(self) -> Dict[str, Any]:
+        return self.model_fn.get_config()
+
+    def build_from_config(self, config: Dict[str, Any]):
+        return self.model_fn.build_from_config(config)
+
+    def default_space(self):
+        return self.model_fn.default_space()
+
+    def supported_spaces(self):
+        return self.model_fn.supported_spaces()
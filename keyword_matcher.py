@@ -0,0 +1,112 @@
+from collections import deque
+from typing import Dict, Iterable, List, Sequence, Set, Tuple
+
+# ==============================
+# Aho–Corasick keyword matcher
+# ==============================
+# Finds every keyword of a (possibly very large) keyword -> value map in one
+# pass over the text, instead of one `kw in text` scan per keyword.
+
+# Word endings that still count as the keyword (plural, past tense, ...)
+INFLECTION_SUFFIXES = ("s", "es", "d", "ed", "ing", "ish", "ness")
+
+
+class KeywordMatcher:
+    """
+    Precompiled automaton over lower-cased keywords.
+
+    With word_boundaries=True (the default) a keyword only counts when it is
+    not glued to letters/digits on either side, so "hi" does not match inside
+    "chills" and "ache" does not match inside "headaches". A keyword may
+    still be followed by one of `suffixes` as the rest of the word, so with
+    INFLECTION_SUFFIXES "sore throat" also matches "sore throats" and
+    "fatigue" matches "fatigued".
+    """
+
+    def __init__(
+        self, keyword_map: Dict[str, str], word_boundaries: bool = True, suffixes: Sequence[str] = ()
+    ):
+        self.word_boundaries = word_boundaries
+        self.suffixes = frozenset(suffixes)
+        # goto[state][char] -> next state; outputs[state] -> [(keyword length, value)]
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._outputs: List[List[Tuple[int, str]]] = [[]]
+
+        for kw, value in keyword_map.items():
+            self._insert(kw.lower(), value)
+        self._build_fail_links()
+
+    def __len__(self) -> int:
+        return len(self._goto)
+
+    def _insert(self, kw: str, value: str) -> None:
+        if not kw:
+            return
+        state = 0
+        for ch in kw:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._outputs.append([])
+            state = nxt
+        self._outputs[state].append((len(kw), value))
+
+    def _build_fail_links(self) -> None:
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                f = self._fail[state]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                target = self._goto[f].get(ch, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                # Inherit matches that end here via the failure link
+                self._outputs[nxt] = self._outputs[nxt] + self._outputs[self._fail[nxt]]
+
+    def iter_matches(self, text: str) -> Iterable[Tuple[int, int, str]]:
+        """
+        Yield (start, end, value) for every keyword occurrence in text (end exclusive).
+        """
+        text = text.lower()
+        goto = self._goto
+        fail = self._fail
+        outputs = self._outputs
+        check = self.word_boundaries
+        n = len(text)
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if not outputs[state]:
+                continue
+            end = i + 1
+            for length, value in outputs[state]:
+                start = end - length
+                if check and (
+                    (start > 0 and text[start - 1].isalnum())
+                    or (end < n and text[end].isalnum() and not self._inflected(text, end))
+                ):
+                    continue
+                yield start, end, value
+
+    def _inflected(self, text: str, end: int) -> bool:
+        """
+        Whether the word running on after a keyword ending at `end` is one of the suffixes.
+        """
+        rest = end
+        while rest < len(text) and text[rest].isalnum():
+            rest += 1
+        return text[end:rest] in self.suffixes
+
+    def find_values(self, text: str) -> Set[str]:
+        """
+        Set of values whose keywords occur in text.
+        """
+        return {value for _, _, value in self.iter_matches(text)}
@@ -0,0 +1,149 @@
+from collections import Counter
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from corpus_loader import BadLine, CorpusReader, iter_corpus_offsets
+from tokenizer import tokenize
+from vector_store import doc_metadata
+
+# ==============================
+# In-process BM25 index + reciprocal-rank fusion
+# ==============================
+# Vector search alone tends to under-rank exact medical terms ("oseltamivir",
+# "pink eye", "incubation"). The BM25 index below is built once from the
+# corpus (title + tags + text) and stored as flat arrays; its hits are fused
+# with the Chroma hits by reciprocal rank. The docs themselves are not kept:
+# only their ids and byte offsets in the corpus file, which stays mmapped.
+
+def doc_search_text(doc: Dict[str, Any]) -> str:
+    tags = doc.get("tags", [])
+    tags = " ".join(tags) if isinstance(tags, list) else str(tags)
+    return f"{doc.get('title', '')} {tags} {doc.get('text', '')}"
+
+
+class BM25Index:
+    """
+    Okapi BM25 over the valid docs of a corpus file, streamed once with
+    iter_corpus_offsets() (bad lines go to bad_lines or the log, as in iter_corpus()).
+
+    Postings are kept in CSR form: for term t, postings_docs[offsets[t]:offsets[t + 1]]
+    are the docs containing it and postings_weights the matching BM25 term-frequency
+    parts, so a query is a few array gathers and adds. doc() reads a doc back
+    from the file by its byte offset.
+    """
+
+    def __init__(
+        self,
+        corpus_path: str,
+        k1: float = 1.5,
+        b: float = 0.75,
+        bad_lines: Optional[List[BadLine]] = None,
+    ):
+        self.ids: List[str] = []
+        self.vocab: Dict[str, int] = {}
+        self.category_codes: Dict[str, int] = {}
+
+        byte_offsets: List[int] = []
+        categories: List[int] = []
+        doc_lens: List[int] = []
+        term_col: List[int] = []
+        doc_col: List[int] = []
+        tf_col: List[int] = []
+        for row, (offset, doc) in enumerate(iter_corpus_offsets(corpus_path, bad_lines=bad_lines)):
+            self.ids.append(doc["id"])
+            byte_offsets.append(offset)
+            categories.append(self.category_codes.setdefault(doc.get("category", ""), len(self.category_codes)))
+            tokens = tokenize(doc_search_text(doc))
+            doc_lens.append(len(tokens))
+            for term, tf in Counter(tokens).items():
+                term_col.append(self.vocab.setdefault(term, len(self.vocab)))
+                doc_col.append(row)
+                tf_col.append(tf)
+
+        self._row = {doc_id: i for i, doc_id in enumerate(self.ids)}
+        self.doc_offsets = np.asarray(byte_offsets, dtype=np.int64)
+        self.doc_category = np.asarray(categories, dtype=np.int16)
+        self.reader = CorpusReader(corpus_path)
+        doc_len = np.asarray(doc_lens, dtype=np.float32)
+
+        terms = np.asarray(term_col, dtype=np.int32)
+        order = np.argsort(terms, kind="stable")
+        df = np.bincount(terms, minlength=len(self.vocab))
+
+        self.offsets = np.zeros(len(self.vocab) + 1, dtype=np.int64)
+        np.cumsum(df, out=self.offsets[1:])
+        self.postings_docs = np.asarray(doc_col, dtype=np.int32)[order]
+
+        tf = np.asarray(tf_col, dtype=np.float32)[order]
+        avgdl = float(doc_len.mean()) if len(self.ids) else 0.0
+        norm = k1 * (1.0 - b + b * doc_len[self.postings_docs] / (avgdl or 1.0))
+        self.postings_weights = (tf * (k1 + 1.0) / (tf + norm)).astype(np.float32)
+
+        n = len(self.ids)
+        self.idf = np.log(1.0 + (n - df + 0.5) / (df + 0.5)).astype(np.float32)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def doc(self, doc_id: str) -> Dict[str, Any]:
+        return self.reader.doc_at(int(self.doc_offsets[self._row[doc_id]]))
+
+    def search(
+        self, query: str, k: int = 10, categories: Optional[Sequence[str]] = None
+    ) -> List[Tuple[str, float]]:
+        """
+        Top-k (doc id, BM25 score), best first; docs sharing no term with the query are left out.
+        With categories, only docs in those categories are returned.
+        """
+        scores = np.zeros(len(self.ids), dtype=np.float32)
+        for term in set(tokenize(query)):
+            t = self.vocab.get(term)
+            if t is None:
+                continue
+            lo, hi = self.offsets[t], self.offsets[t + 1]
+            scores[self.postings_docs[lo:hi]] += self.idf[t] * self.postings_weights[lo:hi]
+        if categories:
+            codes = [self.category_codes[c] for c in categories if c in self.category_codes]
+            scores[~np.isin(self.doc_category, codes)] = 0.0
+
+        hits = np.flatnonzero(scores)
+        if len(hits) > k:
+            hits = hits[np.argpartition(-scores[hits], k)[:k]]
+        hits = hits[np.argsort(-scores[hits], kind="stable")]
+        return [(self.ids[i], float(scores[i])) for i in hits]
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[str]], k: int = 60) -> List[str]:
+    """
+    Merge several best-first id lists: score(id) = sum over lists of 1 / (k + rank).
+    """
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores, key=lambda doc_id: -scores[doc_id])
+
+
+def fuse_with_lexical(
+    query: str,
+    vector_hits: List[Dict[str, Any]],
+    index: BM25Index,
+    n_results: int,
+    depth: int,
+    categories: Optional[Sequence[str]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Fuse retrieve_docs-style vector hits with the top `depth` BM25 hits and
+    return the best n_results in the same {"id", "text", "metadata"} shape.
+    """
+    found = {hit["id"]: hit for hit in vector_hits}
+    lexical_ranking = []
+    for doc_id, _ in index.search(query, depth, categories):
+        lexical_ranking.append(doc_id)
+        if doc_id not in found:
+            doc = index.doc(doc_id)
+            found[doc_id] = {"id": doc_id, "text": doc["text"], "metadata": doc_metadata(doc)}
+
+    fused = reciprocal_rank_fusion([[hit["id"] for hit in vector_hits], lexical_ranking])
+    return [found[doc_id] for doc_id in fused[:n_results]]
@@ -0,0 +1,310 @@
+import logging
+import os
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from metrics import incr, stage
+from prompt_cache import record_usage
+
+# ==============================
+# Shared gateway for Claude calls
+# ==============================
+# One pooled client per process, so keep-alive connections are reused across
+# requests and Streamlit sessions. Each call gets a deadline, and 429 / 5xx /
+# connection errors are retried with jittered exponential backoff inside it.
+# A circuit breaker trips after repeated failures. While it is open, calls
+# fail fast with LLMUnavailable and the caller answers from rules instead
+# of waiting on an unhealthy provider.
+#
+# anthropic is imported on first use (see the startup-time notes in README).
+
+logger = logging.getLogger(__name__)
+
+DEADLINE_SECONDS = float(os.environ.get("FLU_RAG_LLM_DEADLINE", "30"))
+CONNECT_TIMEOUT = float(os.environ.get("FLU_RAG_LLM_CONNECT_TIMEOUT", "5"))
+MAX_RETRIES = int(os.environ.get("FLU_RAG_LLM_RETRIES", "3"))
+MAX_CONNECTIONS = int(os.environ.get("FLU_RAG_LLM_MAX_CONNECTIONS", "20"))
+KEEPALIVE_SECONDS = 30.0
+
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 8.0
+
+BREAKER_FAILURES = int(os.environ.get("FLU_RAG_BREAKER_FAILURES", "5"))
+BREAKER_RESET_SECONDS = float(os.environ.get("FLU_RAG_BREAKER_RESET", "30"))
+
+RETRY_STATUS = {408, 409, 429}  # plus every 5xx
+
+
+class LLMUnavailable(RuntimeError):
+    """Claude did not answer within the deadline, or the circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    closed: calls go through. After `failure_threshold` failed calls in a row
+    it opens: calls are refused for `reset_seconds`. Then it is half-open: one
+    trial call goes through, and its outcome closes or re-opens the breaker.
+    """
+
+    def __init__(self, failure_threshold: int = BREAKER_FAILURES, reset_seconds: float = BREAKER_RESET_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_running = False
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state()
+
+    def _state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at < self.reset_seconds:
+            return "open"
+        return "half-open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self._state()
+            if state == "closed":
+                return True
+            if state == "half-open" and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def release(self) -> None:
+        """
+        A call ended in a way that says nothing about the provider's health
+        (e.g. a 400): the failure count and state stay as they are, but a
+        half-open trial slot is freed for the next call.
+        """
+        with self._lock:
+            self._trial_running = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._trial_running or self._failures >= self.failure_threshold:
+                if self._opened_at is None or self._trial_running:
+                    logger.warning("Claude circuit breaker open for %.0fs", self.reset_seconds)
+                self._opened_at = time.monotonic()
+            self._trial_running = False
+
+
+def is_retryable(error: BaseException) -> bool:
+    import anthropic
+
+    if isinstance(error, anthropic.APIConnectionError):  # includes timeouts
+        return True
+    if isinstance(error, anthropic.APIStatusError):
+        return error.status_code in RETRY_STATUS or error.status_code >= 500
+    return False
+
+
+def retry_after_seconds(error: BaseException) -> Optional[float]:
+    """
+    The server's Retry-After hint (seconds or HTTP date), if it sent one.
+    """
+    response = getattr(error, "response", None)
+    value = response.headers.get("retry-after") if response is not None else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        import email.utils
+
+        parsed = email.utils.parsedate_to_datetime(value)
+        return max(0.0, parsed.timestamp() - time.time()) if parsed else None
+
+
+def backoff_delay(attempt: int, error: BaseException) -> float:
+    """
+    Full-jitter exponential backoff, or the server's Retry-After if shorter than the cap.
+    """
+    hint = retry_after_seconds(error)
+    if hint is not None:
+        return min(hint, BACKOFF_CAP)
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+
+
+class LLMGateway:
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        base_url: Optional[str] = None,
+        deadline: float = DEADLINE_SECONDS,
+        max_retries: int = MAX_RETRIES,
+        max_connections: int = MAX_CONNECTIONS,
+        breaker: Optional[CircuitBreaker] = None,
+    ):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.deadline = deadline
+        self.max_retries = max_retries
+        self.max_connections = max_connections
+        self.breaker = breaker or CircuitBreaker()
+        self._lock = threading.Lock()
+        self._client = None
+        self._async_client = None
+
+    def _client_options(self, http_client_cls) -> Dict[str, Any]:
+        import anthropic
+
+        # The SDK's own httpx Limits class, so it matches the httpx it is built on
+        limits = type(anthropic.DEFAULT_CONNECTION_LIMITS)(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_connections,
+            keepalive_expiry=KEEPALIVE_SECONDS,
+        )
+        timeout = anthropic.Timeout(self.deadline, connect=CONNECT_TIMEOUT)
+        return dict(
+            api_key=self.api_key,
+            base_url=self.base_url,
+            timeout=timeout,
+            max_retries=0,  # retries happen here, inside the deadline
+            http_client=http_client_cls(limits=limits, timeout=timeout),
+        )
+
+    @property
+    def client(self):
+        with self._lock:
+            if self._client is None:
+                import anthropic
+
+                self._client = anthropic.Anthropic(**self._client_options(anthropic.DefaultHttpxClient))
+            return self._client
+
+    @property
+    def async_client(self):
+        with self._lock:
+            if self._async_client is None:
+                import anthropic
+
+                self._async_client = anthropic.AsyncAnthropic(
+                    **self._client_options(anthropic.DefaultAsyncHttpxClient)
+                )
+            return self._async_client
+
+    def _should_retry(self, error: Exception, attempt: int, deadline_at: float) -> Optional[float]:
+        """
+        Seconds to wait before the next attempt, or None to give up. Giving up
+        on a retryable error counts as a breaker failure and raises LLMUnavailable.
+        """
+        if not is_retryable(error):
+            # Not a provider-health problem (400 / 401, or a bad request on our
+            # side): neither a success nor a failure for the breaker
+            self.breaker.release()
+            return None
+        delay = backoff_delay(attempt, error)
+        if attempt >= self.max_retries or time.monotonic() + delay >= deadline_at:
+            self.breaker.record_failure()
+            incr("llm_unavailable")
+            raise LLMUnavailable(f"Claude call failed after {attempt + 1} attempt(s): {error}") from error
+        logger.warning("Claude call failed (%s), retry %d in %.2fs", error, attempt + 1, delay)
+        incr("llm_retries")
+        return delay
+
+    def _call(self, send: Callable[[float], Any], deadline: Optional[float] = None) -> Any:
+        if not self.breaker.allow():
+            incr("llm_breaker_rejections")
+            raise LLMUnavailable("Claude circuit breaker is open")
+        deadline_at = time.monotonic() + (deadline or self.deadline)
+        attempt = 0
+        while True:
+            try:
+                result = send(max(deadline_at - time.monotonic(), 0.001))
+            except Exception as e:
+                delay = self._should_retry(e, attempt, deadline_at)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                attempt += 1
+                continue
+            self.breaker.record_success()
+            return result
+
+    async def _acall(self, send, deadline: Optional[float] = None) -> Any:
+        import asyncio
+
+        if not self.breaker.allow():
+            incr("llm_breaker_rejections")
+            raise LLMUnavailable("Claude circuit breaker is open")
+        deadline_at = time.monotonic() + (deadline or self.deadline)
+        attempt = 0
+        while True:
+            try:
+                result = await send(max(deadline_at - time.monotonic(), 0.001))
+            except Exception as e:
+                delay = self._should_retry(e, attempt, deadline_at)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+            self.breaker.record_success()
+            return result
+
+    def create(self, request: Dict[str, Any], deadline: Optional[float] = None):
+        """
+        messages.create with deadline, retries and breaker; logs token usage.
+        """
+        with stage("llm"):
+            msg = self._call(lambda timeout: self.client.messages.create(**request, timeout=timeout), deadline)
+        record_usage(msg.usage)
+        return msg
+
+    async def acreate(self, request: Dict[str, Any], deadline: Optional[float] = None):
+        async def send(timeout):
+            return await self.async_client.messages.create(**request, timeout=timeout)
+
+        with stage("llm"):
+            msg = await self._acall(send, deadline)
+        record_usage(msg.usage)
+        return msg
+
+    def stream_text(self, request: Dict[str, Any], deadline: Optional[float] = None) -> Iterator[str]:
+        """
+        Yield the answer as text deltas. Opening the stream and waiting for the
+        first token are retried like create(); once text has been yielded a
+        failure can no longer be retried and raises LLMUnavailable.
+        """
+
+        def open_stream(timeout):
+            manager = self.client.messages.stream(**request, timeout=timeout)
+            stream = manager.__enter__()
+            try:
+                first = next(stream.text_stream, None)
+            except BaseException as e:
+                manager.__exit__(type(e), e, e.__traceback__)
+                raise
+            return manager, stream, first
+
+        with stage("llm_first_token"):
+            manager, stream, first = self._call(open_stream, deadline)
+        try:
+            if first is not None:
+                yield first
+            for text in stream.text_stream:
+                yield text
+            record_usage(stream.get_final_message().usage)
+        except Exception as e:
+            if not is_retryable(e):
+                raise
+            self.breaker.record_failure()
+            incr("llm_unavailable")
+            raise LLMUnavailable(f"Claude stream broke off: {e}") from e
+        finally:
+            manager.__exit__(None, None, None)
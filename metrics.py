@@ -0,0 +1,312 @@
+import contextvars
+import itertools
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from functools import wraps
+from typing import Callable, Dict, List, Optional, Tuple
+
+# ==============================
+# Request tracing + in-process metrics
+# ==============================
+# Off by default. With FLU_RAG_METRICS=1 every `with stage("retrieve"):`
+# block feeds a latency histogram for that stage, every ask_flu_bot call is
+# one trace (its stages are logged together at DEBUG level), and counters and
+# cache stats are collected on demand. They are exposed as Prometheus text on
+# FLU_RAG_METRICS_PORT (/metrics) and/or as a summary log line every
+# FLU_RAG_METRICS_LOG_SECONDS.
+#
+# When off, stage() hands back one shared no-op context manager, timed()
+# returns the function unchanged, and nothing is recorded.
+
+logger = logging.getLogger(__name__)
+
+ENABLED = os.environ.get("FLU_RAG_METRICS", "0") != "0"
+METRICS_PORT = int(os.environ.get("FLU_RAG_METRICS_PORT", "0"))
+LOG_SECONDS = float(os.environ.get("FLU_RAG_METRICS_LOG_SECONDS", "0"))
+
+PREFIX = "flu_rag"
+
+# Seconds; the last bucket is +Inf
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram:
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float:
+        """
+        Upper bound of the bucket holding the q-th observation (inf if it is past the last bucket).
+        """
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, n in zip(self.buckets, self.counts):
+            seen += n
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+
+class Registry:
+    """
+    Histograms keyed by (metric, label value), plain counters, and collectors:
+    callables that return a dict of current values (e.g. cache stats) and are
+    only called when the metrics are read.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.histograms: Dict[Tuple[str, str], Histogram] = {}
+        self.counters: Dict[str, float] = {}
+        self.collectors: List[Tuple[str, str, Callable[[], Dict[str, float]]]] = []
+
+    def observe(self, metric: str, label: str, seconds: float) -> None:
+        with self._lock:
+            hist = self.histograms.get((metric, label))
+            if hist is None:
+                hist = self.histograms[(metric, label)] = Histogram()
+            hist.observe(seconds)
+
+    def incr(self, name: str, value: float = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def add_collector(self, name: str, fn: Callable[[], Dict[str, float]], kind: str = "gauge") -> None:
+        with self._lock:
+            self.collectors = [c for c in self.collectors if c[0] != name] + [(name, kind, fn)]
+
+    def _collected(self) -> List[Tuple[str, str, Dict[str, float]]]:
+        out = []
+        for name, kind, fn in list(self.collectors):
+            try:
+                out.append((name, kind, fn()))
+            except Exception:
+                logger.exception("metrics collector %s failed", name)
+        return out
+
+    def render(self) -> str:
+        """
+        All metrics in the Prometheus text exposition format.
+        """
+        lines: List[str] = []
+        with self._lock:
+            histograms = sorted(self.histograms.items())
+            counters = sorted(self.counters.items())
+
+        label_names = {"stage_seconds": "stage", "request_seconds": "kind"}
+        declared = set()
+        for (metric, label), hist in histograms:
+            full = f"{PREFIX}_{metric}"
+            if full not in declared:
+                declared.add(full)
+                lines.append(f"# TYPE {full} histogram")
+            tag = f'{label_names.get(metric, "label")}="{label}"'
+            cumulative = 0
+            for bound, n in zip(hist.buckets, hist.counts):
+                cumulative += n
+                lines.append(f'{full}_bucket{{{tag},le="{bound}"}} {cumulative}')
+            lines.append(f'{full}_bucket{{{tag},le="+Inf"}} {hist.count}')
+            lines.append(f"{full}_sum{{{tag}}} {hist.sum:.6f}")
+            lines.append(f"{full}_count{{{tag}}} {hist.count}")
+
+        for name, value in counters:
+            lines.append(f"# TYPE {PREFIX}_{name}_total counter")
+            lines.append(f"{PREFIX}_{name}_total {value:g}")
+
+        for name, kind, values in self._collected():
+            for key, value in sorted(values.items()):
+                full = f"{PREFIX}_{name}_{key}" + ("_total" if kind == "counter" else "")
+                lines.append(f"# TYPE {full} {kind}")
+                lines.append(f"{full} {value:g}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> str:
+        """
+        One line: count / p50 / p99 per stage, counters and collector values.
+        """
+        with self._lock:
+            histograms = sorted(self.histograms.items())
+            counters = sorted(self.counters.items())
+        parts = [
+            f"{label if metric == 'stage_seconds' else 'request:' + label}: "
+            f"n={h.count} p50={h.quantile(0.5) * 1000:g}ms p99={h.quantile(0.99) * 1000:g}ms"
+            for (metric, label), h in histograms
+        ]
+        parts += [f"{name}={value:g}" for name, value in counters]
+        for name, _, values in self._collected():
+            parts += [f"{name}.{key}={value:g}" for key, value in sorted(values.items())]
+        return "; ".join(parts) or "no data yet"
+
+
+REGISTRY = Registry()
+
+
+# ------------------------------
+# Stages and traces
+# ------------------------------
+class _NoOp:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NOOP = _NoOp()
+
+_current_trace: "contextvars.ContextVar[Optional[Trace]]" = contextvars.ContextVar("flu_rag_trace", default=None)
+_trace_ids = itertools.count(1)
+
+
+class Stage:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        REGISTRY.observe("stage_seconds", self.name, elapsed)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.spans.append((self.name, elapsed))
+        return False
+
+
+class Trace:
+    """
+    One request: the stages timed while it is current, plus its total time
+    under request_seconds{kind=...}.
+    """
+
+    def __init__(self, kind: str = "unrouted"):
+        self.id = next(_trace_ids)
+        self.kind = kind
+        self.spans: List[Tuple[str, float]] = []
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        self._token = _current_trace.set(self)
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        _current_trace.reset(self._token)
+        REGISTRY.observe("request_seconds", self.kind, elapsed)
+        if logger.isEnabledFor(logging.DEBUG):
+            spans = " ".join(f"{name}={s * 1000:.1f}ms" for name, s in self.spans)
+            logger.debug("trace %d %s %.1fms: %s", self.id, self.kind, elapsed * 1000, spans)
+        return False
+
+
+def stage(name: str):
+    return Stage(name) if ENABLED else NOOP
+
+
+def trace_request(kind: str = "unrouted"):
+    return Trace(kind) if ENABLED else NOOP
+
+
+def tag_request(kind: str) -> None:
+    """
+    Set the kind (reply / symptoms / info / rule) of the current trace once it is routed.
+    """
+    if ENABLED:
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.kind = kind
+
+
+def incr(name: str, value: float = 1) -> None:
+    if ENABLED:
+        REGISTRY.incr(name, value)
+
+
+def timed(name: str):
+    """
+    Decorator form of stage(); a no-op (the function itself) when metrics are off.
+    """
+
+    def decorate(fn):
+        if not ENABLED:
+            return fn
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with Stage(name):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
+
+
+# ------------------------------
+# Exporters
+# ------------------------------
+def serve_metrics(port: int, host: str = "0.0.0.0"):
+    """
+    Answer GET /metrics with REGISTRY.render() on a daemon thread.
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = REGISTRY.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # scraped every few seconds
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    return server
+
+
+def log_periodically(interval: float) -> threading.Thread:
+    def run():
+        while True:
+            time.sleep(interval)
+            logger.info("metrics: %s", REGISTRY.summary())
+
+    thread = threading.Thread(target=run, name="metrics-log", daemon=True)
+    thread.start()
+    return thread
+
+
+def start_exporters(port: int = METRICS_PORT, log_seconds: float = LOG_SECONDS) -> None:
+    """
+    Start whichever exporters are configured (nothing when metrics are off).
+    """
+    if not ENABLED:
+        return
+    if port:
+        serve_metrics(port)
+    if log_seconds > 0:
+        log_periodically(log_seconds)
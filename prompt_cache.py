@@ -0,0 +1,87 @@
+import logging
+import threading
+from typing import Any, Dict, List, Optional
+
+from context_packing import estimate_tokens
+
+# ==============================
+# Prompt caching helpers
+# ==============================
+# The system prompts (and app.py's background text) are identical on every
+# request. Sending them as system blocks with a cache_control breakpoint lets
+# the API reuse the processed prefix instead of reading it again each time.
+# Only prefixes of a minimum length are cached; on a shorter prefix the
+# breakpoint does nothing, so it is left off (see is_cacheable).
+
+logger = logging.getLogger(__name__)
+
+EPHEMERAL = {"type": "ephemeral"}
+
+# Shortest prefix (tokens) each model caches, by model name prefix
+MIN_CACHEABLE_TOKENS = {
+    "claude-3-haiku": 2048,
+    "claude-3-5-haiku": 2048,
+}
+DEFAULT_MIN_CACHEABLE_TOKENS = 1024
+
+USAGE_FIELDS = ("input_tokens", "output_tokens", "cache_read_input_tokens", "cache_creation_input_tokens")
+
+# Running totals over all calls in this process
+USAGE_TOTALS: Dict[str, int] = {field: 0 for field in USAGE_FIELDS}
+_totals_lock = threading.Lock()
+
+
+def min_cacheable_tokens(model: str) -> int:
+    for name, tokens in MIN_CACHEABLE_TOKENS.items():
+        if model.startswith(name):
+            return tokens
+    return DEFAULT_MIN_CACHEABLE_TOKENS
+
+
+def is_cacheable(model: str, *texts: str) -> bool:
+    """
+    Whether a prefix made of texts is long enough for model to cache it
+    (by the estimate_tokens() count).
+    """
+    return estimate_tokens("".join(texts)) >= min_cacheable_tokens(model)
+
+
+def system_blocks(*texts: str, cache: bool = True, model: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    System prompt as text blocks. With cache=True the last block carries the
+    cache breakpoint, which covers every block before it as well. With a
+    model, the breakpoint is only added if the blocks are long enough for
+    that model to cache.
+
+    Build this once at import time and reuse the same list, so the cached
+    prefix is byte-identical across requests.
+    """
+    blocks: List[Dict[str, Any]] = [{"type": "text", "text": text} for text in texts]
+    if cache and blocks and (model is None or is_cacheable(model, *texts)):
+        blocks[-1]["cache_control"] = EPHEMERAL
+    return blocks
+
+
+def usage_counts(usage: Any) -> Dict[str, int]:
+    """
+    Token counts from a response's `usage` (missing fields count as 0).
+    """
+    return {field: int(getattr(usage, field, 0) or 0) for field in USAGE_FIELDS}
+
+
+def record_usage(usage: Any) -> Dict[str, int]:
+    """
+    Log one response's token usage, including cache reads/writes, and add it to USAGE_TOTALS.
+    """
+    counts = usage_counts(usage)
+    with _totals_lock:
+        for field, value in counts.items():
+            USAGE_TOTALS[field] += value
+    logger.info(
+        "Claude usage: input=%d output=%d cache_read=%d cache_write=%d",
+        counts["input_tokens"],
+        counts["output_tokens"],
+        counts["cache_read_input_tokens"],
+        counts["cache_creation_input_tokens"],
+    )
+    return counts
@@ -0,0 +1,198 @@
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional
+
+# ==============================
+# Cache for Claude answers
+# ==============================
+# In memory it is an LRU with a per-entry TTL. With a path it is also written
+# through to SQLite, so answers survive restarts and can be shared by processes
+# on the same host. With require_corpus_version=True nothing is served until
+# set_corpus_version() has checked the stored answers against the corpus.
+#
+# The SQLite table is bounded too: every PRUNE_EVERY writes (and at startup)
+# expired rows are deleted and the oldest rows past max_disk_entries are
+# trimmed, so a long-running replica does not grow the file without limit.
+
+# Writes between two prunes of the SQLite table
+PRUNE_EVERY = 64
+
+
+class ResponseCache:
+    def __init__(
+        self,
+        max_entries: int = 2048,
+        ttl_seconds: float = 24 * 3600,
+        path: Optional[str] = None,
+        require_corpus_version: bool = False,
+        max_disk_entries: Optional[int] = None,
+    ):
+        self.max_entries = max_entries
+        self.max_disk_entries = max_entries if max_disk_entries is None else max_disk_entries
+        self.prune_every = PRUNE_EVERY
+        self._writes = 0
+        self.require_corpus_version = require_corpus_version
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, value TEXT, expires_at REAL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS responses_expires ON responses (expires_at)")
+            self._db.execute("CREATE TABLE IF NOT EXISTS cache_meta (key TEXT PRIMARY KEY, value TEXT)")
+            self._prune()
+        self.corpus_version: Optional[str] = None
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            if self.require_corpus_version and self.corpus_version is None:
+                # The answers on disk may predate a corpus edit
+                self.misses += 1
+                return None
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] < now:
+                del self._entries[key]
+                entry = None
+            if entry is None and self._db is not None:
+                row = self._db.execute(
+                    "SELECT value, expires_at FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and row[1] >= now:
+                    entry = (row[1], row[0])
+                    self._store(key, entry)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: str, value: str) -> None:
+        expires_at = time.time() + self.ttl_seconds
+        with self._lock:
+            self._store(key, (expires_at, value))
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses (key, value, expires_at) VALUES (?, ?, ?)",
+                    (key, value, expires_at),
+                )
+                self._writes += 1
+                if self._writes % self.prune_every == 0:
+                    self._prune()
+                else:
+                    self._db.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._clear()
+
+    def _clear(self) -> None:
+        self._entries.clear()
+        if self._db is not None:
+            self._db.execute("DELETE FROM responses")
+            self._db.commit()
+
+    def set_corpus_version(self, version: str) -> None:
+        """
+        Drop every entry if the corpus changed since the answers were cached.
+
+        Meant to be registered with vector_store.add_corpus_listener(); the
+        version is also stored in SQLite so a restart against an edited corpus
+        does not serve stale answers from disk.
+        """
+        with self._lock:
+            previous = self.corpus_version
+            if previous is None and self._db is not None:
+                row = self._db.execute(
+                    "SELECT value FROM cache_meta WHERE key = 'corpus_version'"
+                ).fetchone()
+                previous = row[0] if row else None
+            # Cleared before the new version is visible, so get() never serves an old answer
+            if previous is not None and previous != version:
+                self._clear()
+            self.corpus_version = version
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO cache_meta (key, value) VALUES ('corpus_version', ?)",
+                    (version,),
+                )
+                self._db.commit()
+
+    def _prune(self) -> None:
+        """
+        Delete expired rows, then all but the max_disk_entries most recently
+        written ones (expires_at is write time + TTL), and commit.
+        """
+        self._db.execute("DELETE FROM responses WHERE expires_at < ?", (time.time(),))
+        self._db.execute(
+            "DELETE FROM responses WHERE key IN "
+            "(SELECT key FROM responses ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_disk_entries,),
+        )
+        self._db.commit()
+
+    def _store(self, key: str, entry: tuple) -> None:
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, float]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            "entries": len(self._entries),
+        }
+
+
+def symptom_cache_key(symptoms: Dict[str, int], label: str, doc_ids: Iterable[str]) -> str:
+    """
+    Canonical key for a symptom-mode answer: which symptoms were detected, the
+    flu label and which docs were retrieved. Messages that differ only in
+    wording ("fever and cough" / "I have a cough and fever") share one entry.
+    """
+    return json.dumps(
+        {
+            "mode": "symptoms",
+            "symptoms": sorted(k for k, v in symptoms.items() if v),
+            "label": label,
+            "docs": sorted(doc_ids),
+        },
+        separators=(",", ":"),
+    )
+
+
+# Dropped when normalizing info-mode questions. Question words, negations and
+# modal verbs are kept because they change what is being asked ("Can I get the
+# flu shot while pregnant?" is not "Should I ...?").
+STOP_WORDS = {
+    "a", "an", "the", "is", "are", "was", "were", "be", "do", "does", "did",
+    "of", "to", "for", "in", "on", "at", "about", "and", "or", "with",
+    "i", "me", "my", "you", "your", "we", "it", "its", "this", "that",
+    "please", "tell", "explain",
+}
+
+
+def normalize_question(user_text: str) -> str:
+    """
+    Lowercase, strip punctuation and stop-words, collapse whitespace:
+    "What are the flu symptoms??" and "what are  flu symptoms" -> "what flu symptoms".
+    """
+    words = re.findall(r"[a-z0-9']+", user_text.lower())
+    return " ".join(w for w in words if w not in STOP_WORDS)
+
+
+def info_cache_key(user_text: str) -> str:
+    return json.dumps({"mode": "info", "question": normalize_question(user_text)}, separators=(",", ":"))
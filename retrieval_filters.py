@@ -0,0 +1,65 @@
+from typing import Any, Dict, List, Optional
+
+# ==============================
+# Category filters derived from the routing decision
+# ==============================
+# Every corpus doc has a `category` (flu_basics, flu_symptoms, comparison,
+# risk_groups, red_flags, prevention, self_care, education). Retrieval is
+# restricted to the categories that fit the request: the filter is pushed
+# down into the Chroma `where` clause (category_where) and applied to BM25
+# through its per-doc category codes. The keywords below are loose, so when
+# the categories yield fewer than n_results docs, an unfiltered search
+# backfills the rest (see backfill).
+
+# Symptom mode: what symptoms mean, how flu differs from look-alikes,
+# who is at higher risk, when to get help and what to do at home.
+SYMPTOM_MODE_CATEGORIES = ["flu_symptoms", "comparison", "risk_groups", "red_flags", "self_care"]
+
+# Info mode: categories picked from words in the question (substring match).
+# Only specific terms: words like "home", "cause" or "what is" turn up in
+# questions about every topic.
+INFO_CATEGORY_KEYWORDS: Dict[str, List[str]] = {
+    "flu_basics": ["spread", "contagious", "incubation", "virus", "catch"],
+    "flu_symptoms": ["symptom", "sign", "feel like", "duration"],
+    "comparison": ["cold", "allerg", "covid", "difference", "differ", "versus", " vs"],
+    "risk_groups": ["risk", "pregnan", "elderly", "older", "child", "baby", "asthma", "diabet"],
+    "red_flags": ["emergency", "warning", "urgent", "danger", "serious", "hospital"],
+    "prevention": ["prevent", "vaccin", "shot", "mask", "protect", "avoid", "reduce"],
+    "self_care": ["treat", "medicine", "antiviral", "rest", "remed", "recover", "cure"],
+    "education": ["season", "outbreak", "chatbot", "symptom checker"],
+}
+
+
+def categories_for_request(mode: str, user_text: str) -> Optional[List[str]]:
+    """
+    Categories to search for a routed message, or None for no filter
+    (info questions that match no category keyword).
+    """
+    if mode == "symptoms":
+        return list(SYMPTOM_MODE_CATEGORIES)
+    if mode == "info":
+        lower = user_text.lower()
+        matched = [
+            category
+            for category, keywords in INFO_CATEGORY_KEYWORDS.items()
+            if any(kw in lower for kw in keywords)
+        ]
+        return matched or None
+    return None
+
+
+def category_where(categories: Optional[List[str]]) -> Optional[Dict[str, Any]]:
+    """
+    Chroma `where` clause restricting a query to categories (None = no filter).
+    """
+    if not categories:
+        return None
+    return {"category": {"$in": list(categories)}}
+
+
+def backfill(hits: List[Dict[str, Any]], extra: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Best-first hits followed by the extra hits that are not already among them (by id).
+    """
+    seen = {h["id"] for h in hits}
+    return hits + [h for h in extra if h["id"] not in seen]
@@ -0,0 +1,177 @@
+import json
+import os
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+from context_packing import split_sentences
+from symptoms import LIKELY_THRESHOLD, POSSIBLE_THRESHOLD, flu_score, interpret_flu_score
+
+# ==============================
+# Answers built without Claude
+# ==============================
+# Symptom answers in the same three-paragraph shape the symptom-mode system
+# prompt asks for, filled in from the flu label, the matched symptoms and the
+# red-flag / self-care sections of Data.json. They take well under a
+# millisecond, so depending on the policy they either stand in for Claude
+# when it is unavailable or answer clear-cut messages without calling it:
+#
+#   fallback   - only when the LLM gateway reports Claude as unavailable
+#   confident  - also for high-confidence labels (see is_confident)
+#   always     - every symptom message
+
+RULE_ANSWER_POLICIES = ("fallback", "confident", "always")
+
+GUIDANCE_PATH = "Data.json"
+
+# A LIKELY / UNLIKELY score at least this far from the label's threshold
+# (symptoms.LIKELY_THRESHOLD / POSSIBLE_THRESHOLD)
+CONFIDENCE_MARGIN = 0.1
+
+# Reported symptoms that are warning signs in themselves; under the
+# "confident" policy these messages still go to Claude
+RED_FLAG_FIELDS = ("SHORTNESS_OF_BREATH", "DIFFICULTY_BREATHING")
+ALLERGY_FIELDS = ("ITCHY_NOSE", "ITCHY_EYES", "ITCHY_MOUTH", "ITCHY_INNER_EAR", "SNEEZING", "PINK_EYE")
+
+LABEL_OPENERS = {
+    "LIKELY": "Based on what you've described, it seems quite likely your illness could be the flu.",
+    "POSSIBLE": "Based on what you've described, it's possible this could be the flu, but it's not certain.",
+    "UNLIKELY": "Based on what you've described, it does not really look like the typical flu pattern.",
+}
+
+LABEL_REASONS = {
+    "LIKELY": "Several of these are classic flu signs, especially when they start suddenly.",
+    "POSSIBLE": "Some of these fit the flu, but the typical combination of symptoms is not complete.",
+    "UNLIKELY": "Few or none of these are typical of the flu.",
+}
+
+DISCLAIMER = (
+    "I am not a doctor and this is not a medical diagnosis. "
+    "Please talk to a healthcare professional for real medical advice."
+)
+
+UNAVAILABLE_NOTE = "(Our AI assistant is busy right now, so this is a shorter automatic answer.)"
+
+
+@lru_cache(maxsize=4)
+def load_guidance(path: str = GUIDANCE_PATH) -> Dict[str, Any]:
+    """
+    The symptom, red-flag and self-care lists from Data.json ({} if the file is missing).
+    """
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        kb = json.load(f)
+    return {
+        "typical": kb.get("symptoms", {}).get("common_symptoms_adults", []),
+        "red_flags": kb.get("red_flag_and_emergency_signs", {}).get("adults", []),
+        "self_care": kb.get("self_care_and_basic_treatment", {}).get("home_management", []),
+    }
+
+
+def symptom_names(symptoms: Dict[str, int], fields: Optional[tuple] = None) -> List[str]:
+    return [
+        k.lower().replace("_", " ") for k, v in symptoms.items() if v and (fields is None or k in fields)
+    ]
+
+
+def rule_answer_policy(value: str) -> str:
+    """
+    A FLU_RAG_RULE_ANSWERS value checked against RULE_ANSWER_POLICIES (ValueError if unknown).
+    """
+    policy = value.strip().lower()
+    if policy not in RULE_ANSWER_POLICIES:
+        raise ValueError(
+            f"FLU_RAG_RULE_ANSWERS={value!r} is not one of {', '.join(RULE_ANSWER_POLICIES)}"
+        )
+    return policy
+
+
+def is_confident(symptoms: Dict[str, int]) -> bool:
+    """
+    A LIKELY or UNLIKELY score clear of the label thresholds, and no reported warning sign.
+    """
+    if any(symptoms.get(f, 0) for f in RED_FLAG_FIELDS):
+        return False
+    score = flu_score(symptoms)
+    return score >= LIKELY_THRESHOLD + CONFIDENCE_MARGIN or score <= POSSIBLE_THRESHOLD - CONFIDENCE_MARGIN
+
+
+def use_rule_answer(symptoms: Dict[str, int], policy: str) -> bool:
+    """
+    Whether a symptom message is answered from the template instead of Claude.
+    """
+    if policy not in RULE_ANSWER_POLICIES:
+        raise ValueError(f"unknown rule answer policy {policy!r}")
+    if policy == "always":
+        return True
+    if policy == "confident":
+        return is_confident(symptoms)
+    return False
+
+
+def _join(items: List[str]) -> str:
+    if len(items) <= 1:
+        return "".join(items)
+    return ", ".join(items[:-1]) + " and " + items[-1]
+
+
+def templated_symptom_answer(symptoms: Dict[str, int], guidance: Optional[Dict[str, Any]] = None) -> str:
+    guidance = load_guidance() if guidance is None else guidance
+    label = interpret_flu_score(flu_score(symptoms))
+    names = symptom_names(symptoms)
+
+    # 1) Overall assessment
+    assessment = [LABEL_OPENERS[label]]
+    if names:
+        assessment.append(f"You mentioned {_join(names)}.")
+    assessment.append(LABEL_REASONS[label])
+    red_flags = symptom_names(symptoms, RED_FLAG_FIELDS)
+    if red_flags:
+        assessment.append(f"Because you mentioned {_join(red_flags)}, please get medical help promptly.")
+
+    # 2) Comparison and other possibilities
+    typical = [s.split("(")[0].strip().lower() for s in guidance.get("typical", [])]
+    comparison = []
+    if typical:
+        comparison.append(f"Flu usually starts suddenly with symptoms such as {_join(typical)}.")
+    if not symptoms.get("FEVER", 0):
+        comparison.append("You did not mention a fever, which is one of the most common flu signs.")
+    if any(symptoms.get(f, 0) for f in ALLERGY_FIELDS):
+        comparison.append("Itchy eyes or nose and sneezing point more towards things like allergies than flu.")
+    comparison.append(
+        "Symptoms like yours can also come from other common causes such as a mild cold or strain, "
+        "and only a doctor can say for sure."
+    )
+
+    # 3) Advice and disclaimer
+    self_care = guidance.get("self_care") or ["Rest and drink plenty of fluids."]
+    advice = [self_care[0], "Stay home while you are ill so you do not spread germs to others."]
+    warning_signs = [s.lower() for s in guidance.get("red_flags", [])[:4]]
+    if warning_signs:
+        # The Data.json entries contain commas themselves
+        advice.append(f"Seek urgent care for warning signs such as: {'; '.join(warning_signs)}.")
+    else:
+        advice.append("Seek urgent care if you have trouble breathing, chest pain, confusion or a very high fever.")
+    advice.append(DISCLAIMER)
+
+    return "\n\n".join(" ".join(p) for p in (assessment, comparison, advice))
+
+
+def doc_sentences(docs: List[Dict[str, Any]], max_docs: int = 2, per_doc: int = 2) -> List[str]:
+    """
+    The first few sentences of the best retrieved docs.
+    """
+    sentences: List[str] = []
+    for doc in docs[:max_docs]:
+        sentences.extend(split_sentences(doc.get("text", ""))[:per_doc])
+    return sentences
+
+
+def symptom_fallback_answer(symptoms: Dict[str, int]) -> str:
+    return f"{templated_symptom_answer(symptoms)}\n\n{UNAVAILABLE_NOTE}"
+
+
+def info_fallback_answer(retrieved: List[Dict[str, Any]]) -> str:
+    sentences = doc_sentences(retrieved, max_docs=3)
+    body = " ".join(sentences) or "I could not find background information for this question right now."
+    return "\n\n".join([body, DISCLAIMER, UNAVAILABLE_NOTE])
@@ -0,0 +1,74 @@
+import logging
+import os
+import threading
+from typing import TYPE_CHECKING, Any, Tuple
+
+from corpus_loader import iter_corpus
+from vector_store import get_model_embedding_function, open_vector_store
+from warmup import BackgroundTask, serve_readiness
+
+# ==============================
+# Search index for the Streamlit app
+# ==============================
+# Streamlit only runs stream.py when the first browser session connects, so
+# the index task and the readiness probe live here instead: one per process,
+# shared by every session, and started before Streamlit by stream_launcher.py
+# (or by the first page load under plain `streamlit run stream.py`).
+
+if TYPE_CHECKING:
+    from lexical_index import BM25Index
+
+logger = logging.getLogger(__name__)
+
+# Point FLU_RAG_CORPUS at a chunk file (python chunking.py) to retrieve by chunk
+CORPUS_PATH = os.environ.get("FLU_RAG_CORPUS", "flu_rag_corpus.jsonl")
+WARMUP = os.environ.get("FLU_RAG_WARMUP", "1") != "0"
+READY_PORT = int(os.environ.get("FLU_RAG_READY_PORT", "0"))
+
+
+def require_corpus(path: str = CORPUS_PATH) -> str:
+    if not os.path.exists(path):
+        raise FileNotFoundError(
+            f"{path} not found. Make sure flu_rag_corpus.jsonl is in the same folder as this app."
+        )
+    return path
+
+
+def build_search_index() -> Tuple[Any, "BM25Index"]:
+    """
+    Stream the corpus into (vector collection, BM25 index). BM25 reads every
+    line, so it is the pass that logs bad lines. Embedding one text makes sure
+    the model is loaded even for a reopened on-disk index.
+    """
+    from lexical_index import BM25Index
+
+    path = require_corpus()
+    lexical_index = BM25Index(path)
+    collection = open_vector_store(iter_corpus(path, bad_lines=[]), path)
+    get_model_embedding_function()(["flu"])
+    return collection, lexical_index
+
+
+SEARCH_INDEX = BackgroundTask("search-index", build_search_index)
+
+_started = False
+_start_lock = threading.Lock()
+
+
+def start_warmup(warmup: bool = WARMUP, ready_port: int = READY_PORT) -> BackgroundTask:
+    """
+    Once per process: start building SEARCH_INDEX in the background (with
+    warmup=False the first retrieval builds it) and serve GET /ready on
+    ready_port. Later calls just return SEARCH_INDEX.
+    """
+    global _started
+    with _start_lock:
+        if not _started:
+            _started = True
+            if warmup:
+                SEARCH_INDEX.start()
+            if ready_port:
+                if not warmup:
+                    logger.warning("FLU_RAG_WARMUP=0: /ready stays 503 until the first retrieval builds the index")
+                serve_readiness(ready_port, lambda: SEARCH_INDEX.ready)
+    return SEARCH_INDEX
@@ -1,72 +1,134 @@
 import os
-import json
 import re
-import textwrap
-from typing import Optional, List, Dict, Any
+from typing import TYPE_CHECKING, Callable, Optional, List, Dict, Any, Iterator, Tuple
 
 import streamlit as st
-import anthropic
-import chromadb
-from chromadb.utils import embedding_functions
+
+from chunking import collapse_to_parents
+from context_packing import log_packed, pack_context
+from keyword_matcher import KeywordMatcher
+from llm_gateway import LLMGateway, LLMUnavailable
+from metrics import REGISTRY, incr, stage, start_exporters, tag_request, timed, trace_request
+from prompt_cache import USAGE_TOTALS, system_blocks
+from retrieval_filters import backfill, categories_for_request, category_where
+from response_cache import ResponseCache, info_cache_key, symptom_cache_key
+from rule_based_answers import (
+    info_fallback_answer,
+    rule_answer_policy,
+    symptom_fallback_answer,
+    templated_symptom_answer,
+    use_rule_answer,
+)
+from search_index import start_warmup
+from symptoms import (
+    flu_score,
+    format_symptom_summary,
+    has_any_symptoms,
+    interpret_flu_score,
+    parse_symptoms_from_text,
+)
+from vector_store import (
+    add_corpus_listener,
+    embedding_cache_stats,
+    get_embedding_function,
+)
+from warmup import BackgroundTask
+
+# anthropic, chromadb and numpy are imported where they are used, so the page
+# renders before they are loaded
+if TYPE_CHECKING:
+    from lexical_index import BM25Index
+    from symptom_embedding import SymptomEmbeddingExtractor
 
 API_KEY = os.environ.get("ANTHROPIC_API_KEY")
 if not API_KEY:
     st.error("ANTHROPIC_API_KEY is not set in the environment. Please set it and restart.")
     st.stop()
 
-client = anthropic.Anthropic(api_key=API_KEY)
+@st.cache_resource(show_spinner=False)
+def get_gateway() -> LLMGateway:
+    # One pooled client + circuit breaker shared by every session
+    return LLMGateway(api_key=API_KEY)
 
-def load_corpus(path: str = "flu_rag_corpus.jsonl") -> List[Dict[str, Any]]:
-    docs: List[Dict[str, Any]] = []
-    if not os.path.exists(path):
-        raise FileNotFoundError(
-            f"{path} not found. Make sure flu_rag_corpus.jsonl is in the same folder as this app."
-        )
-    with open(path, "r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            docs.append(json.loads(line))
-    return docs
-
-@st.cache_resource(show_spinner=False)  # 🔥 no "Running get_vector_collection" message
-def get_vector_collection():
-    docs = load_corpus()
-    chroma_client = chromadb.Client()
-    embed_fn = embedding_functions.DefaultEmbeddingFunction()
-    collection = chroma_client.create_collection(
-        name="flu_corpus",
-        embedding_function=embed_fn,
-    )
+# "fallback" / "confident" / "always": when symptom messages get a templated answer instead of Claude
+RULE_ANSWERS = rule_answer_policy(os.environ.get("FLU_RAG_RULE_ANSWERS", "fallback"))
 
-    ids = [d["id"] for d in docs]
-    texts = [d["text"] for d in docs]
-    metadatas = [
-        {
-            "category": d.get("category", ""),
-            "title": d.get("title", ""),
-            "tags": ", ".join(d.get("tags", [])) if isinstance(d.get("tags"), list) else str(d.get("tags", "")),
-        }
-        for d in docs
-    ]
+def get_warmup() -> BackgroundTask:
+    # One task per process (see search_index.py); stream_launcher.py may have started it already
+    return start_warmup()
 
-    collection.add(
-        ids=ids,
-        documents=texts,
-        metadatas=metadatas,
+def get_vector_collection():
+    return get_warmup().result()[0]
+
+@st.cache_resource(show_spinner=False)
+def get_response_cache() -> ResponseCache:
+    # Shared by all sessions; FLU_RAG_RESPONSE_CACHE_DB keeps answers across restarts
+    cache = ResponseCache(
+        max_entries=int(os.environ.get("FLU_RAG_RESPONSE_CACHE_SIZE", "2048")),
+        ttl_seconds=float(os.environ.get("FLU_RAG_RESPONSE_CACHE_TTL", "86400")),
+        path=os.environ.get("FLU_RAG_RESPONSE_CACHE_DB"),
+        require_corpus_version=True,
+    )
+    add_corpus_listener(cache.set_corpus_version)
+    return cache
+
+@st.cache_resource(show_spinner=False)
+def get_info_cache() -> ResponseCache:
+    # Info-mode answers keyed by the normalized question
+    cache = ResponseCache(
+        max_entries=int(os.environ.get("FLU_RAG_INFO_CACHE_SIZE", "512")),
+        ttl_seconds=float(os.environ.get("FLU_RAG_RESPONSE_CACHE_TTL", "86400")),
+        path=os.environ.get("FLU_RAG_INFO_CACHE_DB"),
+        require_corpus_version=True,
     )
-    return collection
+    add_corpus_listener(cache.set_corpus_version)
+    return cache
+
+def get_lexical_index() -> "BM25Index":
+    return get_warmup().result()[1]
+
+@st.cache_resource(show_spinner=False)
+def get_metrics() -> None:
+    # Once per process: FLU_RAG_METRICS=1 plus FLU_RAG_METRICS_PORT / _LOG_SECONDS (see metrics.py)
+    REGISTRY.add_collector("response_cache", lambda: get_response_cache().stats())
+    REGISTRY.add_collector("info_cache", lambda: get_info_cache().stats())
+    REGISTRY.add_collector("embedding_cache", embedding_cache_stats)
+    REGISTRY.add_collector("claude", lambda: dict(USAGE_TOTALS), kind="counter")
+    start_exporters()
+
+# "hybrid" (default) fuses BM25 hits with the vector hits; "vector" is Chroma only
+RETRIEVER = os.environ.get("FLU_RAG_RETRIEVER", "hybrid")
+
+@timed("retrieve")
+def retrieve_docs(
+    query: str, n_results: int = 4, categories: Optional[List[str]] = None
+) -> List[Dict[str, Any]]:
+    # `categories` is pushed down into Chroma's `where` clause (and BM25); if
+    # that yields fewer than n_results docs, an unfiltered search backfills the rest
+    hits = search_docs(query, n_results, categories)
+    if categories and len(hits) < n_results:
+        hits = collapse_to_parents(backfill(hits, search_docs(query, n_results, None)), n_results)
+    return hits
+
+def search_docs(query: str, n_results: int, categories: Optional[List[str]]) -> List[Dict[str, Any]]:
+    from lexical_index import fuse_with_lexical
 
-def retrieve_docs(query: str, n_results: int = 4) -> List[Dict[str, Any]]:
     collection = get_vector_collection()
-    res = collection.query(
-        query_texts=[query],
-        n_results=n_results,
-    )
+    hybrid = RETRIEVER == "hybrid"
+    # Extra candidates leave room for fusion and for chunks collapsing into one doc
+    depth = n_results * 2
+    with stage("vector_search"):  # query embedding + Chroma search
+        res = collection.query(
+            query_texts=[query],
+            n_results=depth,
+            where=category_where(categories),
+        )
     out: List[Dict[str, Any]] = []
     if not res["ids"] or not res["ids"][0]:
-        return out
+        if hybrid:
+            with stage("lexical_fusion"):
+                out = fuse_with_lexical(query, out, get_lexical_index(), depth, depth, categories)
+        return collapse_to_parents(out, n_results)
 
     for i in range(len(res["ids"][0])):
         out.append(
@@ -76,9 +138,23 @@ def retrieve_docs(query: str, n_results: int = 4) -> List[Dict[str, Any]]:
                 "metadata": res["metadatas"][0][i],
             }
         )
-    return out
+    if hybrid:
+        with stage("lexical_fusion"):
+            out = fuse_with_lexical(query, out, get_lexical_index(), depth, depth, categories)
+    # Several chunks of one doc count as one hit
+    return collapse_to_parents(out, n_results)
+
+# Max tokens of retrieved text per prompt (0 = paste whole docs)
+CONTEXT_TOKEN_BUDGET = int(os.environ.get("FLU_RAG_CONTEXT_TOKENS", "700"))
+
+def build_rag_context_from_docs(
+    docs: List[Dict[str, Any]], query: str = "", token_budget: int = 0
+) -> str:
+    if token_budget:
+        packed = pack_context(query, docs, token_budget)
+        log_packed(packed, token_budget)
+        return packed.text or "No extra background documents were retrieved."
 
-def build_rag_context_from_docs(docs: List[Dict[str, Any]]) -> str:
     chunks = []
     for d in docs:
         meta = d.get("metadata", {})
@@ -92,136 +168,27 @@ def build_rag_context_from_docs(docs: List[Dict[str, Any]]) -> str:
         return "No extra background documents were retrieved."
     return "\n\n---\n\n".join(chunks)
 
-SYMPTOM_FIELDS = [
-    "COUGH",
-    "MUSCLE_ACHES",
-    "TIREDNESS",
-    "SORE_THROAT",
-    "RUNNY_NOSE",
-    "STUFFY_NOSE",
-    "FEVER",
-    "NAUSEA",
-    "VOMITING",
-    "DIARRHEA",
-    "SHORTNESS_OF_BREATH",
-    "DIFFICULTY_BREATHING",
-    "LOSS_OF_TASTE",
-    "LOSS_OF_SMELL",
-    "ITCHY_NOSE",
-    "ITCHY_EYES",
-    "ITCHY_MOUTH",
-    "ITCHY_INNER_EAR",
-    "SNEEZING",
-    "PINK_EYE",
-]
-
-KEYWORD_MAP = {
-    "cough": "COUGH",
-    "coughing": "COUGH",
-    "body aches": "MUSCLE_ACHES",
-    "body ache": "MUSCLE_ACHES",
-    "muscle ache": "MUSCLE_ACHES",
-    "muscle pain": "MUSCLE_ACHES",
-    "tired": "TIREDNESS",
-    "fatigue": "TIREDNESS",
-    "exhausted": "TIREDNESS",
-    "sore throat": "SORE_THROAT",
-    "throat pain": "SORE_THROAT",
-    "runny nose": "RUNNY_NOSE",
-    "stuffy nose": "STUFFY_NOSE",
-    "blocked nose": "STUFFY_NOSE",
-    "fever": "FEVER",
-    "chills": "FEVER",
-    "nausea": "NAUSEA",
-    "vomit": "VOMITING",
-    "vomiting": "VOMITING",
-    "diarrhea": "DIARRHEA",
-    "shortness of breath": "SHORTNESS_OF_BREATH",
-    "difficulty breathing": "DIFFICULTY_BREATHING",
-    "breathing is hard": "DIFFICULTY_BREATHING",
-    "loss of taste": "LOSS_OF_TASTE",
-    "cant taste": "LOSS_OF_TASTE",
-    "can't taste": "LOSS_OF_TASTE",
-    "loss of smell": "LOSS_OF_SMELL",
-    "cant smell": "LOSS_OF_SMELL",
-    "can't smell": "LOSS_OF_SMELL",
-    "itchy nose": "ITCHY_NOSE",
-    "itchy eyes": "ITCHY_EYES",
-    "itchy mouth": "ITCHY_MOUTH",
-    "itchy ear": "ITCHY_INNER_EAR",
-    "itchy ears": "ITCHY_INNER_EAR",
-    "sneezing": "SNEEZING",
-    "sneeze": "SNEEZING",
-    "pink eye": "PINK_EYE",
-    "red eye": "PINK_EYE",
-}
-
-def parse_symptoms_from_text(user_text: str) -> Dict[str, int]:
-    symptoms = {field: 0 for field in SYMPTOM_FIELDS}
-    text = user_text.lower()
-    for kw, field in KEYWORD_MAP.items():
-        if kw in text:
-            symptoms[field] = 1
-    return symptoms
-
-def has_any_symptoms(symptoms: Dict[str, int]) -> bool:
-    return any(symptoms.values())
-
-def flu_score(symptoms: Dict[str, int]) -> float:
-    score = 0.0
-
-    if symptoms.get("FEVER", 0):
-        score += 0.35
-    if symptoms.get("COUGH", 0):
-        score += 0.2
-    if symptoms.get("MUSCLE_ACHES", 0) or symptoms.get("TIREDNESS", 0):
-        score += 0.2
-    if symptoms.get("SORE_THROAT", 0):
-        score += 0.1
-    if symptoms.get("RUNNY_NOSE", 0) or symptoms.get("STUFFY_NOSE", 0):
-        score += 0.1
-
-    if symptoms.get("NAUSEA", 0) or symptoms.get("VOMITING", 0) or symptoms.get("DIARRHEA", 0):
-        score += 0.05
-
-    allergy_flags = [
-        "ITCHY_NOSE",
-        "ITCHY_EYES",
-        "ITCHY_MOUTH",
-        "ITCHY_INNER_EAR",
-        "SNEEZING",
-        "PINK_EYE",
-    ]
-    if any(symptoms.get(f, 0) for f in allergy_flags):
-        score -= 0.15
-
-    score = max(0.0, min(1.0, score))
-    return score
+SYMPTOM_EXTRACTOR = os.environ.get("FLU_RAG_SYMPTOM_EXTRACTOR", "keywords")
 
-def interpret_flu_score(score: float) -> str:
-    if score >= 0.7:
-        return "LIKELY"
-    elif score >= 0.4:
-        return "POSSIBLE"
-    else:
-        return "UNLIKELY"
+@st.cache_resource(show_spinner=False)
+def get_symptom_embedder() -> "SymptomEmbeddingExtractor":
+    # Shares the collection's embedding model, so no second model in memory
+    from symptom_embedding import DEFAULT_THRESHOLD, SymptomEmbeddingExtractor
 
-def format_symptom_summary(symptoms: Dict[str, int]) -> str:
-    present = [k for k, v in symptoms.items() if v == 1]
-    absent = [k for k, v in symptoms.items() if v == 0]
-
-    def nice(lst: List[str]) -> str:
-        return ", ".join(lst) if lst else "None detected from keywords."
-
-    return textwrap.dedent(
-        f"""
-        Parsed symptoms from your message
-        (1 = keyword detected, 0 = no keyword):
+    return SymptomEmbeddingExtractor(
+        get_embedding_function(),
+        threshold=float(os.environ.get("FLU_RAG_SYMPTOM_THRESHOLD", DEFAULT_THRESHOLD)),
+    )
 
-        Present (1): {nice(present)}
-        Absent (0): {nice(absent)}
-        """
-    ).strip()
+@timed("parse_symptoms")
+def detect_symptoms(user_text: str) -> Dict[str, int]:
+    # "hybrid" adds embedding matches (paraphrases like "burning up") to the keyword matches
+    symptoms = parse_symptoms_from_text(user_text)
+    if SYMPTOM_EXTRACTOR == "hybrid":
+        for field, flag in get_symptom_embedder().extract(user_text).items():
+            if flag:
+                symptoms[field] = 1
+    return symptoms
 
 def extract_name(user_text: str) -> Optional[str]:
     m = re.search(r"\bmy name is\s+([A-Za-z][A-Za-z\s]{0,40})", user_text, re.IGNORECASE)
@@ -230,10 +197,12 @@ def extract_name(user_text: str) -> Optional[str]:
         return name
     return None
 
+# Whole words only: "hi" must not match inside "high" or "this"
+GREETINGS = ["hello", "hi", "hey", "salam", "assalam", "assalamu", "assalamu alaikum", "assalamualaikum"]
+GREETING_MATCHER = KeywordMatcher({g: g for g in GREETINGS})
+
 def is_greeting(user_text: str) -> bool:
-    lower = user_text.lower()
-    greetings = ["hello", "hi ", " hi", "hey", "salam", "assalam", "assalamu alaikum", "assalamualaikum"]
-    return any(g in lower for g in greetings)
+    return bool(GREETING_MATCHER.find_values(user_text))
 
 def looks_like_flu_question(user_text: str) -> bool:
     lower = user_text.lower()
@@ -289,13 +258,25 @@ Use ONLY this background information to answer:
 - Do NOT provide a personal diagnosis.
 - Include a brief reminder that you are not a doctor and that your answer is general information only.
 """
-def ask_flu_with_symptoms(user_text: str, symptoms: Dict[str, int]) -> str:
+
+MODEL = "claude-3-haiku-20240307"
+
+# Built once so the cached prefix is byte-identical on every request; a prompt
+# shorter than MODEL's minimum cacheable prefix gets no cache breakpoint
+PROMPT_CACHING = os.environ.get("FLU_RAG_PROMPT_CACHING", "1") != "0"
+SYMPTOM_SYSTEM = system_blocks(build_symptom_system_prompt(), cache=PROMPT_CACHING, model=MODEL)
+INFO_SYSTEM = system_blocks(build_info_system_prompt(), cache=PROMPT_CACHING, model=MODEL)
+
+
+@timed("build_prompt")
+def build_symptom_request(
+    user_text: str, symptoms: Dict[str, int], retrieved: List[Dict[str, Any]]
+) -> Dict[str, Any]:
     score = flu_score(symptoms)
     label = interpret_flu_score(score)
     symptom_summary = format_symptom_summary(symptoms)
 
-    retrieved = retrieve_docs(user_text, n_results=5)
-    rag_context = build_rag_context_from_docs(retrieved)
+    rag_context = build_rag_context_from_docs(retrieved, user_text, CONTEXT_TOKEN_BUDGET)
 
     prompt = f"""
     === Symptom-based flu assessment ===
@@ -311,23 +292,28 @@ def ask_flu_with_symptoms(user_text: str, symptoms: Dict[str, int]) -> str:
     {user_text}
     """
 
-    msg = client.messages.create(
-        model="claude-3-haiku-20240307",
+    return dict(
+        model=MODEL,
         max_tokens=700,
         temperature=0.2,
-        system=build_symptom_system_prompt(),
+        system=SYMPTOM_SYSTEM,
         messages=[{"role": "user", "content": prompt}],
     )
 
-    parts = []
-    for block in msg.content:
-        if block.type == "text":
-            parts.append(block.text)
-    return "\n".join(parts)
+def prepare_symptom_request(user_text: str, symptoms: Dict[str, int]) -> Tuple[Dict[str, Any], str]:
+    label = interpret_flu_score(flu_score(symptoms))
+    retrieved = retrieve_docs(
+        user_text, n_results=5, categories=categories_for_request("symptoms", user_text)
+    )
+    key = symptom_cache_key(symptoms, label, [d["id"] for d in retrieved])
+    return build_symptom_request(user_text, symptoms, retrieved), key
 
-def ask_flu_info(user_text: str) -> str:
-    retrieved = retrieve_docs(user_text, n_results=5)
-    rag_context = build_rag_context_from_docs(retrieved)
+def build_info_request(user_text: str) -> Dict[str, Any]:
+    retrieved = retrieve_docs(
+        user_text, n_results=5, categories=categories_for_request("info", user_text)
+    )
+    with stage("build_prompt"):
+        rag_context = build_rag_context_from_docs(retrieved, user_text, CONTEXT_TOKEN_BUDGET)
 
     prompt = f"""
     === Retrieved background documents about flu ===
@@ -337,28 +323,88 @@ def ask_flu_info(user_text: str) -> str:
     {user_text}
     """
 
-    msg = client.messages.create(
-        model="claude-3-haiku-20240307",
+    return dict(
+        model=MODEL,
         max_tokens=600,
         temperature=0.2,
-        system=build_info_system_prompt(),
+        system=INFO_SYSTEM,
         messages=[{"role": "user", "content": prompt}],
     )
 
+def reply_text(msg) -> str:
     parts = []
     for block in msg.content:
         if block.type == "text":
             parts.append(block.text)
     return "\n".join(parts)
 
-def ask_flu_bot(user_text: str) -> str:
-    user_text = user_text.strip()
+def stream_reply(request: Dict[str, Any]) -> Iterator[str]:
+    yield from get_gateway().stream_text(request)
+
+def fallback_reply(mode: str, user_text: str, symptoms: Optional[Dict[str, int]] = None) -> str:
+    # Rule-based answer while Claude is unavailable (never cached)
+    incr("fallback_answers")
+    if mode == "symptoms":
+        return symptom_fallback_answer(symptoms)
+    retrieved = retrieve_docs(user_text, n_results=3, categories=categories_for_request(mode, user_text))
+    return info_fallback_answer(retrieved)
+
+def stream_and_cache(
+    request: Dict[str, Any], cache: ResponseCache, key: str, fallback: Callable[[], str]
+) -> Iterator[str]:
+    parts = []
+    try:
+        for text in stream_reply(request):
+            parts.append(text)
+            yield text
+    except LLMUnavailable:
+        if parts:
+            raise
+        yield fallback()
+        return
+    cache.put(key, "".join(parts))
+
+def ask_flu_with_symptoms(user_text: str, symptoms: Dict[str, int]) -> str:
+    if use_rule_answer(symptoms, RULE_ANSWERS):
+        tag_request("rule")
+        return templated_symptom_answer(symptoms)
+    request, key = prepare_symptom_request(user_text, symptoms)
+    cache = get_response_cache()
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+
+    try:
+        msg = get_gateway().create(request)
+    except LLMUnavailable:
+        return fallback_reply("symptoms", user_text, symptoms)
+    reply = reply_text(msg)
+    cache.put(key, reply)
+    return reply
+
+def ask_flu_info(user_text: str) -> str:
+    key = info_cache_key(user_text)
+    cache = get_info_cache()
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+
+    try:
+        msg = get_gateway().create(build_info_request(user_text))
+    except LLMUnavailable:
+        return fallback_reply("info", user_text)
+    reply = reply_text(msg)
+    cache.put(key, reply)
+    return reply
+
+def route_message(user_text: str) -> Tuple[str, Any]:
+    # ("reply", text) for canned answers, ("symptoms", symptoms) / ("info", None) when Claude is needed
     if not user_text:
-        return "Please type something so I can help you 😊"
+        return "reply", "Please type something so I can help you 😊"
 
     name = extract_name(user_text)
     if name is not None:
-        return (
+        return "reply", (
             f"Hello {name}! 👋\n"
             "I'm a flu helper bot. I can:\n"
             "- Explain what seasonal flu is and how it spreads.\n"
@@ -369,29 +415,29 @@ def ask_flu_bot(user_text: str) -> str:
         )
 
     if is_greeting(user_text):
-        return (
+        return "reply", (
             "Hi there! 👋 I'm a flu-focused chatbot.\n\n"
             "You can:\n"
             "- Ask general questions like \"What are common flu symptoms?\" or \"How does flu spread?\"\n"
             "- Describe your symptoms and I’ll tell you whether they look similar to flu or not.\n"
         )
 
-    symptoms = parse_symptoms_from_text(user_text)
+    symptoms = detect_symptoms(user_text)
 
     if has_any_symptoms(symptoms):
-        return ask_flu_with_symptoms(user_text, symptoms)
+        return "symptoms", symptoms
     if looks_like_flu_question(user_text):
-        return ask_flu_info(user_text)
+        return "info", None
 
     lower = user_text.lower()
     if "disease" in lower or "issue" in lower or "what is wrong" in lower:
-        return (
+        return "reply", (
             "I can't diagnose exactly what disease you have, "
             "but I can help you see whether your symptoms resemble flu or not.\n\n"
             "Please describe your symptoms in more detail (for example: "
             "fever, cough, sore throat, runny or stuffy nose, body aches, tiredness, etc.)."
         )
-    return (
+    return "reply", (
         "I'm mainly designed to talk about seasonal flu.\n"
         "You can ask me things like \"What are the symptoms of flu?\" or "
         "\"How can I prevent flu?\".\n"
@@ -399,7 +445,52 @@ def ask_flu_bot(user_text: str) -> str:
         "please describe what you're feeling."
     )
 
+def ask_flu_bot(user_text: str) -> str:
+    with trace_request():
+        user_text = user_text.strip()
+        mode, payload = route_message(user_text)
+        tag_request(mode)
+        if mode == "symptoms":
+            return ask_flu_with_symptoms(user_text, payload)
+        if mode == "info":
+            return ask_flu_info(user_text)
+        return payload
+
+def ask_flu_bot_stream(user_text: str) -> Iterator[str]:
+    with trace_request():
+        user_text = user_text.strip()
+        mode, payload = route_message(user_text)
+        tag_request(mode)
+        if mode == "symptoms":
+            if use_rule_answer(payload, RULE_ANSWERS):
+                tag_request("rule")
+                yield templated_symptom_answer(payload)
+                return
+            request, key = prepare_symptom_request(user_text, payload)
+            cache = get_response_cache()
+            cached = cache.get(key)
+            if cached is not None:
+                yield cached
+                return
+            yield from stream_and_cache(
+                request, cache, key, lambda: fallback_reply("symptoms", user_text, payload)
+            )
+        elif mode == "info":
+            key = info_cache_key(user_text)
+            cache = get_info_cache()
+            cached = cache.get(key)
+            if cached is not None:
+                yield cached
+                return
+            yield from stream_and_cache(
+                build_info_request(user_text), cache, key, lambda: fallback_reply("info", user_text)
+            )
+        else:
+            yield payload
+
 st.set_page_config(page_title="Flu RAG Chatbot", page_icon="🤒", layout="centered")
+get_warmup()
+get_metrics()
 
 st.title("🤒 Flu RAG Chatbot")
 st.write(
@@ -432,9 +523,16 @@ if user_input:
     with st.chat_message("user"):
         st.markdown(user_input)
     with st.chat_message("assistant"):
+        placeholder = st.empty()
+        reply = ""
+        if not get_warmup().ready:
+            # Replaced by the first chunk; greetings do not wait for the index
+            placeholder.markdown("_Loading the flu knowledge base…_")
         try:
-            reply = ask_flu_bot(user_input)
+            for chunk in ask_flu_bot_stream(user_input):
+                reply += chunk
+                placeholder.markdown(reply + "▌")
         except Exception as e:
             reply = f"Oops, something went wrong while contacting the AI model:\n\n`{e}`"
-        st.markdown(reply)
+        placeholder.markdown(reply)
     st.session_state.messages.append({"role": "assistant", "content": reply})
@@ -0,0 +1,29 @@
+"""
+Run the Streamlit app with the index warm-up and readiness probe already started.
+
+    python stream_launcher.py [streamlit options, e.g. --server.port 8501]
+
+`streamlit run stream.py` only executes the script when the first browser
+session connects, so a FLU_RAG_READY_PORT probe would not exist until a user
+had already been routed to the replica. This starts both (see
+search_index.start_warmup) and then runs Streamlit in the same process, where
+stream.py picks up the same task.
+"""
+import os
+import sys
+
+from search_index import start_warmup
+
+
+def main():
+    start_warmup()
+
+    from streamlit.web import cli
+
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "stream.py")
+    sys.argv = ["streamlit", "run", script, *sys.argv[1:]]
+    sys.exit(cli.main())
+
+
+if __name__ == "__main__":
+    main()
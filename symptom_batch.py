@@ -0,0 +1,119 @@
+import time
+from typing import Dict, Iterable
+
+import numpy as np
+
+from symptoms import (
+    LIKELY_THRESHOLD,
+    POSSIBLE_THRESHOLD,
+    SCORE_GROUPS,
+    SYMPTOM_FIELDS,
+    flu_score,
+    interpret_flu_score,
+)
+
+# ==============================
+# Vectorized flu scoring for analytics over many messages
+# ==============================
+# A message is a row of SYMPTOM_FIELDS flags stored as uint8 (20 bytes per
+# message). flu_score_batch() applies the same rules as symptoms.flu_score to
+# N rows at once.
+
+FIELD_INDEX = {field: i for i, field in enumerate(SYMPTOM_FIELDS)}
+
+# symptoms.SCORE_GROUPS as a (len(SYMPTOM_FIELDS), len(SCORE_GROUPS)) membership
+# matrix. flu_score_batch() still adds the group weights one after another, in
+# the scalar order, so the floats are bit-identical.
+GROUP_MATRIX = np.zeros((len(SYMPTOM_FIELDS), len(SCORE_GROUPS)), dtype=np.uint8)
+for _j, (_fields, _) in enumerate(SCORE_GROUPS):
+    for _field in _fields:
+        GROUP_MATRIX[FIELD_INDEX[_field], _j] = 1
+GROUP_WEIGHTS = np.array([w for _, w in SCORE_GROUPS], dtype=np.float64)
+
+# Label codes returned by label_codes_batch()
+LABELS = np.array(["UNLIKELY", "POSSIBLE", "LIKELY"])
+
+
+def symptoms_to_matrix(rows: Iterable[Dict[str, int]]) -> np.ndarray:
+    """
+    Stack parse_symptoms_from_text() dicts into an (N, len(SYMPTOM_FIELDS)) uint8 matrix.
+    """
+    return np.array(
+        [[1 if row.get(field, 0) else 0 for field in SYMPTOM_FIELDS] for row in rows],
+        dtype=np.uint8,
+    ).reshape(-1, len(SYMPTOM_FIELDS))
+
+
+def flu_score_batch(matrix: np.ndarray) -> np.ndarray:
+    """
+    flu_score for every row of a 0/1 symptom matrix, as float64 in [0, 1].
+    """
+    matrix = np.asarray(matrix, dtype=np.uint8)
+    # (N, groups): does the row have at least one field of the group?
+    hits = (matrix.astype(np.int32) @ GROUP_MATRIX) > 0
+
+    score = np.zeros(matrix.shape[0], dtype=np.float64)
+    for j, weight in enumerate(GROUP_WEIGHTS):
+        # Adding 0.0 for rows without the group keeps them bit-for-bit unchanged
+        score += np.where(hits[:, j], weight, 0.0)
+    return np.clip(score, 0.0, 1.0)
+
+
+def label_codes_batch(scores: np.ndarray) -> np.ndarray:
+    """
+    interpret_flu_score as uint8 codes into LABELS (0 = UNLIKELY, 1 = POSSIBLE, 2 = LIKELY).
+    """
+    scores = np.asarray(scores)
+    return (scores >= POSSIBLE_THRESHOLD).astype(np.uint8) + (scores >= LIKELY_THRESHOLD).astype(np.uint8)
+
+
+def interpret_flu_score_batch(scores: np.ndarray) -> np.ndarray:
+    """
+    interpret_flu_score for every score, as an array of label strings.
+    """
+    return LABELS[label_codes_batch(scores)]
+
+
+def all_symptom_combinations() -> np.ndarray:
+    """
+    Every possible 0/1 symptom row (2 ** len(SYMPTOM_FIELDS) of them).
+    """
+    n = len(SYMPTOM_FIELDS)
+    codes = np.arange(2 ** n, dtype=np.uint32)[:, None]
+    return ((codes >> np.arange(n, dtype=np.uint32)) & 1).astype(np.uint8)
+
+
+def check_against_scalar(matrix: np.ndarray) -> int:
+    """
+    Compare flu_score_batch / interpret_flu_score_batch with the scalar
+    functions on every row; returns the number of mismatching rows.
+    """
+    scores = flu_score_batch(matrix)
+    labels = interpret_flu_score_batch(scores)
+    mismatches = 0
+    for row, score, label in zip(matrix, scores, labels):
+        symptoms = {field: int(v) for field, v in zip(SYMPTOM_FIELDS, row)}
+        expected = flu_score(symptoms)
+        if expected != score or interpret_flu_score(expected) != label:
+            mismatches += 1
+    return mismatches
+
+
+def main():
+    # Exhaustive check: the input space is small enough to test every row.
+    matrix = all_symptom_combinations()
+    mismatches = check_against_scalar(matrix)
+    print(f"checked {len(matrix)} symptom combinations, mismatches: {mismatches}")
+
+    start = time.perf_counter()
+    scores = flu_score_batch(matrix)
+    interpret_flu_score_batch(scores)
+    elapsed = time.perf_counter() - start
+    print(f"batch scoring: {len(matrix) / elapsed:,.0f} rows/s")
+
+    if mismatches:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+import re
+from typing import Dict, List
+
+import numpy as np
+
+from symptoms import SYMPTOM_FIELDS
+
+# ==============================
+# Embedding-based symptom extraction
+# ==============================
+# Keyword matching misses paraphrases ("my whole body hurts", "burning up").
+# Here every symptom gets a few canonical descriptions that are embedded once;
+# the user's message is split into short chunks, embedded in one batch, and a
+# symptom is flagged when any chunk is close enough to one of its descriptions.
+
+SYMPTOM_DESCRIPTIONS: Dict[str, List[str]] = {
+    "COUGH": ["I have a cough", "I keep coughing", "hacking dry cough"],
+    "MUSCLE_ACHES": ["my muscles ache", "my whole body hurts", "aching all over"],
+    "TIREDNESS": ["I feel very tired", "I have no energy", "I am worn out and weak"],
+    "SORE_THROAT": ["I have a sore throat", "my throat hurts", "it hurts to swallow"],
+    "RUNNY_NOSE": ["I have a runny nose", "my nose keeps dripping"],
+    "STUFFY_NOSE": ["I have a stuffy nose", "my nose is blocked", "congested nose"],
+    "FEVER": ["I have a fever", "I am burning up", "high temperature and chills"],
+    "NAUSEA": ["I feel sick to my stomach", "I feel nauseous", "queasy stomach"],
+    "VOMITING": ["I have been vomiting", "I keep throwing up"],
+    "DIARRHEA": ["I have diarrhea", "loose watery stools", "upset bowels"],
+    "SHORTNESS_OF_BREATH": ["I am short of breath", "I get out of breath easily"],
+    "DIFFICULTY_BREATHING": ["I can't breathe properly", "it is hard to breathe"],
+    "LOSS_OF_TASTE": ["I lost my sense of taste", "food tastes of nothing"],
+    "LOSS_OF_SMELL": ["I lost my sense of smell", "I can't smell anything"],
+    "ITCHY_NOSE": ["my nose is itchy", "tickly itchy nose"],
+    "ITCHY_EYES": ["my eyes are itchy", "itchy watery eyes"],
+    "ITCHY_MOUTH": ["my mouth is itchy", "itchy palate"],
+    "ITCHY_INNER_EAR": ["my ears are itchy inside", "itchy ears"],
+    "SNEEZING": ["I keep sneezing", "sneezing fits"],
+    "PINK_EYE": ["I have pink eye", "my eyes are red and sore"],
+}
+
+# Cosine similarity a chunk needs to count as a symptom mention; sweep it
+# with benchmarks/tune_symptom_threshold.py after changing the model or the
+# descriptions.
+DEFAULT_THRESHOLD = 0.6
+
+# Long messages are cut to this many chunks so one call stays a few ms.
+MAX_CHUNKS = 16
+
+_CHUNK_SPLIT = re.compile(r"[.!?;,\n]+|\b(?:and|but|also|plus)\b", re.IGNORECASE)
+
+
+def split_chunks(user_text: str) -> List[str]:
+    chunks = [c.strip() for c in _CHUNK_SPLIT.split(user_text)]
+    return [c for c in chunks if len(c) > 2][:MAX_CHUNKS]
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class SymptomEmbeddingExtractor:
+    """
+    Flags SYMPTOM_FIELDS by cosine similarity between message chunks and the
+    precomputed SYMPTOM_DESCRIPTIONS matrix.
+
+    Pass the same embedding function the Chroma collection uses
+    (vector_store.get_embedding_function()) so no second model is loaded.
+    """
+
+    def __init__(self, embed_fn, threshold: float = DEFAULT_THRESHOLD):
+        self.embed_fn = embed_fn
+        self.threshold = threshold
+        phrases: List[str] = []
+        owners: List[int] = []
+        for field, descriptions in SYMPTOM_DESCRIPTIONS.items():
+            for phrase in descriptions:
+                phrases.append(phrase)
+                owners.append(SYMPTOM_FIELDS.index(field))
+        self.phrase_matrix = _normalize_rows(np.asarray(embed_fn(phrases), dtype=np.float32))
+        # (phrases, fields) one-hot, to reduce phrase scores to field scores
+        self.phrase_owner = np.zeros((len(phrases), len(SYMPTOM_FIELDS)), dtype=bool)
+        self.phrase_owner[np.arange(len(phrases)), owners] = True
+
+    def field_scores(self, user_text: str) -> np.ndarray:
+        """
+        Best similarity per SYMPTOM_FIELDS entry over all chunks of the message.
+        """
+        chunks = split_chunks(user_text)
+        if not chunks:
+            return np.zeros(len(SYMPTOM_FIELDS), dtype=np.float32)
+        chunk_matrix = _normalize_rows(np.asarray(self.embed_fn(chunks), dtype=np.float32))
+        best_per_phrase = (chunk_matrix @ self.phrase_matrix.T).max(axis=0)
+        return np.where(self.phrase_owner, best_per_phrase[:, None], -1.0).max(axis=0)
+
+    def extract(self, user_text: str) -> Dict[str, int]:
+        scores = self.field_scores(user_text)
+        return {field: int(score >= self.threshold) for field, score in zip(SYMPTOM_FIELDS, scores)}
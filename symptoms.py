@@ -0,0 +1,147 @@
+import textwrap
+from typing import Dict, List, Tuple
+
+from keyword_matcher import INFLECTION_SUFFIXES, KeywordMatcher
+
+# ==============================
+# Rule-based symptom model shared by app.py, app1.py and stream.py
+# ==============================
+SYMPTOM_FIELDS = [
+    "COUGH",
+    "MUSCLE_ACHES",
+    "TIREDNESS",
+    "SORE_THROAT",
+    "RUNNY_NOSE",
+    "STUFFY_NOSE",
+    "FEVER",
+    "NAUSEA",
+    "VOMITING",
+    "DIARRHEA",
+    "SHORTNESS_OF_BREATH",
+    "DIFFICULTY_BREATHING",
+    "LOSS_OF_TASTE",
+    "LOSS_OF_SMELL",
+    "ITCHY_NOSE",
+    "ITCHY_EYES",
+    "ITCHY_MOUTH",
+    "ITCHY_INNER_EAR",
+    "SNEEZING",
+    "PINK_EYE",
+]
+
+KEYWORD_MAP = {
+    "cough": "COUGH",
+    "coughing": "COUGH",
+    "body aches": "MUSCLE_ACHES",
+    "body ache": "MUSCLE_ACHES",
+    "muscle ache": "MUSCLE_ACHES",
+    "muscle pain": "MUSCLE_ACHES",
+    "tired": "TIREDNESS",
+    "fatigue": "TIREDNESS",
+    "exhausted": "TIREDNESS",
+    "sore throat": "SORE_THROAT",
+    "throat pain": "SORE_THROAT",
+    "runny nose": "RUNNY_NOSE",
+    "stuffy nose": "STUFFY_NOSE",
+    "blocked nose": "STUFFY_NOSE",
+    "fever": "FEVER",
+    "chills": "FEVER",
+    "nausea": "NAUSEA",
+    "vomit": "VOMITING",
+    "vomiting": "VOMITING",
+    "diarrhea": "DIARRHEA",
+    "shortness of breath": "SHORTNESS_OF_BREATH",
+    "difficulty breathing": "DIFFICULTY_BREATHING",
+    "breathing is hard": "DIFFICULTY_BREATHING",
+    "loss of taste": "LOSS_OF_TASTE",
+    "cant taste": "LOSS_OF_TASTE",
+    "can't taste": "LOSS_OF_TASTE",
+    "loss of smell": "LOSS_OF_SMELL",
+    "cant smell": "LOSS_OF_SMELL",
+    "can't smell": "LOSS_OF_SMELL",
+    "itchy nose": "ITCHY_NOSE",
+    "itchy eyes": "ITCHY_EYES",
+    "itchy mouth": "ITCHY_MOUTH",
+    "itchy ear": "ITCHY_INNER_EAR",
+    "itchy ears": "ITCHY_INNER_EAR",
+    "sneezing": "SNEEZING",
+    "sneeze": "SNEEZING",
+    "pink eye": "PINK_EYE",
+    "red eye": "PINK_EYE",
+    "nauseated": "NAUSEA",
+    "nauseous": "NAUSEA",
+    # Plurals and other inflections ("coughed", "sore throats", "fatigued")
+    # are matched through INFLECTION_SUFFIXES, so only base forms are listed
+}
+
+# One-pass, word-boundary-aware matcher over KEYWORD_MAP
+SYMPTOM_MATCHER = KeywordMatcher(KEYWORD_MAP, suffixes=INFLECTION_SUFFIXES)
+
+
+def parse_symptoms_from_text(user_text: str) -> Dict[str, int]:
+    symptoms = {field: 0 for field in SYMPTOM_FIELDS}
+    for field in SYMPTOM_MATCHER.find_values(user_text):
+        symptoms[field] = 1
+    return symptoms
+
+
+def has_any_symptoms(symptoms: Dict[str, int]) -> bool:
+    return any(symptoms.values())
+
+
+# flu_score rules, applied in this order: a group adds its weight once if any
+# of its fields is present (symptom_batch.py vectorizes the same table).
+SCORE_GROUPS: List[Tuple[Tuple[str, ...], float]] = [
+    (("FEVER",), 0.35),
+    (("COUGH",), 0.2),
+    (("MUSCLE_ACHES", "TIREDNESS"), 0.2),
+    (("SORE_THROAT",), 0.1),
+    (("RUNNY_NOSE", "STUFFY_NOSE"), 0.1),
+    (("NAUSEA", "VOMITING", "DIARRHEA"), 0.05),
+    # Allergy signs
+    (("ITCHY_NOSE", "ITCHY_EYES", "ITCHY_MOUTH", "ITCHY_INNER_EAR", "SNEEZING", "PINK_EYE"), -0.15),
+]
+
+# interpret_flu_score cut-offs
+LIKELY_THRESHOLD = 0.7
+POSSIBLE_THRESHOLD = 0.4
+
+
+def flu_score(symptoms: Dict[str, int]) -> float:
+    """
+    Rule-based 'flu-likeness' score in [0, 1].
+    """
+    score = 0.0
+    for fields, weight in SCORE_GROUPS:
+        if any(symptoms.get(f, 0) for f in fields):
+            score += weight
+
+    score = max(0.0, min(1.0, score))
+    return score
+
+
+def interpret_flu_score(score: float) -> str:
+    if score >= LIKELY_THRESHOLD:
+        return "LIKELY"
+    elif score >= POSSIBLE_THRESHOLD:
+        return "POSSIBLE"
+    else:
+        return "UNLIKELY"
+
+
+def format_symptom_summary(symptoms: Dict[str, int]) -> str:
+    present = [k for k, v in symptoms.items() if v == 1]
+    absent = [k for k, v in symptoms.items() if v == 0]
+
+    def nice(lst: List[str]) -> str:
+        return ", ".join(lst) if lst else "None detected from keywords."
+
+    return textwrap.dedent(
+        f"""
+        Parsed symptoms from your message
+        (1 = keyword detected, 0 = no keyword):
+
+        Present (1): {nice(present)}
+        Absent (0): {nice(absent)}
+        """
+    ).strip()
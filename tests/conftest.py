@@ -0,0 +1,11 @@
+import os
+import sys
+
+# The app modules live at the repo root and read Data.json / the corpus by
+# relative path, so the tests run from there.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+os.environ.setdefault("ANTHROPIC_API_KEY", "test-key")
+os.environ.setdefault("FLU_RAG_WARMUP", "0")
@@ -0,0 +1,47 @@
+import asyncio
+import time
+
+import app1
+
+
+def test_blocking_steps_leave_the_event_loop_free(monkeypatch):
+    calls = []
+
+    def slow_route(user_text):
+        time.sleep(0.2)  # e.g. the embedding model in hybrid symptom mode
+        return "reply", f"hello {user_text}"
+
+    def slow_get(key):
+        time.sleep(0.2)  # e.g. a cold SQLite page
+        calls.append(key)
+        return "cached answer"
+
+    async def run(route_only: bool):
+        ticks = 0
+
+        async def heartbeat():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        beat = asyncio.create_task(heartbeat())
+        start = time.perf_counter()
+        if route_only:
+            replies = await asyncio.gather(*(app1.ask_flu_bot_async(str(i)) for i in range(3)))
+        else:
+            replies = await asyncio.gather(*(app1.ask_flu_bot_async(q) for q in ["what is flu", "how does flu spread"]))
+        elapsed = time.perf_counter() - start
+        beat.cancel()
+        return replies, elapsed, ticks
+
+    monkeypatch.setattr(app1, "route_message", slow_route)
+    replies, elapsed, ticks = asyncio.run(run(route_only=True))
+    assert replies == ["hello 0", "hello 1", "hello 2"]
+    assert elapsed < 0.5 and ticks >= 10
+
+    monkeypatch.setattr(app1, "route_message", lambda text: ("info", None))
+    monkeypatch.setattr(app1.INFO_CACHE, "get", slow_get)
+    replies, elapsed, ticks = asyncio.run(run(route_only=False))
+    assert replies == ["cached answer"] * 2 and len(calls) == 2
+    assert elapsed < 0.35 and ticks >= 10
@@ -0,0 +1,37 @@
+from chunking import chunk_text, collapse_to_parents
+
+TEXT = " ".join(
+    f"Sentence {i} says something about flu season number {i}." for i in range(40)
+)
+
+
+def hits_for(chunks, indexes):
+    return [
+        {
+            "id": f"doc-1#c{i}",
+            "text": chunks[i],
+            "metadata": {"parent_id": "doc-1", "chunk_index": i, "category": "flu_basics"},
+        }
+        for i in indexes
+    ]
+
+
+def test_adjacent_chunks_merge_without_repeating_the_overlap():
+    chunks = chunk_text(TEXT, max_chars=300, overlap_chars=120)
+    assert len(chunks) > 3 and chunks[1].split(". ")[0] in chunks[0]
+    merged = collapse_to_parents(hits_for(chunks, reversed(range(len(chunks)))), n_results=3)
+    assert [h["id"] for h in merged] == ["doc-1"]
+    assert merged[0]["text"] == TEXT
+    assert "chunk_index" not in merged[0]["metadata"]
+
+
+def test_non_adjacent_chunks_are_joined_whole():
+    chunks = chunk_text(TEXT, max_chars=300, overlap_chars=120)
+    merged = collapse_to_parents(hits_for(chunks, [2, 0]), n_results=3)
+    assert merged[0]["text"] == f"{chunks[0]} {chunks[2]}"
+
+
+def test_no_overlap_configured():
+    chunks = chunk_text(TEXT, max_chars=300, overlap_chars=0)
+    merged = collapse_to_parents(hits_for(chunks, range(len(chunks))), n_results=1)
+    assert merged[0]["text"] == TEXT
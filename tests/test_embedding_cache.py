@@ -0,0 +1,57 @@
+import numpy as np
+
+import embedding_cache
+from embedding_cache import EmbeddingCache
+
+MODEL = "test-model"
+
+
+def vec(i: int) -> np.ndarray:
+    return np.full(4, i, dtype=np.float32)
+
+
+def cached(cache: EmbeddingCache, text: str):
+    return cache.get_many([text])[0]
+
+
+def test_roundtrip_and_reopen(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), MODEL, max_entries=8)
+    cache.put_many(["a", "b"], [vec(1), vec(2)])
+    assert cache.get_many(["a", "x", "b"])[1] is None
+    reopened = EmbeddingCache(str(tmp_path), MODEL, max_entries=8)
+    np.testing.assert_array_equal(cached(reopened, "b"), vec(2))
+    assert reopened.stats()["entries"] == 2
+
+
+def test_hits_are_persisted_for_eviction(tmp_path, monkeypatch):
+    monkeypatch.setattr(embedding_cache, "TOUCH_BATCH", 1)
+    cache = EmbeddingCache(str(tmp_path), MODEL, max_entries=3)
+    cache.put_many(["a", "b", "c"], [vec(1), vec(2), vec(3)])
+    cached(cache, "a")  # "b" is now the least recently used
+    other = EmbeddingCache(str(tmp_path), MODEL, max_entries=3)
+    other.put_many(["d"], [vec(4)])
+    assert cached(other, "b") is None
+    for text, i in [("a", 1), ("c", 3), ("d", 4)]:
+        np.testing.assert_array_equal(cached(cache, text), vec(i))
+
+
+def test_instances_share_rows_without_collisions(tmp_path):
+    # Two connections to the same files stand in for two processes
+    first = EmbeddingCache(str(tmp_path), MODEL, max_entries=64)
+    second = EmbeddingCache(str(tmp_path), MODEL, max_entries=64)
+    for i in range(0, 40, 2):
+        first.put_many([f"t{i}"], [vec(i)])
+        second.put_many([f"t{i + 1}"], [vec(i + 1)])
+    for i in range(40):
+        np.testing.assert_array_equal(cached(first, f"t{i}"), vec(i))
+        np.testing.assert_array_equal(cached(second, f"t{i}"), vec(i))
+
+
+def test_evicted_elsewhere_is_a_miss_not_a_stale_row(tmp_path):
+    first = EmbeddingCache(str(tmp_path), MODEL, max_entries=2)
+    first.put_many(["a"], [vec(1)])
+    assert cached(first, "a") is not None
+    second = EmbeddingCache(str(tmp_path), MODEL, max_entries=2)
+    second.put_many(["b", "c"], [vec(2), vec(3)])  # evicts "a" and reuses its row
+    assert cached(first, "a") is None
+    np.testing.assert_array_equal(cached(first, "c"), vec(3))
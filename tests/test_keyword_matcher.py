@@ -0,0 +1,64 @@
+import pytest
+
+from keyword_matcher import INFLECTION_SUFFIXES, KeywordMatcher
+from symptoms import parse_symptoms_from_text
+
+
+def found(text: str) -> set:
+    return {field for field, value in parse_symptoms_from_text(text).items() if value}
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("I feel fatigued all the time", {"TIREDNESS"}),
+        ("The kids have sore throats", {"SORE_THROAT"}),
+        ("We all have runny noses", {"RUNNY_NOSE"}),
+        ("stuffy noses and coughing", {"STUFFY_NOSE", "COUGH"}),
+        ("I'm nauseated and feverish", {"NAUSEA", "FEVER"}),
+        ("I coughed and sneezed all night, muscle aches too", {"COUGH", "SNEEZING", "MUSCLE_ACHES"}),
+        ("extreme tiredness and red eyes", {"TIREDNESS", "PINK_EYE"}),
+        ("I have a high fever and cough", {"FEVER", "COUGH"}),
+    ],
+)
+def test_inflected_symptoms(text, expected):
+    assert found(text) == expected
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "the coughdrop aisle",  # "drop" is not an inflection
+        "sneezewort in the garden",
+        "feverfew tea",
+    ],
+)
+def test_no_match_inside_other_words(text):
+    assert found(text) == set()
+
+
+def test_suffixes_need_opt_in():
+    strict = KeywordMatcher({"hi": "GREETING"})
+    assert strict.find_values("hi there") == {"GREETING"}
+    assert strict.find_values("high fever, his cough, this") == set()
+    loose = KeywordMatcher({"nose": "NOSE"}, suffixes=INFLECTION_SUFFIXES)
+    assert loose.find_values("noses") == {"NOSE"}
+    assert loose.find_values("nosebleed") == set()
+
+
+@pytest.mark.parametrize("text", ["I have a high fever and cough", "this cough will not stop, fever too"])
+def test_symptom_messages_are_not_greetings(text):
+    import app1
+
+    assert not app1.is_greeting(text)
+    kind, symptoms = app1.route_message(text)
+    assert kind == "symptoms"
+    assert symptoms["FEVER"] and symptoms["COUGH"]
+
+
+@pytest.mark.parametrize("text", ["hi", "Hi there!", "hello :)", "assalamu alaikum"])
+def test_greetings(text):
+    import app1
+
+    assert app1.is_greeting(text)
+    assert app1.route_message(text)[0] == "reply"
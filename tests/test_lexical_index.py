@@ -0,0 +1,46 @@
+import json
+
+import pytest
+
+from corpus_loader import CorpusReader, iter_corpus, iter_corpus_offsets
+from lexical_index import BM25Index, fuse_with_lexical
+
+DOCS = [
+    {"id": "treat", "text": "Oseltamivir shortens the flu by about a day.", "category": "treatment", "title": "Antivirals"},
+    {"id": "spread", "text": "Flu spreads through droplets when people cough or sneeze.", "category": "transmission"},
+    {"id": "eye", "text": "Pink eye is rarely caused by the flu – it is usually viral conjunctivitis.", "tags": ["eyes"]},
+]
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    path = tmp_path / "corpus.jsonl"
+    lines = [json.dumps(DOCS[0]), "{not json", "", json.dumps(DOCS[1], ensure_ascii=False), json.dumps(DOCS[2], ensure_ascii=False)]
+    path.write_text("\n".join(lines), encoding="utf-8")  # no trailing newline
+    return str(path)
+
+
+def test_offsets_read_back_the_same_docs(corpus):
+    reader = CorpusReader(corpus)
+    pairs = list(iter_corpus_offsets(corpus, bad_lines=[]))
+    assert [reader.doc_at(offset) for offset, _ in pairs] == [doc for _, doc in pairs] == DOCS
+    assert [doc for _, doc in pairs] == list(iter_corpus(corpus, bad_lines=[]))
+    reader.close()
+
+
+def test_index_keeps_offsets_not_docs(corpus):
+    bad_lines = []
+    index = BM25Index(corpus, bad_lines=bad_lines)
+    assert [b.line_no for b in bad_lines] == [2]
+    assert len(index) == 3 and not hasattr(index, "docs")
+    assert index.search("oseltamivir")[0][0] == "treat"
+    assert index.search("pink eye", categories=["transmission"]) == []
+    assert index.doc("eye") == DOCS[2]
+
+
+def test_fusion_fills_lexical_only_hits_from_the_file(corpus):
+    index = BM25Index(corpus, bad_lines=[])
+    vector_hits = [{"id": "spread", "text": DOCS[1]["text"], "metadata": {}}]
+    fused = fuse_with_lexical("oseltamivir", vector_hits, index, n_results=2, depth=2)
+    assert {hit["id"] for hit in fused} == {"spread", "treat"}
+    assert next(hit for hit in fused if hit["id"] == "treat")["text"] == DOCS[0]["text"]
@@ -0,0 +1,178 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import llm_gateway
+from llm_gateway import CircuitBreaker, LLMGateway, LLMUnavailable
+
+REQUEST = dict(
+    model="claude-3-haiku-20240307",
+    max_tokens=20,
+    messages=[{"role": "user", "content": "hello"}],
+)
+
+MESSAGE = {
+    "id": "msg_test",
+    "type": "message",
+    "role": "assistant",
+    "model": "claude-3-haiku-20240307",
+    "content": [{"type": "text", "text": "OK"}],
+    "stop_reason": "end_turn",
+    "stop_sequence": None,
+    "usage": {"input_tokens": 5, "output_tokens": 1},
+}
+
+
+class FakeClaude(BaseHTTPRequestHandler):
+    """
+    Answers POSTs with the statuses in `plan` (status or (status, headers)),
+    then 200 with MESSAGE. Request times are kept in `hits`.
+    """
+
+    plan: list = []
+    hits: list = []
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        FakeClaude.hits.append(time.monotonic())
+        status, headers = 200, {}
+        if FakeClaude.plan:
+            step = FakeClaude.plan.pop(0)
+            status, headers = step if isinstance(step, tuple) else (step, {})
+        if status == 200:
+            body = MESSAGE
+        else:
+            body = {"type": "error", "error": {"type": "api_error", "message": f"status {status}"}}
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    FakeClaude.plan = []
+    FakeClaude.hits = []
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), FakeClaude)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture(autouse=True)
+def fast_backoff(monkeypatch):
+    monkeypatch.setattr(llm_gateway, "BACKOFF_BASE", 0.01)
+
+
+def gateway(url: str, max_retries: int = 3, failures: int = 2, reset: float = 0.3) -> LLMGateway:
+    return LLMGateway(
+        api_key="test-key",
+        base_url=url,
+        deadline=10,
+        max_retries=max_retries,
+        breaker=CircuitBreaker(failure_threshold=failures, reset_seconds=reset),
+    )
+
+
+def test_retries_5xx_and_429_then_succeeds(server):
+    FakeClaude.plan = [500, 529, (429, {"Retry-After": "0.4"})]
+    gw = gateway(server)
+    msg = gw.create(REQUEST)
+    assert msg.content[0].text == "OK"
+    assert len(FakeClaude.hits) == 4
+    # The 429's Retry-After is waited out instead of the (tiny) jittered backoff
+    assert FakeClaude.hits[3] - FakeClaude.hits[2] >= 0.4
+    assert FakeClaude.hits[2] - FakeClaude.hits[0] < 0.4
+    assert gw.breaker.state == "closed"
+
+
+def test_retry_after_is_capped(server, monkeypatch):
+    monkeypatch.setattr(llm_gateway, "BACKOFF_CAP", 0.2)
+    FakeClaude.plan = [(503, {"Retry-After": "30"})]
+    gateway(server).create(REQUEST)
+    assert 0.2 <= FakeClaude.hits[1] - FakeClaude.hits[0] < 5
+
+
+def test_gives_up_after_max_retries(server):
+    FakeClaude.plan = [529] * 10
+    gw = gateway(server, max_retries=2, failures=5)
+    with pytest.raises(LLMUnavailable):
+        gw.create(REQUEST)
+    assert len(FakeClaude.hits) == 3
+
+
+def test_bad_request_is_not_retried_and_leaves_breaker_alone(server):
+    import anthropic
+
+    gw = gateway(server, max_retries=0, failures=2)
+    FakeClaude.plan = [529]
+    with pytest.raises(LLMUnavailable):
+        gw.create(REQUEST)
+    FakeClaude.plan = [400]
+    with pytest.raises(anthropic.BadRequestError):
+        gw.create(REQUEST)
+    assert len(FakeClaude.hits) == 2
+    # The 400 did not reset the failure count: one more failure opens the breaker
+    FakeClaude.plan = [529]
+    with pytest.raises(LLMUnavailable):
+        gw.create(REQUEST)
+    assert gw.breaker.state == "open"
+
+
+def test_breaker_closed_open_half_open_closed(server):
+    gw = gateway(server, max_retries=0, failures=2, reset=0.3)
+    assert gw.breaker.state == "closed"
+    FakeClaude.plan = [500, 500]
+    for _ in range(2):
+        with pytest.raises(LLMUnavailable):
+            gw.create(REQUEST)
+    assert gw.breaker.state == "open"
+
+    # Refused without reaching the server
+    with pytest.raises(LLMUnavailable, match="circuit breaker"):
+        gw.create(REQUEST)
+    assert len(FakeClaude.hits) == 2
+
+    time.sleep(0.35)
+    assert gw.breaker.state == "half-open"
+    # A failed trial re-opens it...
+    FakeClaude.plan = [500]
+    with pytest.raises(LLMUnavailable):
+        gw.create(REQUEST)
+    assert gw.breaker.state == "open"
+
+    # ...a successful one closes it
+    time.sleep(0.35)
+    assert gw.breaker.state == "half-open"
+    assert gw.create(REQUEST).content[0].text == "OK"
+    assert gw.breaker.state == "closed"
+
+
+def test_unavailable_claude_falls_back_to_rule_based_answer(server, monkeypatch):
+    import app
+    from rule_based_answers import UNAVAILABLE_NOTE
+    from symptoms import parse_symptoms_from_text
+
+    gw = gateway(server, max_retries=1, failures=1, reset=60)
+    monkeypatch.setattr(app, "gateway", gw)
+    FakeClaude.plan = [529, 529]
+    with pytest.raises(LLMUnavailable):
+        gw.create(REQUEST)
+    assert gw.breaker.state == "open"
+
+    text = "I have a fever, a dry cough and body aches"
+    reply = app.ask_flu_with_symptoms(text, parse_symptoms_from_text(text))
+    assert reply.endswith(UNAVAILABLE_NOTE)
+    assert "fever" in reply
+    assert len(FakeClaude.hits) == 2  # answered without another call
@@ -0,0 +1,101 @@
+import importlib
+from types import SimpleNamespace
+
+import prompt_cache
+from prompt_cache import EPHEMERAL, USAGE_FIELDS, USAGE_TOTALS, system_blocks
+
+HAIKU = "claude-3-haiku-20240307"
+
+
+class FakeMessages:
+    def __init__(self, usage):
+        self.usage = usage
+        self.requests = []
+
+    def create(self, **kwargs):
+        self.requests.append(kwargs)
+        return SimpleNamespace(
+            content=[SimpleNamespace(type="text", text="ok")],
+            usage=SimpleNamespace(**self.usage),
+        )
+
+
+class FakeClient:
+    def __init__(self, **usage):
+        self.messages = FakeMessages(usage)
+
+
+def has_cache_control(value) -> bool:
+    if isinstance(value, dict):
+        return "cache_control" in value or any(has_cache_control(v) for v in value.values())
+    if isinstance(value, list):
+        return any(has_cache_control(v) for v in value)
+    return False
+
+
+def test_breakpoint_on_last_block_only():
+    blocks = system_blocks("instructions", "background")
+    assert "cache_control" not in blocks[0]
+    assert blocks[1]["cache_control"] == EPHEMERAL
+
+
+def test_no_breakpoint_below_model_minimum():
+    short = "x" * 4 * 1000  # ~1000 tokens
+    long = "x" * 4 * 2100
+    assert not has_cache_control(system_blocks(short, model=HAIKU))
+    assert system_blocks(long, model=HAIKU)[-1]["cache_control"] == EPHEMERAL
+    # Models without a listed minimum use the 1024-token default
+    assert system_blocks(short + "x" * 100, model="claude-sonnet-4-5")[-1]["cache_control"] == EPHEMERAL
+    assert not has_cache_control(system_blocks(long, cache=False, model=HAIKU))
+
+
+def test_short_app1_prompts_are_not_marked():
+    import app1
+
+    assert not has_cache_control(app1.SYMPTOM_SYSTEM)
+    assert not has_cache_control(app1.INFO_SYSTEM)
+
+
+def test_app_packs_background_when_prefix_too_short():
+    import app
+
+    assert not app.SYMPTOM_BACKGROUND_CACHED and not app.INFO_BACKGROUND_CACHED
+    client = FakeClient(input_tokens=700, output_tokens=50)
+    app.gateway._client = client
+    app.ask_flu_info("How does the flu spread?")
+
+    request = client.messages.requests[-1]
+    assert not has_cache_control(request)
+    assert isinstance(request["system"], str)
+    assert "See the background information in the system prompt." not in request["messages"][0]["content"]
+
+
+def test_app_caches_background_and_records_usage():
+    import app
+
+    minimum = prompt_cache.MIN_CACHEABLE_TOKENS["claude-3-haiku"]
+    prompt_cache.MIN_CACHEABLE_TOKENS["claude-3-haiku"] = 512
+    try:
+        app = importlib.reload(app)
+        assert app.SYMPTOM_BACKGROUND_CACHED and app.INFO_BACKGROUND_CACHED
+        client = FakeClient(
+            input_tokens=40, output_tokens=80, cache_read_input_tokens=900, cache_creation_input_tokens=0
+        )
+        app.gateway._client = client
+        before = dict(USAGE_TOTALS)
+        app.ask_flu_info("How does the flu spread?")
+
+        system = client.messages.requests[-1]["system"]
+        assert [("cache_control" in block) for block in system] == [False, True]
+        assert system[1]["text"].endswith(app.RAG_CONTEXT)
+        content = client.messages.requests[-1]["messages"][0]["content"]
+        assert "See the background information in the system prompt." in content
+        assert {f: USAGE_TOTALS[f] - before[f] for f in USAGE_FIELDS} == {
+            "input_tokens": 40,
+            "output_tokens": 80,
+            "cache_read_input_tokens": 900,
+            "cache_creation_input_tokens": 0,
+        }
+    finally:
+        prompt_cache.MIN_CACHEABLE_TOKENS["claude-3-haiku"] = minimum
+        importlib.reload(app)
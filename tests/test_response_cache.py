@@ -0,0 +1,65 @@
+import time
+
+from response_cache import ResponseCache, info_cache_key
+
+
+def test_modal_verbs_change_the_key():
+    assert info_cache_key("Can I get the flu shot while pregnant?") != info_cache_key(
+        "Should I get the flu shot while pregnant?"
+    )
+
+
+def test_wording_variants_share_a_key():
+    assert info_cache_key("What are the flu symptoms??") == info_cache_key("what are  flu symptoms")
+    assert info_cache_key("Please tell me: how does flu spread?") == info_cache_key("How does the flu spread")
+
+
+def test_no_hits_until_the_corpus_version_is_known(tmp_path):
+    db = str(tmp_path / "answers.db")
+    cache = ResponseCache(path=db, require_corpus_version=True)
+    cache.set_corpus_version("corpus-a")
+    cache.put("q", "old answer")
+
+    # Restart after the corpus was edited: the stored answer is not served
+    # while the index (and so the corpus version) is still being built
+    restarted = ResponseCache(path=db, require_corpus_version=True)
+    assert restarted.get("q") is None
+    restarted.set_corpus_version("corpus-b")
+    assert restarted.get("q") is None
+
+    unchanged = ResponseCache(path=db, require_corpus_version=True)
+    unchanged.put("q", "new answer")
+    unchanged.set_corpus_version("corpus-b")
+    assert unchanged.get("q") == "new answer"
+
+
+def test_app_caches_wait_for_the_corpus_version():
+    import app1
+
+    assert app1.RESPONSE_CACHE.require_corpus_version and app1.INFO_CACHE.require_corpus_version
+
+
+def disk_rows(path) -> list:
+    import sqlite3
+
+    with sqlite3.connect(path) as db:
+        return sorted(row[0] for row in db.execute("SELECT key FROM responses"))
+
+
+def test_disk_rows_are_capped_to_the_newest(tmp_path):
+    db = str(tmp_path / "answers.db")
+    cache = ResponseCache(max_entries=2, path=db, max_disk_entries=3)
+    cache.prune_every = 4
+    for i in range(8):
+        cache.put(f"q{i}", "answer")
+    assert disk_rows(db) == ["q5", "q6", "q7"]
+
+
+def test_expired_rows_are_deleted_on_write(tmp_path):
+    db = str(tmp_path / "answers.db")
+    cache = ResponseCache(ttl_seconds=0.01, path=db)
+    cache.prune_every = 1
+    cache.put("old", "answer")
+    time.sleep(0.02)
+    cache.put("new", "answer")
+    assert disk_rows(db) == ["new"]
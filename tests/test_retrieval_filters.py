@@ -0,0 +1,18 @@
+from retrieval_filters import backfill, categories_for_request, category_where
+
+
+def test_where_clause_only_with_categories():
+    assert category_where(None) is None and category_where([]) is None
+    assert category_where(["prevention"]) == {"category": {"$in": ["prevention"]}}
+
+
+def test_backfill_keeps_filtered_hits_first_without_duplicates():
+    filtered = [{"id": "a"}, {"id": "b"}]
+    unfiltered = [{"id": "c"}, {"id": "a"}, {"id": "d"}]
+    assert [h["id"] for h in backfill(filtered, unfiltered)] == ["a", "b", "c", "d"]
+
+
+def test_info_categories_come_from_question_keywords():
+    assert categories_for_request("info", "Should I get a flu shot?") == ["prevention"]
+    assert categories_for_request("info", "Tell me about influenza") is None
+    assert "red_flags" in categories_for_request("symptoms", "fever and cough")
@@ -0,0 +1,62 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from rule_based_answers import (
+    CONFIDENCE_MARGIN,
+    RULE_ANSWER_POLICIES,
+    is_confident,
+    rule_answer_policy,
+    use_rule_answer,
+)
+from symptoms import LIKELY_THRESHOLD, POSSIBLE_THRESHOLD, SYMPTOM_FIELDS, flu_score
+
+
+def symptoms(*fields: str) -> dict:
+    return {field: int(field in fields) for field in SYMPTOM_FIELDS}
+
+
+CLEAR_FLU = symptoms("FEVER", "COUGH", "MUSCLE_ACHES", "SORE_THROAT")  # 0.85
+BORDERLINE_FLU = symptoms("FEVER", "COUGH", "MUSCLE_ACHES")  # 0.75
+CLEAR_NOT_FLU = symptoms("SORE_THROAT")  # 0.1
+BORDERLINE_NOT_FLU = symptoms("FEVER")  # 0.35
+
+
+def test_confidence_margin_around_the_label_cut_offs():
+    assert flu_score(CLEAR_FLU) >= LIKELY_THRESHOLD + CONFIDENCE_MARGIN and is_confident(CLEAR_FLU)
+    assert LIKELY_THRESHOLD <= flu_score(BORDERLINE_FLU) < LIKELY_THRESHOLD + CONFIDENCE_MARGIN
+    assert not is_confident(BORDERLINE_FLU)
+    assert is_confident(CLEAR_NOT_FLU)
+    assert POSSIBLE_THRESHOLD - CONFIDENCE_MARGIN < flu_score(BORDERLINE_NOT_FLU) < POSSIBLE_THRESHOLD
+    assert not is_confident(BORDERLINE_NOT_FLU)
+
+
+def test_breathing_problems_are_never_confident():
+    assert not is_confident({**CLEAR_FLU, "SHORTNESS_OF_BREATH": 1})
+    assert not is_confident({**CLEAR_NOT_FLU, "DIFFICULTY_BREATHING": 1})
+
+
+@pytest.mark.parametrize(
+    "policy, clear, borderline",
+    [("fallback", False, False), ("confident", True, False), ("always", True, True)],
+)
+def test_policies(policy, clear, borderline):
+    assert use_rule_answer(CLEAR_FLU, policy) is clear
+    assert use_rule_answer(BORDERLINE_FLU, policy) is borderline
+
+
+def test_policy_values_are_validated():
+    assert [rule_answer_policy(p) for p in RULE_ANSWER_POLICIES] == list(RULE_ANSWER_POLICIES)
+    assert rule_answer_policy(" Confident ") == "confident"
+    with pytest.raises(ValueError, match="FLU_RAG_RULE_ANSWERS"):
+        rule_answer_policy("sometimes")
+    with pytest.raises(ValueError):
+        use_rule_answer(CLEAR_FLU, "sometimes")
+
+
+def test_app_refuses_an_unknown_policy_at_import():
+    env = {**os.environ, "FLU_RAG_RULE_ANSWERS": "confidnet"}
+    proc = subprocess.run([sys.executable, "-c", "import app1"], env=env, capture_output=True, text=True)
+    assert proc.returncode != 0 and "FLU_RAG_RULE_ANSWERS='confidnet'" in proc.stderr
@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+from symptom_batch import (
+    all_symptom_combinations,
+    check_against_scalar,
+    flu_score_batch,
+    interpret_flu_score_batch,
+    symptoms_to_matrix,
+)
+from symptoms import (
+    LIKELY_THRESHOLD,
+    POSSIBLE_THRESHOLD,
+    SCORE_GROUPS,
+    SYMPTOM_FIELDS,
+    flu_score,
+    interpret_flu_score,
+    parse_symptoms_from_text,
+)
+
+SCORED = [field for fields, _ in SCORE_GROUPS for field in fields]
+
+
+def test_every_combination_of_scored_fields_matches_scalar():
+    # All 2 ** 16 combinations of the fields flu_score looks at, with the
+    # other fields set at random (the full 2 ** 20 check is `python symptom_batch.py`)
+    rng = np.random.default_rng(0)
+    n = len(SCORED)
+    codes = np.arange(2 ** n, dtype=np.uint32)[:, None]
+    matrix = rng.integers(0, 2, size=(2 ** n, len(SYMPTOM_FIELDS)), dtype=np.uint8)
+    matrix[:, [SYMPTOM_FIELDS.index(f) for f in SCORED]] = (codes >> np.arange(n, dtype=np.uint32)) & 1
+    assert check_against_scalar(matrix) == 0
+
+
+def test_random_rows_match_scalar():
+    rows = np.random.default_rng(1).choice(all_symptom_combinations(), size=5000, replace=False)
+    assert check_against_scalar(rows) == 0
+
+
+@pytest.mark.parametrize(
+    "score",
+    [0.0, 1.0, POSSIBLE_THRESHOLD, LIKELY_THRESHOLD, np.nextafter(POSSIBLE_THRESHOLD, 0), np.nextafter(LIKELY_THRESHOLD, 0)],
+)
+def test_labels_match_scalar_at_the_cut_offs(score):
+    assert interpret_flu_score_batch(np.array([score]))[0] == interpret_flu_score(float(score))
+
+
+def test_parsed_messages_score_the_same():
+    messages = ["high fever, cough and aching muscles", "sneezing with itchy eyes", "hello", "vomiting and a sore throat"]
+    parsed = [parse_symptoms_from_text(m) for m in messages]
+    scores = flu_score_batch(symptoms_to_matrix(parsed))
+    assert scores.tolist() == [flu_score(p) for p in parsed]
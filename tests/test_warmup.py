@@ -0,0 +1,52 @@
+import time
+
+import pytest
+
+from warmup import BackgroundTask
+
+
+def flaky(failures: int):
+    calls = []
+
+    def fn():
+        calls.append(1)
+        if len(calls) <= failures:
+            raise OSError("transient")
+        return "index"
+
+    return fn
+
+
+def wait_ready(task: BackgroundTask, seconds: float = 5.0) -> bool:
+    deadline = time.monotonic() + seconds
+    while not task.ready and time.monotonic() < deadline:
+        time.sleep(0.005)
+    return task.ready
+
+
+def test_a_failed_build_is_retried():
+    task = BackgroundTask("index", flaky(2), retry_seconds=0.01).start()
+    assert wait_ready(task)
+    assert task.result() == "index" and task.attempts == 3
+
+
+def test_result_raises_while_failing():
+    task = BackgroundTask("index", flaky(100), retry_seconds=0.5).start()
+    with pytest.raises(OSError):
+        task.result(timeout=5)
+    assert not task.ready
+
+
+def test_no_retry_without_retry_seconds():
+    task = BackgroundTask("index", flaky(1), retry_seconds=None).start()
+    with pytest.raises(OSError):
+        task.result(timeout=5)
+    time.sleep(0.05)
+    assert not task.ready and task.attempts == 1
+
+
+def test_warmup_off_leaves_the_build_to_the_first_retrieval():
+    import search_index
+
+    assert search_index.start_warmup(warmup=False, ready_port=0) is search_index.SEARCH_INDEX
+    assert not search_index.SEARCH_INDEX.started
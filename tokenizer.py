@@ -0,0 +1,14 @@
+import re
+from typing import List
+
+# ==============================
+# Word tokenizer
+# ==============================
+# Shared by the BM25 index and the context packer. Kept free of numpy and
+# chromadb so the rule-based paths can import it at no cost.
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN.findall(text.lower())
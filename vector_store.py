@@ -0,0 +1,479 @@
+import argparse
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from corpus_loader import iter_corpus
+
+# chromadb (and with it onnxruntime / numpy) is imported inside the functions
+# that need it, so code that only needs doc_metadata() and friends starts fast.
+
+# ==============================
+# Vector store shared by app1.py (CLI) and stream.py (Streamlit)
+# ==============================
+COLLECTION_NAME = "flu_corpus"
+
+# DefaultEmbeddingFunction runs the all-MiniLM-L6-v2 ONNX model.
+EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
+
+# Set FLU_RAG_INDEX_DIR to keep the collection on disk between restarts.
+# When it is not set, the collection is built in memory like before.
+INDEX_DIR = os.environ.get("FLU_RAG_INDEX_DIR")
+
+# Set FLU_RAG_EMBED_CACHE_DIR to keep embeddings on disk, keyed by text and
+# model, so repeated queries and unchanged docs are never embedded twice.
+EMBED_CACHE_DIR = os.environ.get("FLU_RAG_EMBED_CACHE_DIR")
+EMBED_CACHE_SIZE = int(os.environ.get("FLU_RAG_EMBED_CACHE_SIZE", "50000"))
+
+# Docs are embedded and written to Chroma this many at a time.
+SYNC_BATCH_SIZE = 256
+
+logger = logging.getLogger(__name__)
+
+# Called with the corpus fingerprint every time a collection is opened, so
+# caches built on top of the corpus can drop entries when it changed.
+_corpus_listeners: List[Callable[[str], None]] = []
+_last_fingerprint: Optional[str] = None
+
+
+def add_corpus_listener(callback: Callable[[str], None]) -> None:
+    """
+    Register a hook for corpus changes. If a collection was already opened in
+    this process, the callback is called right away with its fingerprint.
+    """
+    _corpus_listeners.append(callback)
+    if _last_fingerprint is not None:
+        callback(_last_fingerprint)
+
+
+def _notify_corpus(fingerprint: str) -> None:
+    global _last_fingerprint
+    _last_fingerprint = fingerprint
+    for callback in _corpus_listeners:
+        callback(fingerprint)
+
+
+def load_corpus(path: str) -> List[Dict[str, Any]]:
+    """
+    All valid docs of a corpus file; bad lines are logged and skipped.
+    Index builds should stream iter_corpus() instead.
+    """
+    return list(iter_corpus(path))
+
+
+_model_function = None
+_embedding_function = None
+# Held while either of the two is created, so threads that race on first use
+# (warm-up vs. first request) share one model and one cache. An RLock because
+# get_embedding_function() calls get_model_embedding_function() under it.
+_init_lock = threading.RLock()
+
+
+def get_model_embedding_function():
+    """
+    The embedding model itself, without the cache. The ONNX model is loaded
+    once per process.
+    """
+    global _model_function
+    if _model_function is None:
+        with _init_lock:
+            if _model_function is None:
+                from chromadb.utils import embedding_functions
+
+                _model_function = embedding_functions.DefaultEmbeddingFunction()
+    return _model_function
+
+
+def get_embedding_function():
+    """
+    The process-wide embedding function, shared by the collection and anything
+    else that needs embeddings. With EMBED_CACHE_DIR it answers from the
+    embedding cache and only runs the model on texts it has not seen.
+    """
+    global _embedding_function
+    if _embedding_function is None:
+        with _init_lock:
+            if _embedding_function is None:
+                function = get_model_embedding_function()
+                if EMBED_CACHE_DIR:
+                    from embedding_cache import CachedEmbeddingFunction, EmbeddingCache
+
+                    cache = EmbeddingCache(EMBED_CACHE_DIR, EMBEDDING_MODEL_NAME, EMBED_CACHE_SIZE)
+                    function = CachedEmbeddingFunction(function, cache)
+                # Published only once complete: other threads read it without the lock
+                _embedding_function = function
+    return _embedding_function
+
+
+def embedding_cache_stats() -> Dict[str, float]:
+    """
+    Hit/miss counts of the embedding cache ({} if it is off or not in use yet).
+    """
+    cache = getattr(_embedding_function, "cache", None)
+    return cache.stats() if cache is not None else {}
+
+
+def doc_metadata(doc: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Chroma metadata for one corpus doc.
+    """
+    tags = doc.get("tags", [])
+    meta = {
+        "category": doc.get("category", ""),
+        "title": doc.get("title", ""),
+        # Chroma metadata values must be primitive types, not lists
+        "tags": ", ".join(tags) if isinstance(tags, list) else str(tags),
+    }
+    # Chunk records (see chunking.py) remember which doc they came from
+    if "parent_id" in doc:
+        meta["parent_id"] = doc["parent_id"]
+        meta["chunk_index"] = doc.get("chunk_index", 0)
+    return meta
+
+
+def doc_content_hash(doc: Dict[str, Any]) -> str:
+    """
+    Hash of everything we store for a doc (text + metadata), used to skip unchanged docs.
+    """
+    payload = json.dumps(
+        {"text": doc.get("text", ""), "metadata": doc_metadata(doc)},
+        ensure_ascii=False,
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def corpus_fingerprint(corpus_path: str, model_name: str = EMBEDDING_MODEL_NAME) -> str:
+    """
+    Hash of the corpus file bytes plus the embedding model name.
+    """
+    h = hashlib.sha256()
+    h.update(model_name.encode("utf-8"))
+    h.update(b"\0")
+    with open(corpus_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+@dataclass
+class SyncReport:
+    added: int = 0
+    updated: int = 0
+    deleted: int = 0
+    skipped: int = 0
+    seconds: float = 0.0
+
+    @property
+    def embedded(self) -> int:
+        return self.added + self.updated
+
+    @property
+    def docs_per_second(self) -> float:
+        return self.embedded / self.seconds if self.seconds else 0.0
+
+    def __str__(self) -> str:
+        text = (
+            f"added={self.added} updated={self.updated} "
+            f"deleted={self.deleted} skipped={self.skipped}"
+        )
+        if self.embedded:
+            text += f" in {self.seconds:.1f}s ({self.docs_per_second:.0f} docs/s)"
+        return text
+
+
+def _indexed_hashes(collection, page_size: int = 1000) -> Dict[str, str]:
+    """
+    id -> content_hash for everything already in the collection.
+    """
+    hashes: Dict[str, str] = {}
+    offset = 0
+    while True:
+        res = collection.get(include=["metadatas"], limit=page_size, offset=offset)
+        ids = res["ids"]
+        if not ids:
+            break
+        for doc_id, meta in zip(ids, res["metadatas"]):
+            hashes[doc_id] = (meta or {}).get("content_hash", "")
+        if len(ids) < page_size:
+            break
+        offset += page_size
+    return hashes
+
+
+def _init_embed_worker() -> None:
+    """
+    Pool initializer for the sync_collection() workers: one compute thread
+    each. ONNX Runtime otherwise sizes its intra-op pool to all cores in
+    every worker, and N workers x N threads oversubscribe the CPU.
+    """
+    os.environ["OMP_NUM_THREADS"] = "1"
+    import onnxruntime
+
+    # DefaultEmbeddingFunction builds its SessionOptions itself when the model
+    # is first used, so the class is swapped for one that starts single-threaded
+    session_options = onnxruntime.SessionOptions
+
+    def single_threaded_options():
+        options = session_options()
+        options.intra_op_num_threads = 1
+        options.inter_op_num_threads = 1
+        return options
+
+    onnxruntime.SessionOptions = single_threaded_options
+
+
+def embed_texts(texts: List[str]) -> List[Any]:
+    """
+    Embed texts with this process's model. Runs inside the sync_collection()
+    worker processes, each of which loads the model once; the embedding cache
+    is only used by the parent process.
+    """
+    return get_model_embedding_function()(texts)
+
+
+def sync_collection(
+    collection,
+    docs: Iterable[Dict[str, Any]],
+    batch_size: int = SYNC_BATCH_SIZE,
+    workers: int = 1,
+    progress: Optional[Callable[[int, float], None]] = None,
+) -> SyncReport:
+    """
+    Bring the collection in line with docs by content hash.
+
+    Only new or changed docs are embedded (upsert); ids that are no longer in
+    docs are deleted; unchanged docs are skipped. docs may be a generator:
+    changed docs are written every batch_size docs, so only a few batches are
+    held at a time (plus the ids and hashes already in the index).
+
+    With workers > 1 the batches are embedded in that many processes and
+    written with precomputed embeddings; up to 2 * workers batches are in
+    flight. progress(docs written, seconds elapsed) is called after each batch.
+    """
+    from embedding_cache import CachedEmbeddingFunction
+
+    report = SyncReport()
+    indexed = _indexed_hashes(collection)
+    start = time.perf_counter()
+    written = 0
+
+    pool = None
+    if workers > 1:
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+
+        # spawn: ONNX Runtime's thread pools do not survive fork()
+        pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_embed_worker,
+        )
+    in_flight = deque()  # (future, missing rows, vectors, ids, texts, metadatas), oldest first
+    cached = get_embedding_function()
+    if not isinstance(cached, CachedEmbeddingFunction):
+        cached = None
+
+    def write(batch_ids, batch_texts, batch_metadatas, embeddings=None):
+        nonlocal written
+        collection.upsert(
+            ids=batch_ids,
+            documents=batch_texts,
+            metadatas=batch_metadatas,
+            embeddings=embeddings,
+        )
+        written += len(batch_ids)
+        if progress:
+            progress(written, time.perf_counter() - start)
+
+    def write_oldest():
+        future, missing, vectors, batch_ids, batch_texts, batch_metadatas = in_flight.popleft()
+        if future is not None:
+            embedded = future.result()
+            if cached is not None:
+                cached.fill(vectors, missing, [batch_texts[i] for i in missing], embedded)
+            else:
+                for i, vector in zip(missing, embedded):
+                    vectors[i] = vector
+        write(batch_ids, batch_texts, batch_metadatas, vectors)
+
+    ids: List[str] = []
+    texts: List[str] = []
+    metadatas: List[Dict[str, Any]] = []
+
+    def flush():
+        nonlocal ids, texts, metadatas
+        if not ids:
+            return
+        if pool is None:
+            write(ids, texts, metadatas)
+        else:
+            # Only texts missing from the embedding cache go to the workers
+            vectors = cached.cache.get_many(texts) if cached is not None else [None] * len(texts)
+            missing = [i for i, v in enumerate(vectors) if v is None]
+            future = pool.submit(embed_texts, [texts[i] for i in missing]) if missing else None
+            in_flight.append((future, missing, vectors, ids, texts, metadatas))
+            while len(in_flight) > 2 * workers:
+                write_oldest()
+        ids, texts, metadatas = [], [], []
+
+    seen = set()
+    try:
+        for d in docs:
+            doc_id = d["id"]
+            seen.add(doc_id)
+            content_hash = doc_content_hash(d)
+            old_hash = indexed.get(doc_id)
+            if old_hash == content_hash:
+                report.skipped += 1
+                continue
+            if old_hash is None:
+                report.added += 1
+            else:
+                report.updated += 1
+            meta = doc_metadata(d)
+            meta["content_hash"] = content_hash
+            ids.append(doc_id)
+            texts.append(d["text"])
+            metadatas.append(meta)
+            if len(ids) >= batch_size:
+                flush()
+        flush()
+        while in_flight:
+            write_oldest()
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+    report.seconds = time.perf_counter() - start
+
+    removed = [doc_id for doc_id in indexed if doc_id not in seen]
+    for i in range(0, len(removed), batch_size):
+        collection.delete(ids=removed[i:i + batch_size])
+    report.deleted = len(removed)
+
+    return report
+
+
+def _get_collection(chroma_client, embed_fn):
+    try:
+        return chroma_client.get_collection(name=COLLECTION_NAME, embedding_function=embed_fn)
+    except Exception:  # ValueError / NotFoundError depending on the chromadb version
+        return None
+
+
+def open_persistent_index(
+    docs: Iterable[Dict[str, Any]],
+    corpus_path: str,
+    persist_dir: str,
+    batch_size: int = SYNC_BATCH_SIZE,
+    workers: int = 1,
+    progress: Optional[Callable[[int, float], None]] = None,
+) -> Tuple[Any, SyncReport]:
+    """
+    Open the on-disk collection in persist_dir and bring it up to date with docs.
+
+    The collection is tagged with corpus_fingerprint() after a successful sync;
+    if the stored fingerprint matches, it is reopened as-is and nothing is embedded (every doc counts as
+    skipped). If only the corpus changed, sync_collection() re-embeds just the
+    changed docs. A different embedding model means a full rebuild.
+    batch_size, workers and progress are passed on to sync_collection().
+    """
+    import chromadb
+
+    embed_fn = get_embedding_function()
+    fingerprint = corpus_fingerprint(corpus_path)
+    chroma_client = chromadb.PersistentClient(path=persist_dir)
+
+    collection = _get_collection(chroma_client, embed_fn)
+    if collection is not None:
+        meta = collection.metadata or {}
+        if meta.get("corpus_hash") == fingerprint:
+            _notify_corpus(fingerprint)
+            return collection, SyncReport(skipped=collection.count())
+        if meta.get("embedding_model") != EMBEDDING_MODEL_NAME:
+            chroma_client.delete_collection(name=COLLECTION_NAME)
+            collection = None
+
+    if collection is None:
+        # No corpus_hash yet: a build that is interrupted must not look complete
+        collection = chroma_client.create_collection(
+            name=COLLECTION_NAME,
+            embedding_function=embed_fn,
+            metadata={"embedding_model": EMBEDDING_MODEL_NAME},
+        )
+    report = sync_collection(collection, docs, batch_size, workers, progress)
+    # Only stamped once every doc is in
+    collection.modify(metadata={"corpus_hash": fingerprint, "embedding_model": EMBEDDING_MODEL_NAME})
+    logger.info("Synced %s into %s: %s", corpus_path, persist_dir, report)
+    _notify_corpus(fingerprint)
+    return collection, report
+
+
+def open_vector_store(
+    docs: Iterable[Dict[str, Any]],
+    corpus_path: str,
+    persist_dir: Optional[str] = INDEX_DIR,
+):
+    """
+    Return a Chroma collection with embeddings for all docs.
+
+    Without persist_dir this builds an in-memory collection, otherwise see
+    open_persistent_index().
+    """
+    if persist_dir:
+        collection, _ = open_persistent_index(docs, corpus_path, persist_dir)
+        return collection
+
+    import chromadb
+
+    chroma_client = chromadb.Client()
+    collection = chroma_client.create_collection(
+        name=COLLECTION_NAME,
+        embedding_function=get_embedding_function(),
+    )
+    sync_collection(collection, docs)
+    _notify_corpus(corpus_fingerprint(corpus_path))
+    return collection
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Sync the flu corpus into the on-disk Chroma index (only changed docs are embedded)."
+    )
+    parser.add_argument("--corpus", default="flu_rag_corpus.jsonl")
+    parser.add_argument("--index-dir", default=INDEX_DIR or ".chroma")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Processes that embed batches in parallel (1 = embed in this process).",
+    )
+    parser.add_argument("--batch-size", type=int, default=SYNC_BATCH_SIZE)
+    args = parser.parse_args()
+
+    def show_progress(done: int, elapsed: float) -> None:
+        rate = done / elapsed if elapsed else 0.0
+        print(f"\rembedded {done} docs ({rate:.0f} docs/s)", end="", flush=True)
+
+    # Streamed straight from the file, one batch at a time
+    _, report = open_persistent_index(
+        iter_corpus(args.corpus),
+        args.corpus,
+        args.index_dir,
+        batch_size=args.batch_size,
+        workers=args.workers,
+        progress=show_progress,
+    )
+    if report.embedded:
+        print()
+    print(f"{args.corpus} -> {args.index_dir}: {report}")
+
+
+if __name__ == "__main__":
+    main()
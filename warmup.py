@@ -0,0 +1,120 @@
+import logging
+import threading
+import time
+from typing import Any, Callable, Optional
+
+# ==============================
+# Background warm-up + readiness probe
+# ==============================
+# Loading the embedding model and building the index takes a while. A
+# BackgroundTask starts that work on a daemon thread as soon as the process
+# starts. Replies that need no retrieval (greetings, name intros) go out at
+# once; retrieval waits for the task only if it has not finished yet.
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundTask:
+    """
+    Runs fn once on a daemon thread. result() blocks until it is done and
+    returns its value (or re-raises its exception); if start() was never
+    called, result() starts it.
+
+    A failed run is retried on the same thread after retry_seconds, doubling
+    up to max_retry_seconds, so one transient error does not leave the
+    process unready for good. Until a retry succeeds, result() raises the
+    last error right away. retry_seconds=None gives up after the first failure.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        fn: Callable[[], Any],
+        retry_seconds: Optional[float] = 5.0,
+        max_retry_seconds: float = 300.0,
+    ):
+        self.name = name
+        self.retry_seconds = retry_seconds
+        self.max_retry_seconds = max_retry_seconds
+        self._fn = fn
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._value: Any = None
+        self._error: Optional[BaseException] = None
+        self.attempts = 0
+
+    def start(self) -> "BackgroundTask":
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+        return self
+
+    def _run(self) -> None:
+        delay = self.retry_seconds
+        while True:
+            self.attempts += 1
+            start = time.perf_counter()
+            try:
+                self._value = self._fn()
+            except BaseException as e:
+                self._error = e
+                self._done.set()
+                if delay is None:
+                    logger.exception("%s failed", self.name)
+                    return
+                logger.exception("%s failed, retrying in %.0fs", self.name, delay)
+                time.sleep(delay)
+                delay = min(delay * 2, self.max_retry_seconds)
+                continue
+            self._error = None
+            self._done.set()
+            logger.info("%s ready in %.1fs", self.name, time.perf_counter() - start)
+            return
+
+    @property
+    def started(self) -> bool:
+        return self._thread is not None
+
+    @property
+    def ready(self) -> bool:
+        """True once fn has finished successfully."""
+        return self._done.is_set() and self._error is None
+
+    def result(self, timeout: Optional[float] = None) -> Any:
+        self.start()
+        if not self._done.wait(timeout):
+            raise TimeoutError(f"{self.name} is still warming up")
+        error = self._error
+        if error is not None:
+            raise error
+        return self._value
+
+
+def serve_readiness(port: int, is_ready: Callable[[], bool], host: str = "0.0.0.0"):
+    """
+    Answer GET /ready (or /) with 200 once is_ready() is true and 503 before,
+    on a daemon thread, so a load balancer can hold traffic until then.
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class ReadinessHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] not in ("/", "/ready"):
+                self.send_error(404)
+                return
+            ok = is_ready()
+            body = b"ready\n" if ok else b"warming up\n"
+            self.send_response(200 if ok else 503)
+            self.send_header("Content-Type", "text/plain")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # probes hit this every few seconds
+
+    server = ThreadingHTTPServer((host, port), ReadinessHandler)
+    threading.Thread(target=server.serve_forever, name="readiness", daemon=True).start()
+    return server